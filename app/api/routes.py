@@ -1,8 +1,8 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks, Query
 
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 import os
 
@@ -12,15 +12,17 @@ import uuid
 
 import tempfile
 
+import time
+
 from datetime import datetime
 
-import pandas as pd
+from app.services.container import get_container
 
-from app.services.file_service import FileService
+from app.services.file_service import UploadTooLarge, stream_to_file
 
-from app.services.jd_service import JDService
+from app.services.hedging import deadline_scope
 
-from app.services.resume_service import ResumeService
+from app.services.work_pool import WorkPoolFull
 
 from app.utils.constants import DocType
 
@@ -35,14 +37,15 @@ from pydantic import BaseModel
 
 router = APIRouter()
 
-file_service = FileService()
-
-jd_service = JDService()
+# 所有服务共用一个存储、一个模型客户端和同一组缓存。容器在第一次处理请求时由get_container()创建，
+# 导入本模块时不打开存储、不导入pandas
 
-resume_service = ResumeService()
 
-# 全局变量，用于存储上传的JD文件和它们的评分标准
-uploaded_jd_files = {}
+class ReadyResponse(BaseModel):
+    """Response model for the readiness endpoint"""
+    status: str
+    message: str
+    data: dict
 
 
 
@@ -71,6 +74,507 @@ class UploadResponse(BaseModel):
 
 
 
+class JobStatusResponse(BaseModel):
+    """Response model for the job status endpoint"""
+    status: str
+    message: str
+    data: dict
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "status": "success",
+                "message": "Job is running",
+                "data": {
+                    "job_id": "3f2b8c0d9a6e4e1f8b7c6d5e4f3a2b1c",
+                    "type": "resume",
+                    "status": "running",
+                    "files": {
+                        "john_doe_resume.pdf": {"status": "scoring"}
+                    },
+                    "progress": {"total": 1, "completed": 0},
+                    "partial_results": {},
+                    "result": None,
+                    "error": None
+                }
+            }
+        }
+
+
+
+class ShortlistResponse(BaseModel):
+    """Response model for the shortlist endpoint"""
+    status: str
+    message: str
+    data: dict
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "status": "success",
+                "message": "Found 2 candidate resumes for senior_ml_engineer.pdf",
+                "data": {
+                    "jd": "senior_ml_engineer.pdf",
+                    "top_k": 2,
+                    "candidates": [
+                        {"resume_name": "john_doe_resume.pdf", "score": 7.4213},
+                        {"resume_name": "jane_smith_resume.pdf", "score": 5.1037}
+                    ],
+                    "scores": None
+                }
+            }
+        }
+
+
+
+async def _run_blocking(func, *args, **kwargs):
+    """在请求线程池中执行阻塞函数，线程池队列已满时返回503"""
+    container = get_container()
+    try:
+        return await container.work_pool.run(func, *args, **kwargs)
+    except WorkPoolFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+
+async def _save_uploaded_files(files: List[UploadFile], target_dir: str):
+    """
+    将上传的文件分块写入目标目录
+    
+    单个文件超过config.UPLOAD_MAX_FILE_BYTES，或本次请求的文件总大小超过
+    config.UPLOAD_MAX_REQUEST_BYTES时，该文件（以及之后的文件）不保存并记录为错误，
+    已有的同名文件保持不变。
+    
+    Returns:
+        (成功保存的文件名列表, 错误列表, 文件名到内容哈希的字典)
+    """
+    uploaded_files = []
+    errors = []
+    content_hashes = {}
+    # 本次请求中剩余可以写入的字节数
+    remaining = config.UPLOAD_MAX_REQUEST_BYTES
+    
+    # 确保目录存在
+    os.makedirs(target_dir, exist_ok=True)
+    
+    container = get_container()
+    for file in files:
+        # 检查文件类型
+        if not file.filename.endswith(('.pdf', '.PDF', '.docx', '.DOCX')):
+            errors.append({
+                "file": file.filename,
+                "error": "Unsupported file format. Only PDF and DOCX are supported."
+            })
+            continue
+        
+        if remaining <= 0:
+            errors.append({
+                "file": file.filename,
+                "error": f"Request exceeds the upload size limit of {config.UPLOAD_MAX_REQUEST_BYTES} bytes"
+            })
+            continue
+        
+        # 保存文件到目标位置
+        file_path = os.path.join(target_dir, file.filename)
+        try:
+            # 分块写入临时文件（写入在线程池中执行），同时计算哈希，完成后重命名为目标文件
+            content_hashes[file.filename], size = await stream_to_file(
+                file, file_path, min(config.UPLOAD_MAX_FILE_BYTES, remaining), run=container.work_pool.run
+            )
+            remaining -= size
+            uploaded_files.append(file.filename)
+        except UploadTooLarge as e:
+            error = str(e)
+            if config.UPLOAD_MAX_FILE_BYTES > remaining:
+                # 超出的是请求的总大小上限，之后的文件都不再保存
+                remaining = 0
+                error = f"Request exceeds the upload size limit of {config.UPLOAD_MAX_REQUEST_BYTES} bytes"
+            errors.append({
+                "file": file.filename,
+                "error": error
+            })
+            continue
+        except WorkPoolFull as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            errors.append({
+                "file": file.filename,
+                "error": str(e)
+            })
+            print(f"Error saving file {file.filename}: {str(e)}")
+            continue
+    
+    return uploaded_files, errors, content_hashes
+
+
+
+def _request_timeout(timeout):
+    """请求中LLM调用的截止时间（秒），未指定时使用config.LLM_REQUEST_DEADLINE"""
+    return timeout or config.LLM_REQUEST_DEADLINE
+
+
+
+def _extract_uploaded_files(uploaded_files, content_hashes, target_dir, doc_type, job_id=None):
+    """
+    并行提取上传文件的文本（内容未变化的文件不会重新解析）
+    
+    Returns:
+        文件名到提取结果的字典，提取失败的文件对应的值为异常对象
+    """
+    container = get_container()
+    for filename in uploaded_files:
+        container.job_service.update_file(job_id, filename, "extracting")
+    
+    file_paths = {filename: os.path.join(target_dir, filename) for filename in uploaded_files}
+    extraction_results = container.file_service.save_raw_contents(
+        list(file_paths.values()),
+        doc_type,
+        {file_paths[filename]: content_hashes[filename] for filename in uploaded_files}
+    )
+    
+    results = {}
+    for filename in uploaded_files:
+        results[filename] = extraction_results[file_paths[filename]]
+        if isinstance(results[filename], Exception):
+            print(f"Error extracting text from {filename}: {str(results[filename])}")
+            container.job_service.update_file(job_id, filename, "failed", error=str(results[filename]))
+    return results
+
+
+
+def _process_jds(uploaded_files, content_hashes, job_id=None):
+    """
+    提取JD文本并分析评分标准，然后对已有简历中缺少评分的组合评分
+    
+    Returns:
+        (JD文件名到评分标准的字典, 评分统计)
+    """
+    criteria_results = {}
+    
+    # 并行提取所有上传文件的文本
+    extraction_results = _extract_uploaded_files(uploaded_files, content_hashes, "testdata/jd", 'JD', job_id)
+    
+    # 批量分析文本提取成功的JD，尚未分析过的JD打包在少量请求中提取评分标准
+    extracted_files = [
+        filename for filename in uploaded_files
+        if not isinstance(extraction_results[filename], Exception)
+    ]
+    container = get_container()
+    for filename in extracted_files:
+        container.job_service.update_file(job_id, filename, "analyzing")
+    print(f"Calling get_criteria_batch for {extracted_files}")
+    batch_criteria = container.jd_service.get_criteria_batch(extracted_files)
+    
+    for filename in uploaded_files:
+        try:
+            # 文本提取失败的文件无法分析
+            extraction_result = extraction_results[filename]
+            if isinstance(extraction_result, Exception):
+                raise extraction_result
+            
+            criteria = batch_criteria[filename]
+            if isinstance(criteria, Exception):
+                raise criteria
+            print(f"Criteria for {filename}: {criteria}")
+            criteria_results[filename] = criteria
+            
+            container.job_service.add_partial_result(job_id, [filename], criteria)
+            container.job_service.update_file(job_id, filename, "completed")
+        except Exception as e:
+            print(f"Error getting criteria for {filename}: {str(e)}")
+            import traceback
+            print(traceback.format_exc())
+            container.job_service.update_file(job_id, filename, "failed", error=str(e))
+    
+    # 分析成功的JD加入参与简历评分的JD列表（保存在存储中，所有worker进程共享）
+    container.jd_service.activate_jds(list(criteria_results.keys()))
+    
+    scoring = _score_jds_against_existing_resumes(list(criteria_results.keys()), job_id)
+    return criteria_results, scoring
+
+
+
+def _score_jds_against_existing_resumes(jd_files, job_id=None):
+    """
+    对已有简历中缺少有效评分的(JD, 简历)组合评分，已评分的组合不会再调用LLM
+    
+    评分的组合数随简历库增长，同步请求中（job_id为None）不在请求内评分，而是提交一个后台任务；
+    在后台任务中（异步上传）直接评分。
+    
+    Returns:
+        评分统计 {"resumes": 已有简历数, "scored_pairs": 本次评分的组合数, "failed_pairs": 失败的组合数,
+                  "skipped_pairs": 被词法预过滤跳过、没有调用LLM的组合数}；
+        提交后台任务时为 {"resumes": 已有简历数, "pending_pairs": 待评分的组合数, "job_id": 任务ID}
+    """
+    container = get_container()
+    resume_files = container.file_service.store.list_raw_files(DocType.RESUME)
+    if not config.SCORE_NEW_JDS_AGAINST_RESUMES or not jd_files or not resume_files:
+        return {"resumes": len(resume_files), "scored_pairs": 0, "failed_pairs": 0, "skipped_pairs": 0}
+    
+    if job_id is not None:
+        return _score_unscored_pairs(jd_files, resume_files, job_id)
+    
+    pending = container.resume_service.find_unscored_pairs(jd_files, resume_files)
+    if not pending:
+        return {"resumes": len(resume_files), "scored_pairs": 0, "failed_pairs": 0, "skipped_pairs": 0}
+    
+    def run_job(scoring_job_id):
+        for jd_file in jd_files:
+            container.job_service.update_file(scoring_job_id, jd_file, "scoring")
+        with deadline_scope(timeout=_request_timeout(None)):
+            scoring = _score_unscored_pairs(jd_files, resume_files, scoring_job_id)
+        for jd_file in jd_files:
+            container.job_service.update_file(scoring_job_id, jd_file, "completed")
+        return scoring
+    
+    scoring_job_id = container.job_service.submit("scoring", jd_files, run_job)
+    return {"resumes": len(resume_files), "pending_pairs": len(pending), "job_id": scoring_job_id}
+
+
+
+def _score_unscored_pairs(jd_files, resume_files, job_id=None):
+    """对缺少有效评分的(JD, 简历)组合评分，返回评分统计，每个组合的结果记录为任务的部分结果"""
+    container = get_container()
+    # 后台任务开始前可能已经有其他请求评过分，重新查找缺少评分的组合
+    pending = container.resume_service.find_unscored_pairs(jd_files, resume_files)
+    print(f"Scoring {len(pending)} missing (JD, resume) pairs for {len(jd_files)} JDs")
+    
+    failed = 0
+    skipped = 0
+    for jd_file, resume_file, score in container.resume_service.iter_score_pairs(pending):
+        if isinstance(score, Exception) or "error" in score:
+            failed += 1
+        elif score.get("gated"):
+            skipped += 1
+        container.job_service.add_partial_result(job_id, ["scores", jd_file, resume_file], _format_score(score))
+    
+    return {"resumes": len(resume_files), "scored_pairs": len(pending), "failed_pairs": failed,
+            "skipped_pairs": skipped}
+
+
+
+def _format_score(score):
+    """将单个(JD, 简历)组合的评分结果转换为响应格式"""
+    if isinstance(score, Exception):
+        return {
+            "error": str(score)
+        }
+    result = {
+        "total_score": score.get("total_score", 0),
+        "detailed_scores": score.get("scores", {})
+    }
+    # 被词法预过滤跳过的组合，附带关键词重合度和阈值
+    if score.get("gated"):
+        result.update({
+            "gated": True,
+            "lexical_overlap": score.get("lexical_overlap"),
+            "gate_threshold": score.get("gate_threshold")
+        })
+    return result
+
+
+
+def _gate_summary(scores):
+    """统计评分结果中被词法预过滤跳过的组合"""
+    scores = list(scores)
+    skipped = sum(1 for score in scores if isinstance(score, dict) and score.get("gated"))
+    container = get_container()
+    return {
+        "enabled": container.resume_service.gate_threshold is not None,
+        "threshold": container.resume_service.gate_threshold,
+        "skipped": skipped,
+        "skip_rate": round(skipped / len(scores), 3) if scores else 0.0
+    }
+
+
+
+def _export_resume_scores(jd_files, uploaded_files):
+    """将当前上传简历的评分结果导出为Excel，返回导出结果"""
+    os.makedirs("scores", exist_ok=True)
+    container = get_container()
+    try:
+        # 生成Excel文件名
+        candidates = "_".join([os.path.splitext(f)[0] for f in uploaded_files])
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        excel_filename = f"scores_{candidates}_{timestamp}.xlsx"
+        excel_path = os.path.join("scores", excel_filename)
+        
+        # 导出评分结果，只导出当前上传的简历文件的评分
+        excel_file = container.resume_service.export_scores_to_excel(
+            jd_files=jd_files,
+            resume_files=uploaded_files,
+            output_path=excel_path
+        )
+        export_success = True
+        export_path = excel_file
+    except Exception as e:
+        export_success = False
+        export_path = None
+        print(f"Error exporting scores to Excel: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+    
+    return {
+        "success": export_success,
+        "path": export_path
+    }
+
+
+
+def _process_resumes(uploaded_files, content_hashes, job_id=None):
+    """
+    提取简历文本，对所有已上传的JD评分并导出Excel报告
+    
+    Returns:
+        (JD文件名列表, 评分结果, 导出结果, 词法预过滤统计)，没有JD时后三者为None
+    """
+    # 并行提取所有上传文件的文本
+    _extract_uploaded_files(uploaded_files, content_hashes, "testdata/resume", 'Resume', job_id)
+    
+    container = get_container()
+    # 获取之前上传的JD文件
+    active_jds = container.jd_service.get_active_jds()
+    jd_files = list(active_jds.keys())
+    
+    if not jd_files:
+        for filename in uploaded_files:
+            container.job_service.update_file(job_id, filename, "completed")
+        return jd_files, None, None, None
+    
+    # 对所有组合进行评分
+    scoring_results = {}
+    
+    # 记录每份简历还剩多少个JD未评分，用于报告任务进度
+    remaining = {filename: len(jd_files) for filename in uploaded_files}
+    for filename in uploaded_files:
+        container.job_service.update_file(job_id, filename, "scoring")
+    
+    def on_result(jd_file, resume_file, score):
+        container.job_service.add_partial_result(job_id, [jd_file, resume_file], _format_score(score))
+        remaining[resume_file] -= 1
+        if remaining[resume_file] == 0:
+            container.job_service.update_file(job_id, resume_file, "completed")
+    
+    # 并发评分所有(JD, 简历)组合
+    # 只对缺少有效评分的组合调用LLM，其余组合直接使用已保存的评分
+    print(f"Scoring {len(uploaded_files)} resumes against {len(jd_files)} JDs")
+    pair_results = container.resume_service.score_matrix(jd_files, uploaded_files, on_result=on_result)
+    
+    for jd_file in jd_files:
+        jd_scores = {}
+        
+        for resume_file in uploaded_files:
+            jd_scores[resume_file] = _format_score(pair_results.get((jd_file, resume_file)))
+        
+        scoring_results[jd_file] = {
+            "criteria": active_jds.get(jd_file, {}),
+            "scores": jd_scores
+        }
+    
+    # 导出评分结果为Excel
+    export = _export_resume_scores(jd_files, uploaded_files)
+    return jd_files, scoring_results, export, _gate_summary(pair_results.values())
+
+
+
+def _resume_response(uploaded_files, errors, jd_files, scoring_results, export, gate=None):
+    """生成简历上传接口的响应数据"""
+    if not jd_files:
+        return {
+            "status": "success",
+            "message": f"Successfully uploaded {len(uploaded_files)} files, but no JD files found for scoring",
+            "data": {
+                "uploaded_files": uploaded_files,
+                "errors": errors
+            }
+        }
+    
+    return {
+        "status": "success" if uploaded_files else "error",
+        "message": f"Successfully uploaded {len(uploaded_files)} files and scored against {len(jd_files)} JDs" if uploaded_files else "Failed to upload any files",
+        "data": {
+            "uploaded_files": uploaded_files,
+            "errors": errors,
+            "scoring_results": scoring_results,
+            "export": export,
+            "gate": gate
+        }
+    }
+
+
+
+def _job_accepted_response(job_id, uploaded_files, errors):
+    """生成异步模式下上传接口的响应数据"""
+    return {
+        "status": "accepted" if uploaded_files else "error",
+        "message": f"Accepted {len(uploaded_files)} files for background processing" if uploaded_files else "Failed to upload any files",
+        "data": {
+            "job_id": job_id,
+            "uploaded_files": uploaded_files,
+            "errors": errors
+        }
+    }
+
+
+
+def _stream_resume_scores(uploaded_files, errors, content_hashes, stream_format="ndjson", timeout=None):
+    """
+    逐条产出简历评分结果的生成器，每个(JD, 简历)组合评分完成后立即产出
+    
+    消息类型:
+    - start: 上传结果和参与评分的JD
+    - score: 单个组合的评分结果或错误
+    - done: Excel导出结果和词法预过滤统计
+    """
+    def encode(message):
+        line = json.dumps(message, default=str)
+        if stream_format == "sse":
+            return f"event: {message['type']}\ndata: {line}\n\n"
+        return line + "\n"
+    
+    container = get_container()
+    jd_files = list(container.jd_service.get_active_jds().keys())
+    yield encode({
+        "type": "start",
+        "uploaded_files": uploaded_files,
+        "errors": errors,
+        "jd_files": jd_files
+    })
+    
+    # 并行提取所有上传文件的文本
+    _extract_uploaded_files(uploaded_files, content_hashes, "testdata/resume", 'Resume')
+    
+    # 生成器在不同的线程中逐步执行，截止时间显式传给评分
+    deadline = time.monotonic() + timeout if timeout else None
+    export = None
+    gate = None
+    if jd_files:
+        scores = []
+        results = container.resume_service.iter_score_matrix(jd_files, uploaded_files, deadline=deadline)
+        try:
+            for jd_file, resume_file, score in results:
+                scores.append(score)
+                yield encode({
+                    "type": "score",
+                    "jd": jd_file,
+                    "resume": resume_file,
+                    **_format_score(score)
+                })
+        finally:
+            # 客户端断开连接时生成器被关闭，取消尚未开始的评分
+            results.close()
+        
+        export = _export_resume_scores(jd_files, uploaded_files)
+        gate = _gate_summary(scores)
+    
+    yield encode({
+        "type": "done",
+        "export": export,
+        "gate": gate
+    })
+
+
+
 @router.post(
     "/upload-jds",
     response_model=UploadResponse,
@@ -85,7 +589,16 @@ async def upload_jds(
             description="Multiple JD files to upload (PDF/DOCX format)",
             example=["senior_ml_engineer.pdf", "data_scientist.docx"]
         )
-    ]
+    ],
+    async_mode: bool = Query(
+        False,
+        description="Process the files in the background and return a job id immediately"
+    ),
+    timeout: Optional[float] = Query(
+        None,
+        gt=0,
+        description="Deadline in seconds for the LLM calls made while processing the files"
+    )
 ):
     """
     Upload multiple Job Description (JD) files and extract scoring criteria.
@@ -95,10 +608,16 @@ async def upload_jds(
     - Save files to the JD directory
     - Extract text content from files
     - Analyze JDs to identify key requirements
+    - Start a background job that scores the JDs against previously uploaded resumes that
+      have no score for them yet
     - Return extracted criteria for each JD
     
     Parameters:
     - files: List of files to upload (PDF/DOCX format)
+    - async_mode: If true, return a job id immediately and process the files in the
+      background; poll GET /api/jobs/{job_id} for progress and results
+    - timeout: Deadline in seconds for all LLM calls made while processing this upload
+      (defaults to LLM_REQUEST_DEADLINE in config.py); calls that miss it are reported as errors
     
     Returns:
     - status: Success/error status
@@ -107,72 +626,38 @@ async def upload_jds(
         - uploaded_files: List of successfully uploaded files
         - errors: List of any errors encountered
         - criteria: Dictionary of extracted criteria for each JD
+        - scoring: Number of existing resumes, number of (JD, resume) pairs left to score and
+          the id of the background job scoring them (poll GET /api/jobs/{job_id}); with
+          async_mode the pairs are scored within the upload job and the counts are reported
     
     Raises:
     - 400: No files provided or invalid file format
     - 500: Server error during processing
+    - 503: Too many requests in progress, retry later
     """
-    global uploaded_jd_files
-    
     if not files:
         raise HTTPException(status_code=400, detail="No files provided")
     
-    uploaded_files = []
-    errors = []
-    criteria_results = {}
+    uploaded_files, errors, content_hashes = await _save_uploaded_files(files, "testdata/jd")
     
-    # 确保目录存在
-    os.makedirs("testdata/jd", exist_ok=True)
-    
-    for file in files:
-        # 检查文件类型
-        if not file.filename.endswith(('.pdf', '.PDF', '.docx', '.DOCX')):
-            errors.append({
-                "file": file.filename,
-                "error": "Unsupported file format. Only PDF and DOCX are supported."
-            })
-            continue
-        
-        # 保存文件到目标位置
-        file_path = os.path.join("testdata/jd", file.filename)
-        try:
-            # 读取上传文件的内容
-            content = await file.read()
-            
-            # 写入到目标文件
-            with open(file_path, "wb") as f:
-                f.write(content)
-            
-            uploaded_files.append(file.filename)
-        except Exception as e:
-            errors.append({
-                "file": file.filename,
-                "error": str(e)
-            })
-            print(f"Error saving file {file.filename}: {str(e)}")
-            continue
+    container = get_container()
+    # 异步模式：立即返回任务ID，在后台提取文本和分析JD
+    if async_mode and uploaded_files:
+        def run_job(job_id):
+            with deadline_scope(timeout=_request_timeout(timeout)):
+                criteria_results, scoring = _process_jds(uploaded_files, content_hashes, job_id)
+            return {
+                "uploaded_files": uploaded_files,
+                "errors": errors,
+                "criteria": criteria_results,
+                "scoring": scoring
+            }
+        job_id = container.job_service.submit("jd", uploaded_files, run_job)
+        return _job_accepted_response(job_id, uploaded_files, errors)
     
-    # 提取所有上传文件的文本并分析JD
-    for filename in uploaded_files:
-        try:
-            # 构建完整的文件路径
-            file_path = os.path.join("testdata/jd", filename)
-            
-            # 保存原始内容
-            file_service.save_raw_content(file_path, 'JD')
-            
-            # 分析JD并提取评分标准
-            print(f"Calling get_criteria for {filename}")
-            criteria = jd_service.get_criteria(filename)
-            print(f"Criteria for {filename}: {criteria}")
-            criteria_results[filename] = criteria
-            
-            # 将JD文件和评分标准存储到全局变量中
-            uploaded_jd_files[filename] = criteria
-        except Exception as e:
-            print(f"Error getting criteria for {filename}: {str(e)}")
-            import traceback
-            print(traceback.format_exc())
+    # 文本提取、JD分析和评分在线程池中执行，截止时间随上下文传入
+    with deadline_scope(timeout=_request_timeout(timeout)):
+        criteria_results, scoring = await _run_blocking(_process_jds, uploaded_files, content_hashes)
     
     return {
         "status": "success" if uploaded_files else "error",
@@ -180,7 +665,8 @@ async def upload_jds(
         "data": {
             "uploaded_files": uploaded_files,
             "errors": errors,
-            "criteria": criteria_results
+            "criteria": criteria_results,
+            "scoring": scoring
         }
     }
 
@@ -200,7 +686,16 @@ async def upload_resumes(
             description="Multiple resume files to upload (PDF/DOCX format)",
             example=["john_doe_resume.pdf", "jane_smith_resume.docx"]
         )
-    ]
+    ],
+    async_mode: bool = Query(
+        False,
+        description="Process the files in the background and return a job id immediately"
+    ),
+    timeout: Optional[float] = Query(
+        None,
+        gt=0,
+        description="Deadline in seconds for the LLM calls made while processing the files"
+    )
 ):
     """
     Upload multiple resume files and score them against previously uploaded JDs.
@@ -214,6 +709,10 @@ async def upload_resumes(
     
     Parameters:
     - files: List of files to upload (PDF/DOCX format)
+    - async_mode: If true, return a job id immediately and process the files in the
+      background; poll GET /api/jobs/{job_id} for progress and results
+    - timeout: Deadline in seconds for all LLM calls made while processing this upload
+      (defaults to LLM_REQUEST_DEADLINE in config.py); calls that miss it are reported as errors
     
     Returns:
     - status: Success/error status
@@ -228,147 +727,257 @@ async def upload_resumes(
     - 400: No files provided or invalid file format
     - 404: No JDs found for scoring
     - 500: Server error during processing
+    - 503: Too many requests in progress, retry later
     """
-    global uploaded_jd_files
+    if not files:
+        raise HTTPException(status_code=400, detail="No files provided")
+    
+    uploaded_files, errors, content_hashes = await _save_uploaded_files(files, "testdata/resume")
+    
+    container = get_container()
+    # 异步模式：立即返回任务ID，在后台完成提取、评分和导出
+    if async_mode and uploaded_files:
+        def run_job(job_id):
+            with deadline_scope(timeout=_request_timeout(timeout)):
+                return _resume_response(
+                    uploaded_files, errors, *_process_resumes(uploaded_files, content_hashes, job_id)
+                )
+        job_id = container.job_service.submit("resume", uploaded_files, run_job)
+        return _job_accepted_response(job_id, uploaded_files, errors)
     
+    def process():
+        return _resume_response(
+            uploaded_files, errors, *_process_resumes(uploaded_files, content_hashes)
+        )
+    
+    # 文本提取、评分和Excel导出在线程池中执行，截止时间随上下文传入
+    with deadline_scope(timeout=_request_timeout(timeout)):
+        return await _run_blocking(process)
+
+
+
+@router.post(
+    "/upload-resumes/stream",
+    summary="Upload resumes and stream scores as they complete",
+    description="Upload multiple resume files and stream each (JD, resume) score as newline-delimited JSON or Server-Sent Events.",
+    response_description="A stream of start, score and done messages"
+)
+async def upload_resumes_stream(
+    files: Annotated[
+        List[UploadFile],
+        File(
+            description="Multiple resume files to upload (PDF/DOCX format)",
+            example=["john_doe_resume.pdf", "jane_smith_resume.docx"]
+        )
+    ],
+    stream_format: Literal["ndjson", "sse"] = Query(
+        "ndjson",
+        description="Stream format: newline-delimited JSON or Server-Sent Events"
+    ),
+    timeout: Optional[float] = Query(
+        None,
+        gt=0,
+        description="Deadline in seconds for the LLM calls made while scoring"
+    )
+):
+    """
+    Upload multiple resume files and stream their scores against previously uploaded JDs.
+    
+    Each message is a JSON object with a "type" field:
+    - start: uploaded_files, errors and the jd_files the resumes are scored against
+    - score: jd, resume and either total_score/detailed_scores or error, sent as soon as
+      the score for that pair is available
+    - done: export details of the Excel report (null if no JDs were uploaded)
+    
+    Parameters:
+    - files: List of files to upload (PDF/DOCX format)
+    - stream_format: "ndjson" (application/x-ndjson) or "sse" (text/event-stream)
+    - timeout: Deadline in seconds for all LLM calls made while scoring (defaults to
+      LLM_REQUEST_DEADLINE in config.py); pairs that miss it are streamed as errors
+    
+    Raises:
+    - 400: No files provided
+    - 503: Too many requests in progress, retry later
+    """
     if not files:
         raise HTTPException(status_code=400, detail="No files provided")
     
-    uploaded_files = []
-    errors = []
+    # 在开始响应之前保存上传的文件
+    uploaded_files, errors, content_hashes = await _save_uploaded_files(files, "testdata/resume")
     
-    # 确保目录存在
-    os.makedirs("testdata/resume", exist_ok=True)
-    os.makedirs("scores", exist_ok=True)
+    messages = _stream_resume_scores(uploaded_files, errors, content_hashes, stream_format,
+                                     _request_timeout(timeout))
+    # 整个流占用一个线程池名额，在开始响应之前取第一条消息（队列已满时返回503）
+    pages = get_container().work_pool.iterate(messages)
+    try:
+        first = await pages.__anext__()
+    except WorkPoolFull as e:
+        messages.close()
+        raise HTTPException(status_code=503, detail=str(e))
     
-    for file in files:
-        # 检查文件类型
-        if not file.filename.endswith(('.pdf', '.PDF', '.docx', '.DOCX')):
-            errors.append({
-                "file": file.filename,
-                "error": "Unsupported file format. Only PDF and DOCX are supported."
-            })
-            continue
-        
-        # 保存文件到目标位置
-        file_path = os.path.join("testdata/resume", file.filename)
+    async def stream():
         try:
-            # 读取上传文件的内容
-            content = await file.read()
-            
-            # 写入到目标文件
-            with open(file_path, "wb") as f:
-                f.write(content)
-            
-            uploaded_files.append(file.filename)
-        except Exception as e:
-            errors.append({
-                "file": file.filename,
-                "error": str(e)
-            })
-            print(f"Error saving file {file.filename}: {str(e)}")
-            continue
+            yield first
+            async for message in pages:
+                yield message
+        finally:
+            # 响应结束或客户端断开时关闭消息生成器，释放名额并停止剩余的评分
+            await pages.aclose()
     
-    # 提取所有上传文件的文本
-    for filename in uploaded_files:
-        try:
-            # 构建完整的文件路径
-            file_path = os.path.join("testdata/resume", filename)
-            
-            # 保存原始内容
-            file_service.save_raw_content(file_path, 'Resume')
-        except Exception as e:
-            print(f"Error extracting text from {filename}: {str(e)}")
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        stream(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+
+@router.get(
+    "/ready",
+    response_model=ReadyResponse,
+    summary="Readiness check",
+    description="Report whether the startup warm-up has finished and the service is ready for traffic.",
+    response_description="Returns the warm-up statistics once the service is ready"
+)
+async def ready():
+    """
+    Readiness probe for load balancers and deploy scripts.
     
-    # 获取之前上传的JD文件
-    jd_files = list(uploaded_jd_files.keys())
+    At startup the service loads the active JDs and their criteria, opens the LLM cache and
+    imports the model client and Excel writer before it accepts requests. If that warm-up
+    failed this endpoint returns 503 with the error, so traffic is only routed to warm instances.
     
-    if not jd_files:
-        return {
-            "status": "success",
-            "message": f"Successfully uploaded {len(uploaded_files)} files, but no JD files found for scoring",
-            "data": {
-                "uploaded_files": uploaded_files,
-                "errors": errors
-            }
-        }
+    Returns:
+    - status: Success/error status
+    - message: Operation result message
+    - data: Warm-up statistics (number of active JDs, LLM cache entries and the warm-up
+      time in seconds)
     
-    # 对所有组合进行评分
-    scoring_results = {}
+    Raises:
+    - 503: Warm-up has not finished or failed
+    """
+    container = get_container()
+    if not container.ready:
+        error = (container.warm_stats or {}).get('error')
+        raise HTTPException(status_code=503, detail=f"Warm-up failed: {error}" if error else "Warming up")
     
-    # 清除之前的评分结果，确保只保留新的评分
-    if os.path.exists(file_service.scores_path):
-        try:
-            df = pd.read_csv(file_service.scores_path)
-            # 只保留不涉及当前上传简历的评分
-            df = df[~df['resume_name'].isin(uploaded_files)]
-            df.to_csv(file_service.scores_path, index=False)
-        except Exception as e:
-            print(f"Error clearing previous scores: {str(e)}")
+    return {
+        "status": "success",
+        "message": "Ready",
+        "data": container.warm_stats
+    }
+
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=JobStatusResponse,
+    summary="Get background job status",
+    description="Get the progress, partial results and final result of a background upload job.",
+    response_description="Returns per-file progress, partial results and the final result"
+)
+async def get_job(job_id: str):
+    """
+    Get the status of a job created by an upload endpoint with async_mode=true.
     
-    for jd_file in jd_files:
-        print(f"Processing JD: {jd_file}")
-        jd_scores = {}
-        
-        for resume_file in uploaded_files:
-            print(f"  Scoring resume: {resume_file}")
-            try:
-                # 评分
-                score = resume_service.score_resume(resume_file, jd_file)
-                
-                # 获取JD的评分标准
-                jd_criteria = uploaded_jd_files.get(jd_file, {})
-                
-                jd_scores[resume_file] = {
-                    "total_score": score.get("total_score", 0),
-                    "detailed_scores": score.get("detailed_scores", {})
-                }
-            except Exception as e:
-                jd_scores[resume_file] = {
-                    "error": str(e)
-                }
-                print(f"  Error scoring resume {resume_file} against JD {jd_file}: {str(e)}")
-        
-        scoring_results[jd_file] = {
-            "criteria": uploaded_jd_files.get(jd_file, {}),
-            "scores": jd_scores
-        }
+    Returns:
+    - status: Success/error status
+    - message: Operation result message
+    - data: Dictionary containing:
+        - status: queued, running, completed or failed
+        - files: Processing status of each uploaded file
+        - progress: Number of processed files out of the total
+        - partial_results: Criteria (JD jobs) or scores (resume jobs) available so far
+        - result: Same data as the synchronous endpoint once the job is completed,
+          including the Excel report path for resume jobs
+        - error: Error message if the job failed
     
-    # 导出评分结果为Excel
-    try:
-        # 生成Excel文件名
-        candidates = "_".join([os.path.splitext(f)[0] for f in uploaded_files])
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        excel_filename = f"scores_{candidates}_{timestamp}.xlsx"
-        excel_path = os.path.join("scores", excel_filename)
-        
-        # 导出评分结果，只导出当前上传的简历文件的评分
-        excel_file = resume_service.export_scores_to_excel(
-            jd_files=jd_files,
-            resume_files=uploaded_files,
-            output_path=excel_path
-        )
-        export_success = True
-        export_path = excel_file
-    except Exception as e:
-        export_success = False
-        export_path = None
-        print(f"Error exporting scores to Excel: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
+    Raises:
+    - 404: Job not found
+    """
+    container = get_container()
+    job = container.job_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
     
     return {
-        "status": "success" if uploaded_files else "error",
-        "message": f"Successfully uploaded {len(uploaded_files)} files and scored against {len(jd_files)} JDs" if uploaded_files else "Failed to upload any files",
-        "data": {
-            "uploaded_files": uploaded_files,
-            "errors": errors,
-            "scoring_results": scoring_results,
-            "export": {
-                "success": export_success,
-                "path": export_path
-            }
-        }
+        "status": "success",
+        "message": f"Job is {job['status']}",
+        "data": job
     }
 
 
+
+@router.get(
+    "/jds/{jd_name}/shortlist",
+    response_model=ShortlistResponse,
+    summary="Shortlist resumes for a JD",
+    description="Retrieve the resumes most relevant to a JD's criteria with BM25 over the resume index.",
+    response_description="Returns the top-K resumes ranked by BM25 score"
+)
+async def shortlist_resumes(
+    jd_name: str,
+    top_k: int = Query(
+        config.SHORTLIST_TOP_K,
+        gt=0,
+        description="Number of resumes to return"
+    ),
+    score: bool = Query(
+        False,
+        description="Score the shortlisted resumes against the JD with the LLM"
+    )
+):
+    """
+    Shortlist candidate resumes for a previously uploaded JD.
+    
+    The JD's criteria are matched against an inverted index of all stored resumes, so
+    only the shortlist needs to be sent to the LLM scorer.
+    
+    Parameters:
+    - jd_name: File name of an uploaded JD
+    - top_k: Number of resumes to return
+    - score: If true, also score the shortlisted resumes (pairs that already have a
+      current score are not sent to the LLM again)
+    
+    Returns:
+    - status: Success/error status
+    - message: Operation result message
+    - data: Dictionary containing:
+        - jd: JD file name
+        - top_k: Requested number of resumes
+        - candidates: Resume names with their BM25 scores, best match first
+        - scores: Scoring results of the shortlisted resumes if score=true
+    
+    Raises:
+    - 404: JD not found
+    - 503: Too many requests in progress, retry later
+    """
+    container = get_container()
+    if await _run_blocking(container.file_service.store.get_raw_content, DocType.JD, jd_name) is None:
+        raise HTTPException(status_code=404, detail=f"JD not found: {jd_name}")
+    
+    def process():
+        candidates = container.resume_service.shortlist(jd_name, top_k)
+        scores = None
+        if score and candidates:
+            resume_files = [candidate["resume_name"] for candidate in candidates]
+            pair_results = container.resume_service.score_matrix([jd_name], resume_files)
+            scores = {
+                resume_file: _format_score(pair_results.get((jd_name, resume_file)))
+                for resume_file in resume_files
+            }
+        return candidates, scores
+    
+    candidates, scores = await _run_blocking(process)
+    
+    return {
+        "status": "success",
+        "message": f"Found {len(candidates)} candidate resumes for {jd_name}",
+        "data": {
+            "jd": jd_name,
+            "top_k": top_k,
+            "candidates": candidates,
+            "scores": scores
+        }
+    }
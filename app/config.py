@@ -8,10 +8,104 @@ GEMINI_MAX_OUTPUT_TOKENS = 1024  # 最大输出长度
 GEMINI_TOP_P = 0.95  # 控制输出的多样性
 GEMINI_TOP_K = 40  # 控制输出的多样性
 
+# LLM provider: "gemini"（调用Gemini API）或 "stub"（离线的确定性模拟模型，用于测试和性能测试）
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "gemini")
+# stub provider的模拟延迟（秒）、延迟抖动（秒）、失败率和随机种子
+STUB_LATENCY = 0.0
+STUB_JITTER = 0.0
+STUB_FAILURE_RATE = 0.0
+STUB_SEED = None
+
+# LLM调用限流配置（所有provider共用）：每分钟请求数和token数上限，应与API配额一致，None表示不限制
+LLM_RATE_LIMIT_ENABLED = True
+LLM_REQUESTS_PER_MINUTE = 60
+LLM_TOKENS_PER_MINUTE = 1000000
+# 临时错误（429、5xx、超时）的重试次数，以及带抖动的指数退避的基础/最大等待时间（秒）
+LLM_MAX_RETRIES = 5
+LLM_RETRY_BASE_DELAY = 1.0
+LLM_RETRY_MAX_DELAY = 30.0
+# 自适应并发（AIMD）：同时进行的调用数上限在成功时逐步增加，被限流时减半
+LLM_INITIAL_CONCURRENCY = 4
+LLM_MIN_CONCURRENCY = 1
+LLM_MAX_CONCURRENCY = 16
+
+# LLM调用超时配置：单次调用的超时时间（秒），以及上传接口中所有LLM调用的默认截止时间（秒，可通过timeout参数指定），None表示不限制
+LLM_CALL_TIMEOUT = 120
+LLM_REQUEST_DEADLINE = None
+# 对冲请求：调用时间超过最近调用延迟的分位数（默认p95）时发起一个相同的请求，取先返回的结果
+LLM_HEDGING_ENABLED = False
+LLM_HEDGE_QUANTILE = 0.95
+LLM_HEDGE_MIN_SAMPLES = 20
+LLM_HEDGE_MAX_THREADS = 32
+
+# 并发评分配置：同时进行的LLM评分调用数上限
+SCORING_MAX_WORKERS = 8
+
+# 批量评分配置：每个请求最多包含的简历数（1表示不批量）和每个请求的prompt token预算
+SCORING_BATCH_SIZE = 1
+SCORING_BATCH_TOKEN_BUDGET = 12000
+
+# 批量提取criteria配置：每个请求最多包含的JD数和每个请求的prompt token预算
+CRITERIA_BATCH_SIZE = 6
+CRITERIA_BATCH_TOKEN_BUDGET = 12000
+
+# 内存中最多缓存的criteria数（每个JD版本一条）
+CRITERIA_MEMORY_CACHE_SIZE = 1024
+
+# 上传新的JD后，是否对已有简历中缺少评分的部分自动评分
+SCORE_NEW_JDS_AGAINST_RESUMES = True
+
+# 文本提取进程池大小，None表示使用全部CPU核心
+EXTRACTION_MAX_WORKERS = None
+# 文本提取进程的启动方式：服务进程中有多个线程，fork可能导致子进程死锁，使用spawn（或forkserver）
+EXTRACTION_START_METHOD = "spawn"
+
+# 后台任务配置：同时处理的上传任务数，以及内存中保留的任务记录数
+JOB_MAX_WORKERS = 2
+JOB_HISTORY_LIMIT = 100
+
+# 请求中阻塞工作（文本提取、LLM调用、存储和导出）的线程池大小，以及排队等待的请求数上限（超过时返回503）
+REQUEST_MAX_WORKERS = 8
+REQUEST_MAX_QUEUED = 32
+
+# 上传文件分块写入磁盘的块大小，以及单个文件和单个请求的大小上限（字节）
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_MAX_FILE_BYTES = 20 * 1024 * 1024
+UPLOAD_MAX_REQUEST_BYTES = 200 * 1024 * 1024
+
 # 文件路径配置
 DATA_DIR = "data"
 RAW_JD_PATH = os.path.join(DATA_DIR, "raw_jd.csv")
 RAW_RESUME_PATH = os.path.join(DATA_DIR, "raw_resume.csv")
 JD_ANALYSIS_PATH = os.path.join(DATA_DIR, "jd_analysis.csv")
 RESUME_ANALYSIS_PATH = os.path.join(DATA_DIR, "resume_analysis.csv")
-SCORES_PATH = os.path.join(DATA_DIR, "scores.csv") 
\ No newline at end of file
+SCORES_PATH = os.path.join(DATA_DIR, "scores.csv")
+CRITERION_SCORES_PATH = os.path.join(DATA_DIR, "criterion_scores.csv")
+
+# 存储后端配置: "sqlite"（默认，带索引的事务型数据库）或 "csv"（兼容旧版数据文件）
+STORAGE_BACKEND = "sqlite"
+SQLITE_DB_PATH = os.path.join(DATA_DIR, "resume_scoring.db")
+
+# LLM响应缓存配置：按(模型, 生成参数, prompt哈希)缓存到磁盘，超过上限时按LRU淘汰
+LLM_CACHE_ENABLED = True
+LLM_CACHE_PATH = os.path.join(DATA_DIR, "llm_cache.db")
+LLM_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+# 结构化输出：请求模型按JSON schema返回结果（Gemini需要google-generativeai>=0.7），
+# 响应无法解析或不符合schema时，最多发送LLM_JSON_REPAIR_ATTEMPTS次修复请求
+LLM_STRUCTURED_OUTPUT = True
+LLM_JSON_REPAIR_ATTEMPTS = 1
+
+# 按(简历内容哈希, 规范化的criterion)缓存单项评分，不同JD中相同的criterion不再重复评分
+CRITERION_MEMO_ENABLED = True
+
+# 词法预过滤：简历中出现的JD criteria关键词比例低于阈值时不调用模型，所有criteria直接记为0分
+LEXICAL_GATE_ENABLED = False
+LEXICAL_GATE_THRESHOLD = 0.1
+# 本地评分和词法预过滤在内存中最多缓存的简历词集合数（每个简历版本一条）
+LOCAL_TERMS_CACHE_SIZE = 10000
+
+# 简历倒排索引的BM25参数，以及候选人初筛默认返回的简历数
+BM25_K1 = 1.2
+BM25_B = 0.75
+SHORTLIST_TOP_K = 50
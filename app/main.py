@@ -3,14 +3,28 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
 import uvicorn
 import os
+import asyncio
+from contextlib import asynccontextmanager
 
 from app.api.routes import router
+from app.services.container import get_container
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动时预热缓存，完成之后才开始接受请求（预热中导入pandas/openpyxl不能与处理请求时的导入并发进行）
+    await asyncio.get_running_loop().run_in_executor(None, get_container().warm_up)
+    yield
+    # 关闭文本提取进程池
+    get_container().shutdown()
+
 
 # 创建FastAPI应用
 app = FastAPI(
     title="Resume Ranking API",
     description="API for ranking resumes against job descriptions",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 设置CORS
@@ -2,5 +2,7 @@
 from app.services.file_service import FileService
 from app.services.jd_service import JDService
 from app.services.resume_service import ResumeService
+from app.services.job_service import JobService
+from app.services.container import ServiceContainer, get_container
 
-__all__ = ['FileService', 'JDService', 'ResumeService'] 
\ No newline at end of file
+__all__ = ['FileService', 'JDService', 'ResumeService', 'JobService', 'ServiceContainer', 'get_container'] 
\ No newline at end of file
@@ -0,0 +1,98 @@
+import time
+import threading
+from typing import Optional
+
+from app.services.file_service import ExtractionPool, FileService
+from app.services.jd_service import JDService
+from app.services.resume_service import ResumeService
+from app.services.job_service import JobService
+from app.services.llm_cache import CachedModel, create_llm_cache
+from app.services.llm_provider import create_provider, load_provider
+from app.services.storage import create_store
+from app.services.work_pool import WorkPool
+
+
+class ServiceContainer:
+    """Application-scoped owner of the shared clients and services.
+
+    Builds one store, one LLM provider, one cached model and one instance of
+    each service, and injects them into each other, so the API and the CLI
+    share a single model client, database connection pool and set of caches
+    instead of every service creating its own.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, provider=None, store=None, model=None):
+        self.store = store or create_store()
+        # LLM provider由config.LLM_PROVIDER选择（Gemini或离线stub），所有服务共用
+        self.provider = provider or create_provider(api_key=api_key)
+        # 模型响应缓存在磁盘上，JD分析和简历评分共用同一个缓存
+        self.model = model or CachedModel(
+            self.provider,
+            model_name=self.provider.model_name,
+            generation_config=self.provider.generation_config,
+            cache=create_llm_cache()
+        )
+
+        # 文本提取进程池在服务的整个生命周期内复用，由shutdown()关闭
+        self.extraction_pool = ExtractionPool()
+        self.file_service = FileService(store=self.store, extraction_pool=self.extraction_pool)
+        self.jd_service = JDService(provider=self.provider, file_service=self.file_service, model=self.model)
+        self.resume_service = ResumeService(provider=self.provider, file_service=self.file_service,
+                                            jd_service=self.jd_service, model=self.model)
+        # 任务状态写入存储，轮询请求到达其他worker进程时同样可以查询
+        self.job_service = JobService(store=self.store)
+        # API请求中的阻塞工作在这个有界线程池中执行，不占用事件循环
+        self.work_pool = WorkPool()
+        
+        # warm_up()成功完成后为True，/api/ready据此报告服务是否就绪
+        self.ready = False
+        self.warm_stats = None
+
+    def warm_up(self) -> dict:
+        """
+        Load what the first requests would otherwise read cold.
+        
+        Reads the active JDs and their criteria into JDService's in-memory caches, opens the LLM
+        response cache, creates the model client and imports pandas and the Excel writer. Runs
+        in the application lifespan before the first request is served. The container is marked
+        ready only if every step succeeded; a failure is recorded in the returned stats.
+        
+        Returns:
+            Counts of the loaded items and the warm-up time in seconds
+        """
+        start = time.perf_counter()
+        stats = {}
+        try:
+            active = self.jd_service.get_active_jds()
+            stats['active_jds'] = len(active)
+            if self.model.cache is not None:
+                stats['llm_cache_entries'] = self.model.cache.stats()['entries']
+            # 模型客户端、pandas和openpyxl都在第一次使用时才导入，预热时提前导入
+            load_provider(self.provider)
+            import pandas  # noqa: F401
+            import openpyxl  # noqa: F401
+        except Exception as e:
+            print(f"Error warming up caches: {str(e)}")
+            stats['error'] = str(e)
+        stats['seconds'] = round(time.perf_counter() - start, 3)
+        self.warm_stats = stats
+        self.ready = 'error' not in stats
+        print(f"Warm-up finished: {stats}")
+        return stats
+
+    def shutdown(self) -> None:
+        """关闭容器持有的工作进程"""
+        self.extraction_pool.shutdown()
+
+
+_container = None
+_container_lock = threading.Lock()
+
+
+def get_container() -> ServiceContainer:
+    """进程内共享的服务容器，首次调用时创建"""
+    global _container
+    with _container_lock:
+        if _container is None:
+            _container = ServiceContainer()
+        return _container
@@ -1,112 +1,349 @@
 import os
-from typing import Literal, Tuple
-import pandas as pd
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from typing import Dict, List, Literal, Optional, Tuple, Union
 from datetime import datetime
-import PyPDF2
-from docx import Document
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import re
+from app.services.storage import create_store
+from app import config
+
+
+def clean_text(text: str) -> str:
+    """清理文本，去除乱码和特殊字符"""
+    # 1. 替换常见的Unicode控制字符和不可打印字符
+    text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F]', '', text)
+    
+    # 2. 替换特殊的Unicode字符（如特殊符号、表情符号等）
+    text = re.sub(r'[^\x00-\x7F]+', ' ', text)
+    
+    # 3. 替换多个空格为单个空格
+    text = re.sub(r'\s+', ' ', text)
+    
+    # 4. 替换多个换行为单个换行
+    text = re.sub(r'\n+', '\n', text)
+    
+    # 5. 去除行首和行尾的空白字符
+    text = re.sub(r'^\s+|\s+$', '', text, flags=re.MULTILINE)
+    
+    return text.strip()
+
+
+def extract_text_from_file(file_path: str) -> str:
+    """Extract text content from PDF or DOCX file"""
+    # 模块级函数，可以在进程池中执行
+    file_extension = os.path.splitext(file_path)[1].lower()
+    
+    # 解析库只在第一次解析对应格式的文件时导入
+    if file_extension == '.pdf':
+        import PyPDF2
+        
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            text = ''
+            for page in pdf_reader.pages:
+                text += page.extract_text()
+            return clean_text(text.strip())
+    
+    elif file_extension == '.docx':
+        from docx import Document
+        
+        doc = Document(file_path)
+        text = '\n'.join([paragraph.text for paragraph in doc.paragraphs])
+        return clean_text(text.strip())
+    
+    else:
+        raise ValueError(f"Unsupported file format: {file_extension}")
+
+
+class ExtractionPool:
+    """Long-lived process pool for text extraction.
+
+    Worker processes are started on first use and reused until shutdown().
+    They are created with config.EXTRACTION_START_METHOD (spawn by default)
+    rather than fork, because the server process is already running request,
+    hedging and SQLite threads and forking it can deadlock the children.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, start_method: Optional[str] = None):
+        self.max_workers = max_workers or config.EXTRACTION_MAX_WORKERS or os.cpu_count() or 1
+        self.start_method = start_method or config.EXTRACTION_START_METHOD
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(self.start_method)
+                )
+            return self._executor
+
+    def map(self, func, items: List) -> Dict:
+        """在进程池中对每一项执行func，返回{item: 结果或异常对象}"""
+        executor = self._get_executor()
+        futures = {item: executor.submit(func, item) for item in items}
+        results = {}
+        for item, future in futures.items():
+            try:
+                results[item] = future.result()
+            except BrokenProcessPool as e:
+                # 工作进程异常退出后进程池不可再用，下次调用时重新创建
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = None
+                results[item] = e
+            except Exception as e:
+                results[item] = e
+        return results
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭工作进程，之后再次使用时重新启动"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload stream exceeds its size limit."""
+
+
+def _write_chunk(file, hasher, chunk: bytes) -> None:
+    hasher.update(chunk)
+    file.write(chunk)
+
+
+async def _call(run, func, *args):
+    if run is None:
+        return func(*args)
+    return await run(func, *args)
+
+
+async def stream_to_file(source,
+                         file_path: str,
+                         max_bytes: Optional[int] = None,
+                         run=None,
+                         chunk_size: Optional[int] = None) -> Tuple[str, int]:
+    """
+    Stream an upload to disk in fixed-size chunks.
+    
+    The content is written to a temporary file next to file_path while its SHA-256 hash and
+    size are computed, and the temporary file is renamed to file_path only once the whole
+    stream has been written, so readers never see a partial file and memory use does not
+    depend on the file size.
+    
+    Args:
+        source: Object with an async read(size) method, e.g. a FastAPI UploadFile
+        file_path: Destination path
+        max_bytes: Size limit; the upload is aborted as soon as it is exceeded
+        run: Async runner for blocking calls (e.g. WorkPool.run), None to call them directly
+        chunk_size: Bytes read per chunk, defaults to config.UPLOAD_CHUNK_SIZE
+    
+    Returns:
+        (SHA-256 hash of the content, size in bytes)
+    
+    Raises:
+        UploadTooLarge: The stream exceeded max_bytes; nothing is written to file_path
+    """
+    chunk_size = chunk_size or config.UPLOAD_CHUNK_SIZE
+    hasher = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path) or ".", prefix=".upload-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = await source.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise UploadTooLarge(f"File exceeds the upload size limit of {max_bytes} bytes")
+                await _call(run, _write_chunk, f, hasher, chunk)
+        # 写完后原子地替换目标文件
+        await _call(run, os.replace, temp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return hasher.hexdigest(), size
+
 
 class FileService:
-    def __init__(self):
-        # 使用CSV文件替代Excel
-        self.raw_jd_path = "data/raw_jd.csv"
-        self.raw_resume_path = "data/raw_resume.csv"
-        self.jd_analysis_path = "data/jd_analysis.csv"
-        self.resume_analysis_path = "data/resume_analysis.csv"
-        self.scores_path = "data/scores.csv"
-        self._init_csv_files()
-
-    def _init_csv_files(self):
-        """Initialize CSV files if they don't exist"""
-        os.makedirs("data", exist_ok=True)
-        
-        # 创建所需的CSV文件
-        files_and_columns = {
-            self.raw_jd_path: ['file_name', 'content', 'extracted_at'],
-            self.raw_resume_path: ['file_name', 'content', 'extracted_at'],
-            self.jd_analysis_path: ['file_name', 'criteria', 'analyzed_at'],
-            self.resume_analysis_path: ['file_name', 'candidate_name', 'skills', 'analyzed_at'],
-            self.scores_path: ['resume_name', 'jd_name', 'scores', 'total_score', 'scored_at']
-        }
-        
-        for file_path, columns in files_and_columns.items():
-            if not os.path.exists(file_path):
-                pd.DataFrame(columns=columns).to_csv(file_path, index=False)
+    def __init__(self, store=None, extraction_pool=None):
+        # 原始CSV文件路径（CSV后端直接使用，SQLite后端首次启动时从中迁移数据）
+        self.raw_jd_path = config.RAW_JD_PATH
+        self.raw_resume_path = config.RAW_RESUME_PATH
+        self.jd_analysis_path = config.JD_ANALYSIS_PATH
+        self.resume_analysis_path = config.RESUME_ANALYSIS_PATH
+        self.scores_path = config.SCORES_PATH
+        os.makedirs(config.DATA_DIR, exist_ok=True)
+        self.store = store or create_store()
+        # 由ServiceContainer创建时与其他服务共用，进程在第一次批量提取时才启动
+        self.extraction_pool = extraction_pool or ExtractionPool()
 
     def clean_text(self, text: str) -> str:
         """清理文本，去除乱码和特殊字符"""
-        # 1. 替换常见的Unicode控制字符和不可打印字符
-        text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F]', '', text)
+        return clean_text(text)
+
+    def extract_text_from_file(self, file_path: str) -> str:
+        """Extract text content from PDF or DOCX file"""
+        return extract_text_from_file(file_path)
+
+    def extract_many(self,
+                     file_paths: List[str],
+                     max_workers: Optional[int] = None) -> Dict[str, Union[str, Exception]]:
+        """
+        Extract text from many files in parallel on the extraction process pool.
         
-        # 2. 替换特殊的Unicode字符（如特殊符号、表情符号等）
-        text = re.sub(r'[^\x00-\x7F]+', ' ', text)
+        Args:
+            file_paths: Paths of PDF/DOCX files
+            max_workers: 1 to extract in the calling process; otherwise the files are spread
+                         over the extraction pool (config.EXTRACTION_MAX_WORKERS processes)
         
-        # 3. 替换多个空格为单个空格
-        text = re.sub(r'\s+', ' ', text)
+        Returns:
+            Dictionary mapping each path to its text, or to the exception raised while parsing it
+        """
+        results = {}
+        if not file_paths:
+            return results
         
-        # 4. 替换多个换行为单个换行
-        text = re.sub(r'\n+', '\n', text)
+        max_workers = max_workers or self.extraction_pool.max_workers
         
-        # 5. 去除行首和行尾的空白字符
-        text = re.sub(r'^\s+|\s+$', '', text, flags=re.MULTILINE)
+        # 单个文件不值得交给进程池
+        if max_workers == 1 or len(file_paths) == 1:
+            for file_path in file_paths:
+                try:
+                    results[file_path] = self.extract_text_from_file(file_path)
+                except Exception as e:
+                    results[file_path] = e
+            return results
         
-        return text.strip()
+        return self.extraction_pool.map(extract_text_from_file, file_paths)
 
-    def extract_text_from_file(self, file_path: str) -> str:
-        """Extract text content from PDF or DOCX file"""
-        file_extension = os.path.splitext(file_path)[1].lower()
-        
-        if file_extension == '.pdf':
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ''
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
-                return self.clean_text(text.strip())
-                
-        elif file_extension == '.docx':
-            doc = Document(file_path)
-            text = '\n'.join([paragraph.text for paragraph in doc.paragraphs])
-            return self.clean_text(text.strip())
-            
-        else:
-            raise ValueError(f"Unsupported file format: {file_extension}")
+    def compute_file_hash(self, file_path: str) -> str:
+        """计算文件内容的SHA-256哈希"""
+        sha256 = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    def _needs_extraction(self,
+                          file_name: str,
+                          doc_type: Literal['JD', 'Resume'],
+                          content_hash: str) -> bool:
+        """判断文件是否需要重新解析"""
+        if self.store.get_raw_hash(doc_type, file_name) == content_hash:
+            return False
+        return self.store.find_raw_content_by_hash(doc_type, content_hash) is None
 
     def save_raw_content(self, 
                         file_path: str, 
-                        doc_type: Literal['JD', 'Resume']) -> None:
-        """Save extracted content to CSV"""
-        content = self.extract_text_from_file(file_path)
+                        doc_type: Literal['JD', 'Resume'],
+                        content_hash: Optional[str] = None,
+                        content: Optional[str] = None) -> bool:
+        """
+        Save extracted content to the document store.
+        
+        Files are identified by the SHA-256 of their bytes: an unchanged file is
+        not parsed again, and a changed file invalidates only its own criteria,
+        candidate info and scores.
+        
+        Args:
+            file_path: Path of the uploaded file
+            doc_type: 'JD' or 'Resume'
+            content_hash: SHA-256 of the file bytes, computed from the file if not given
+            content: Text already extracted from the file, if any
+        
+        Returns:
+            True if the content was (re-)extracted, False if it was already stored
+        """
         file_name = os.path.basename(file_path)
+        content_hash = content_hash or self.compute_file_hash(file_path)
+        
+        stored_hash = self.store.get_raw_hash(doc_type, file_name)
+        if stored_hash == content_hash:
+            return False
         
-        new_row = pd.DataFrame([{
-            'file_name': file_name,
-            'content': content,
-            'extracted_at': datetime.now()
-        }])
-        
-        # 选择正确的CSV文件
-        csv_path = self.raw_jd_path if doc_type == 'JD' else self.raw_resume_path
-        
-        # 读取现有数据
-        if os.path.exists(csv_path):
-            df = pd.read_csv(csv_path)
-            df = pd.concat([df, new_row], ignore_index=True)
-        else:
-            df = new_row
-            
-        # 保存回CSV
-        df.to_csv(csv_path, index=False)
+        # 相同内容的其他文件已经解析过时，直接复用提取的文本
+        if content is None:
+            content = self.store.find_raw_content_by_hash(doc_type, content_hash)
+        if content is None:
+            content = self.extract_text_from_file(file_path)
+        
+        # 同名文件内容发生变化时，使其派生数据失效（旧数据没有哈希，按文本比较）
+        previous = self.store.get_raw_content(doc_type, file_name)
+        if previous is not None and (stored_hash is not None or previous[0] != content):
+            self.store.invalidate_derived(doc_type, file_name)
+        
+        self.store.save_raw_content(doc_type, file_name, content, datetime.now(), content_hash)
+        return True
+
+    def save_raw_contents(self,
+                          file_paths: List[str],
+                          doc_type: Literal['JD', 'Resume'],
+                          content_hashes: Optional[Dict[str, str]] = None,
+                          max_workers: Optional[int] = None) -> Dict[str, Union[bool, Exception]]:
+        """
+        Batch version of save_raw_content.
+        
+        Only files whose content is not stored yet are parsed, in parallel via extract_many.
+        
+        Args:
+            file_paths: Paths of the uploaded files
+            doc_type: 'JD' or 'Resume'
+            content_hashes: Optional mapping of path to SHA-256 of the file bytes
+            max_workers: 1 to extract in the calling process instead of the extraction pool
+        
+        Returns:
+            Dictionary mapping each path to the result of save_raw_content,
+            or to the exception raised while processing it
+        """
+        content_hashes = dict(content_hashes or {})
+        results = {}
+        pending = []
+        for file_path in file_paths:
+            try:
+                if not content_hashes.get(file_path):
+                    content_hashes[file_path] = self.compute_file_hash(file_path)
+                pending.append(file_path)
+            except Exception as e:
+                results[file_path] = e
+        
+        to_extract = [
+            file_path for file_path in pending
+            if self._needs_extraction(os.path.basename(file_path), doc_type, content_hashes[file_path])
+        ]
+        extracted = self.extract_many(to_extract, max_workers=max_workers)
+        
+        for file_path in pending:
+            content = extracted.get(file_path)
+            if isinstance(content, Exception):
+                results[file_path] = content
+                continue
+            try:
+                results[file_path] = self.save_raw_content(
+                    file_path, doc_type, content_hashes[file_path], content=content
+                )
+            except Exception as e:
+                results[file_path] = e
+        
+        return results
 
     def get_raw_content(self, 
                        file_name: str, 
                        doc_type: Literal['JD', 'Resume']) -> Tuple[str, datetime]:
-        """Get content and extraction time from CSV"""
-        csv_path = self.raw_jd_path if doc_type == 'JD' else self.raw_resume_path
-        df = pd.read_csv(csv_path)
-        result = df[df['file_name'] == file_name]
+        """Get content and extraction time from the document store"""
+        result = self.store.get_raw_content(doc_type, file_name)
         
-        if result.empty:
+        if result is None:
             raise ValueError(f"No content found for file: {file_name}")
-            
-        return result.iloc[0]['content'], pd.to_datetime(result.iloc[0]['extracted_at']) 
\ No newline at end of file
+        
+        return result
@@ -0,0 +1,232 @@
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional
+
+from app import config
+
+# 当前LLM调用的截止时间（time.monotonic()），None表示没有截止时间
+_deadline = contextvars.ContextVar('llm_deadline', default=None)
+# 当前调用开始请求模型时的回调，由HedgedProvider设置
+_on_call_started = contextvars.ContextVar('llm_call_started', default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when an LLM call does not finish before its deadline."""
+
+
+def current_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+def remaining_time() -> Optional[float]:
+    """距离截止时间的秒数，没有截止时间时返回None"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def call_started() -> None:
+    """
+    通知HedgedProvider调用已经取得限流配额、开始请求模型
+
+    包装在HedgedProvider内的限流器在等待配额之后调用，单次调用的超时和延迟统计从此时开始计算。
+    """
+    callback = _on_call_started.get()
+    if callback is not None:
+        callback()
+
+
+@contextmanager
+def deadline_scope(timeout: Optional[float] = None, deadline: Optional[float] = None):
+    """
+    在该范围内发起的LLM调用必须在截止时间之前完成
+
+    Args:
+        timeout: 从现在起的秒数
+        deadline: 绝对截止时间（time.monotonic()）
+    嵌套使用时取最早的截止时间；两者都为None时不改变当前的截止时间。
+    """
+    candidates = [d for d in (_deadline.get(), deadline,
+                              time.monotonic() + timeout if timeout is not None else None)
+                  if d is not None]
+    token = _deadline.set(min(candidates) if candidates else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _Call:
+    """一次模型调用，started为开始请求模型的时间（不包括排队和等待限流配额的时间）"""
+
+    def __init__(self):
+        self.future = None
+        self.started = None
+
+
+class HedgedProvider:
+    """Enforces per-call deadlines and optionally hedges slow calls.
+
+    Each call must finish within config.LLM_CALL_TIMEOUT of reaching the
+    model, and before the deadline set by deadline_scope(). Time spent queued
+    or waiting for a rate limiter slot counts only against the deadline; a
+    wrapped provider with reports_call_start set signals the end of that wait
+    with call_started(). With hedging enabled, a duplicate call is launched
+    once the primary has been running longer than the observed latency
+    quantile (p95 by default) and whichever returns first wins. Calls that miss their deadline raise
+    DeadlineExceeded; an abandoned request that is already running keeps
+    running in the background and its result is discarded, one that is
+    still queued is cancelled and never reaches the provider.
+    """
+
+    # 主请求还在排队时，检查它是否已经开始执行的间隔（秒）
+    QUEUE_POLL_INTERVAL = 0.05
+
+    def __init__(self, provider,
+                 call_timeout: Optional[float] = config.LLM_CALL_TIMEOUT,
+                 hedging: bool = config.LLM_HEDGING_ENABLED,
+                 hedge_quantile: float = config.LLM_HEDGE_QUANTILE,
+                 hedge_min_samples: int = config.LLM_HEDGE_MIN_SAMPLES,
+                 max_threads: int = config.LLM_HEDGE_MAX_THREADS):
+        self.provider = provider
+        self.model_name = provider.model_name
+        self.generation_config = provider.generation_config
+        self.call_timeout = call_timeout
+        self.hedging = hedging
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyTracker()
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.deadlines_exceeded = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="llm-call")
+        self._lock = threading.Lock()
+
+    def _timeout(self) -> Optional[float]:
+        timeouts = [t for t in (self.call_timeout, remaining_time()) if t is not None]
+        return min(timeouts) if timeouts else None
+
+    def _call_provider(self, call: _Call, prompt: str):
+        def mark_started():
+            call.started = time.monotonic()
+
+        token = _on_call_started.set(mark_started)
+        try:
+            # 不经过限流器的provider从调用时开始计时
+            if not getattr(self.provider, 'reports_call_start', False):
+                mark_started()
+            return self.provider.generate_content(prompt)
+        finally:
+            _on_call_started.reset(token)
+
+    def _submit(self, prompt: str) -> _Call:
+        # 在工作线程中保留截止时间等上下文（每次提交使用独立的副本）
+        call = _Call()
+        context = contextvars.copy_context()
+        call.future = self._executor.submit(context.run, self._call_provider, call, prompt)
+        return call
+
+    def _deadline_exceeded(self, seconds: float):
+        with self._lock:
+            self.deadlines_exceeded += 1
+        return DeadlineExceeded(f"LLM call did not finish within {seconds:.1f}s")
+
+    def generate_content(self, prompt: str):
+        timeout = self._timeout()
+        hedge_delay = None
+        if self.hedging:
+            hedge_delay = self.latency.quantile(self.hedge_quantile, self.hedge_min_samples)
+
+        # 没有截止时间也不需要对冲时直接调用
+        if timeout is None and hedge_delay is None:
+            call = _Call()
+            response = self._call_provider(call, prompt)
+            self.latency.record(time.monotonic() - call.started)
+            return response
+        if timeout is not None and timeout <= 0:
+            raise self._deadline_exceeded(0)
+
+        submitted = time.monotonic()
+        request_deadline = current_deadline()
+        primary = self._submit(prompt)
+        calls = {primary.future: primary}
+        hedge = None
+        pending = {primary.future}
+        error = None
+
+        while pending:
+            now = time.monotonic()
+            events = [request_deadline] if request_deadline is not None else []
+            if primary.started is None:
+                events.append(now + self.QUEUE_POLL_INTERVAL)
+            else:
+                if self.call_timeout is not None:
+                    events.append(primary.started + self.call_timeout)
+                if hedge is None and hedge_delay is not None:
+                    events.append(primary.started + hedge_delay)
+            wait_timeout = max(0.0, min(events) - now) if events else None
+            done, pending = wait(pending, timeout=wait_timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future.exception() is None:
+                    self.latency.record(time.monotonic() - calls[future].started)
+                    if hedge is not None and future is hedge.future:
+                        with self._lock:
+                            self.hedges_won += 1
+                    return future.result()
+                error = future.exception()
+
+            now = time.monotonic()
+            started = primary.started
+            # 主请求开始执行后超过对冲阈值仍未返回时，发起一个相同的请求
+            if (pending and hedge is None and hedge_delay is not None
+                    and started is not None and now >= started + hedge_delay):
+                hedge = self._submit(prompt)
+                calls[hedge.future] = hedge
+                pending.add(hedge.future)
+                with self._lock:
+                    self.hedges_fired += 1
+            expired = ((request_deadline is not None and now >= request_deadline) or
+                       (self.call_timeout is not None and started is not None
+                        and now >= started + self.call_timeout))
+            if pending and expired:
+                # 还在排队的请求不再执行，避免占用限流额度
+                for future in pending:
+                    future.cancel()
+                raise self._deadline_exceeded(now - submitted)
+
+        raise error
+
+    def stats(self) -> dict:
+        """返回对冲和超时统计"""
+        with self._lock:
+            return {
+                'hedges_fired': self.hedges_fired,
+                'hedges_won': self.hedges_won,
+                'deadlines_exceeded': self.deadlines_exceeded,
+                'p95_latency': self.latency.quantile(0.95)
+            }
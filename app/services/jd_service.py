@@ -1,37 +1,49 @@
 import os
 import json
-import pandas as pd
-from datetime import datetime
-import google.generativeai as genai
+import threading
+from collections import OrderedDict
 from app.services.file_service import FileService
+from app.services.llm_cache import CachedModel, create_llm_cache
+from app.services.llm_provider import create_provider
+from app.services.single_flight import SingleFlight
 from app.utils.constants import DocType
+from app.services.structured_output import (
+    CriteriaResult, CriteriaBatchItem, CriteriaBatchResult, StructuredOutputError,
+    criteria_schema, criteria_batch_schema, generate_structured, validate_structured
+)
 from app import config
 
 class JDService:
-    def __init__(self, api_key=None):
-        self.file_service = FileService()
-        
-        # 初始化Gemini API
-        if api_key:
-            genai.configure(api_key=api_key)
-        elif os.environ.get("GOOGLE_API_KEY"):
-            genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
-        else:
-            genai.configure(api_key=config.GEMINI_API_KEY)
-        
-        # 设置模型和生成参数
-        self.model = genai.GenerativeModel(
-            config.GEMINI_MODEL,
-            generation_config={
-                "temperature": config.GEMINI_TEMPERATURE,
-                "max_output_tokens": config.GEMINI_MAX_OUTPUT_TOKENS,
-                "top_p": config.GEMINI_TOP_P,
-                "top_k": config.GEMINI_TOP_K
-            }
+    def __init__(self, api_key=None, provider=None, file_service=None, model=None):
+        # 由ServiceContainer创建时，存储、provider和模型缓存与其他服务共用
+        self.file_service = file_service or FileService()
+        
+        # LLM provider由config.LLM_PROVIDER选择（Gemini或离线stub）
+        self.provider = provider or create_provider(api_key=api_key)
+        
+        # 模型响应缓存在磁盘上，重复的prompt不再调用API
+        self.model = model or CachedModel(
+            self.provider,
+            model_name=self.provider.model_name,
+            generation_config=self.provider.generation_config,
+            cache=create_llm_cache()
         )
+        
+        # 内存中的criteria缓存，键为(jd_file_name, content_hash)，即JD的版本
+        self._criteria_cache = OrderedDict()
+        self._criteria_cache_lock = threading.Lock()
+        # 同一JD版本的并发提取合并为一次
+        self._criteria_flight = SingleFlight()
+        # 参与简历评分的JD及其criteria (版本号, {jd_file_name: criteria})，版本号变化时从存储重新读取
+        self._active_jds = None
     
     def extract_criteria(self, jd_file_name):
-        """从JD文件中提取criteria"""
+        """
+        从JD文件中提取criteria
+        
+        Raises:
+            StructuredOutputError: 修复后仍然无法解析响应，不保存任何criteria
+        """
         # 获取JD内容
         content, _ = self.file_service.get_raw_content(jd_file_name, DocType.JD)
         
@@ -55,65 +67,312 @@ class JDService:
         }}
         """
         
-        response = self.model.generate_content(prompt)
+        # 按schema解析响应，无法解析时发送修复请求；仍然失败时抛出异常，不返回空的criteria
+        criteria_json = generate_structured(self.model, prompt, CriteriaResult, criteria_schema())
         
-        # 解析响应
-        try:
-            # 尝试从响应中提取JSON
-            response_text = response.text
-            # 查找JSON开始和结束的位置
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            
-            if start_idx >= 0 and end_idx > start_idx:
-                json_str = response_text[start_idx:end_idx]
-                criteria_json = json.loads(json_str)
-                
-                # 保存到CSV
-                self._save_criteria(jd_file_name, criteria_json)
-                
-                return criteria_json
-            else:
-                raise ValueError("Could not find valid JSON in the response")
-        except Exception as e:
-            print(f"Error parsing criteria: {str(e)}")
-            # 返回一个空的criteria列表
-            return {"criteria": []}
+        # 保存到存储
+        self._save_criteria(jd_file_name, criteria_json)
+        
+        return criteria_json
     
     def _save_criteria(self, jd_file_name, criteria_json):
-        """将提取的criteria保存到CSV"""
+        """将提取的criteria保存到存储中"""
+        store = self.file_service.store
         criteria_str = json.dumps(criteria_json)
+        content_hash = store.get_raw_hash(DocType.JD, jd_file_name)
+        store.save_criteria(jd_file_name, criteria_str, content_hash)
+        self._remember_criteria((jd_file_name, content_hash), criteria_json)
+    
+    def _criteria_key(self, jd_file_name):
+        """内存缓存和single-flight的键，JD内容变化后键随之变化"""
+        return (jd_file_name, self.file_service.store.get_raw_hash(DocType.JD, jd_file_name))
+    
+    def _cached_criteria(self, key):
+        with self._criteria_cache_lock:
+            criteria_json = self._criteria_cache.get(key)
+            if criteria_json is not None:
+                self._criteria_cache.move_to_end(key)
+            return criteria_json
+    
+    def _remember_criteria(self, key, criteria_json):
+        # 提取失败的空criteria不缓存，下次调用重新提取
+        if not criteria_json.get('criteria'):
+            return
+        with self._criteria_cache_lock:
+            self._criteria_cache[key] = criteria_json
+            self._criteria_cache.move_to_end(key)
+            while len(self._criteria_cache) > config.CRITERIA_MEMORY_CACHE_SIZE:
+                self._criteria_cache.popitem(last=False)
+    
+    def invalidate_criteria(self, jd_file_name=None):
+        """清除内存中的criteria缓存（直接修改存储中的criteria后调用），jd_file_name为None时全部清除"""
+        with self._criteria_cache_lock:
+            for key in list(self._criteria_cache):
+                if jd_file_name is None or key[0] == jd_file_name:
+                    del self._criteria_cache[key]
+    
+    def criteria_stats(self):
+        """内存缓存大小和single-flight统计"""
+        with self._criteria_cache_lock:
+            cached = len(self._criteria_cache)
+        return {'cached': cached, **self._criteria_flight.stats()}
+    
+    def _get_stored_criteria(self, jd_file_name):
+        """获取已保存的criteria（包括内容相同的其他JD的criteria），不存在时返回None"""
+        store = self.file_service.store
+        criteria_str = store.get_criteria(jd_file_name)
+        if criteria_str:
+            return json.loads(criteria_str)
         
-        new_row = pd.DataFrame([{
-            'file_name': jd_file_name,
-            'criteria': criteria_str,
-            'analyzed_at': datetime.now()
-        }])
-        
-        # 读取现有数据
-        if os.path.exists(self.file_service.jd_analysis_path):
-            df = pd.read_csv(self.file_service.jd_analysis_path)
-            # 检查是否已存在该JD的分析
-            df = df[df['file_name'] != jd_file_name]
-            df = pd.concat([df, new_row], ignore_index=True)
-        else:
-            df = new_row
-            
-        # 保存回CSV
-        df.to_csv(self.file_service.jd_analysis_path, index=False)
+        # 内容相同的JD已经分析过时，直接复用其criteria
+        content_hash = store.get_raw_hash(DocType.JD, jd_file_name)
+        if content_hash:
+            criteria_str = store.find_criteria_by_hash(content_hash)
+            if criteria_str:
+                store.save_criteria(jd_file_name, criteria_str, content_hash)
+                return json.loads(criteria_str)
+        return None
+    
+    def get_stored_criteria(self, jd_file_name):
+        """获取内存缓存或存储中已有的criteria，不调用模型；尚未分析过的JD返回None"""
+        key = self._criteria_key(jd_file_name)
+        criteria_json = self._cached_criteria(key)
+        if criteria_json is None:
+            criteria_json = self._get_stored_criteria(jd_file_name)
+            if criteria_json is not None:
+                self._remember_criteria(key, criteria_json)
+        return criteria_json
     
     def get_criteria(self, jd_file_name):
-        """获取已保存的criteria，如果不存在则提取"""
-        if os.path.exists(self.file_service.jd_analysis_path):
-            df = pd.read_csv(self.file_service.jd_analysis_path)
-            result = df[df['file_name'] == jd_file_name]
+        """
+        获取criteria：依次查找内存缓存和存储，都不存在时提取
+        
+        同一JD版本的并发调用只有一个调用查找存储和提取，其他调用等待并共享其结果。
+        """
+        key = self._criteria_key(jd_file_name)
+        criteria_json = self._cached_criteria(key)
+        if criteria_json is not None:
+            return criteria_json
+        return self._criteria_flight.do(key, lambda: self._load_criteria(jd_file_name, key))
+    
+    def _load_criteria(self, jd_file_name, key):
+        # 等待锁期间上一个提取可能已经完成
+        criteria_json = self._cached_criteria(key)
+        if criteria_json is not None:
+            return criteria_json
+        
+        criteria_json = self._get_stored_criteria(jd_file_name)
+        if criteria_json is None:
+            # 如果不存在，则提取并返回
+            criteria_json = self.extract_criteria(jd_file_name)
+        self._remember_criteria(key, criteria_json)
+        return criteria_json
+    
+    def activate_jds(self, jd_file_names):
+        """
+        将JD加入参与简历评分的JD列表（保存在存储中，重启和多个worker进程共享）
+        
+        Raises:
+            ValueError: 某个JD没有已保存的criteria，此时不加入任何JD
+        """
+        missing = [name for name in jd_file_names
+                   if not (self._get_stored_criteria(name) or {}).get('criteria')]
+        if missing:
+            raise ValueError(f"Cannot activate JDs without criteria: {missing}")
+        self.file_service.store.activate_jds(jd_file_names)
+    
+    def get_active_jds(self):
+        """
+        获取参与简历评分的JD及其criteria
+        
+        结果按存储中的版本号缓存在内存中，任何进程修改列表后版本号变化，下次调用时重新读取。
+        
+        Returns:
+            字典 {jd_file_name: criteria字典}，按加入列表的顺序排列，没有criteria的JD对应空字典
+        """
+        store = self.file_service.store
+        version = store.get_active_jds_version()
+        cached = self._active_jds
+        if cached is not None and cached[0] == version:
+            return dict(cached[1])
+        
+        active = {}
+        for jd_file_name in store.list_active_jds():
+            key = self._criteria_key(jd_file_name)
+            criteria_json = self._cached_criteria(key)
+            if criteria_json is None:
+                criteria_json = self._get_stored_criteria(jd_file_name) or {}
+                # 评分时get_criteria直接命中内存缓存
+                self._remember_criteria(key, criteria_json)
+            active[jd_file_name] = criteria_json
+        self._active_jds = (version, active)
+        return dict(active)
+    
+    def get_criteria_batch(self, jd_file_names):
+        """
+        获取多个JD的criteria，尚未分析的JD打包在少量请求中一起提取
+        
+        每个请求最多包含config.CRITERIA_BATCH_SIZE个JD，且prompt不超过
+        config.CRITERIA_BATCH_TOKEN_BUDGET。批量响应中缺少某个JD或其criteria
+        不是字符串数组时，该JD单独调用extract_criteria提取。正在被其他调用提取的JD
+        不重复提取，等待其结果。
+        
+        Args:
+            jd_file_names: JD文件名列表
+        
+        Returns:
+            字典 {jd_file_name: criteria字典}，提取失败的JD对应的值为异常对象
+        """
+        results = {}
+        pending = {}
+        # 本次调用负责提取的JD {jd_file_name: (key, future)}
+        claimed = {}
+        # 其他调用正在提取的JD
+        waiting = {}
+        try:
+            for jd_file_name in jd_file_names:
+                try:
+                    key = self._criteria_key(jd_file_name)
+                    criteria_json = self._cached_criteria(key)
+                    if criteria_json is not None:
+                        results[jd_file_name] = criteria_json
+                        continue
+                    future, leader = self._criteria_flight.claim(key)
+                    if not leader:
+                        waiting[jd_file_name] = future
+                        continue
+                    claimed[jd_file_name] = (key, future)
+                    criteria_json = self._get_stored_criteria(jd_file_name)
+                    if criteria_json is not None:
+                        results[jd_file_name] = criteria_json
+                        continue
+                    pending[jd_file_name] = self.file_service.get_raw_content(jd_file_name, DocType.JD)[0]
+                except Exception as e:
+                    results[jd_file_name] = e
             
-            if not result.empty:
-                criteria_str = result.iloc[0]['criteria']
-                return json.loads(criteria_str)
+            for batch in self._plan_batches(pending):
+                if len(batch) == 1:
+                    batch_results = {}
+                else:
+                    try:
+                        batch_results = self._extract_criteria_batch({name: pending[name] for name in batch})
+                    except Exception as e:
+                        print(f"Error extracting criteria for {batch}: {str(e)}")
+                        batch_results = {}
+                
+                for jd_file_name in batch:
+                    if jd_file_name in batch_results:
+                        results[jd_file_name] = batch_results[jd_file_name]
+                        continue
+                    # 批量请求没有返回有效结果的JD单独提取
+                    try:
+                        results[jd_file_name] = self.extract_criteria(jd_file_name)
+                    except Exception as e:
+                        print(f"Error extracting criteria for {jd_file_name}: {str(e)}")
+                        results[jd_file_name] = e
+        finally:
+            # 发布本次调用提取的结果，等待中的调用共享这些结果
+            for jd_file_name, (key, future) in claimed.items():
+                result = results.get(jd_file_name)
+                if isinstance(result, dict):
+                    self._remember_criteria(key, result)
+                    self._criteria_flight.resolve(key, future, result=result)
+                else:
+                    error = result if isinstance(result, Exception) else RuntimeError(
+                        f"Criteria extraction for {jd_file_name} did not complete")
+                    self._criteria_flight.resolve(key, future, error=error)
+        
+        for jd_file_name, future in waiting.items():
+            try:
+                results[jd_file_name] = SingleFlight.wait(future)
+            except Exception as e:
+                results[jd_file_name] = e
+        
+        return results
+    
+    def _plan_batches(self, contents):
+        """按JD数量上限和token预算将JD分组，单个JD超过预算时单独成组"""
+        batches = []
+        current = []
+        used = 0
+        for jd_file_name, content in contents.items():
+            # 粗略估计token数（约4个字符一个token）
+            tokens = len(content) // 4 + 1
+            if current and (len(current) >= config.CRITERIA_BATCH_SIZE
+                            or used + tokens > config.CRITERIA_BATCH_TOKEN_BUDGET):
+                batches.append(current)
+                current = []
+                used = 0
+            current.append(jd_file_name)
+            used += tokens
+        if current:
+            batches.append(current)
+        return batches
+    
+    def _extract_criteria_batch(self, contents):
+        """
+        在一个请求中提取多个JD的criteria
+        
+        Args:
+            contents: 字典 {jd_file_name: JD文本}
+        
+        Returns:
+            字典 {jd_file_name: criteria字典}，只包含响应中criteria有效的JD
+        """
+        jd_ids = {f"J{i + 1}": jd_file_name for i, jd_file_name in enumerate(contents)}
+        jds_text = "\n\n".join(
+            f"### Job Description {jd_id}\n{contents[jd_file_name]}"
+            for jd_id, jd_file_name in jd_ids.items()
+        )
+        
+        prompt = f"""
+        Extract key criteria from each of the following job descriptions.
+        These criteria should include required skills, qualifications, experience, and certifications.
+        Return the result as a JSON object with a single key 'results' containing one entry per job description id.
+        
+        Job Descriptions:
+        {jds_text}
+        
+        Expected format:
+        {{
+          "results": [
+            {{
+              "jd_id": "J1",
+              "criteria": [
+                "criteria1",
+                "criteria2",
+                ...
+              ]
+            }},
+            ...
+          ]
+        }}
+        """
+        
+        try:
+            batch_json = generate_structured(self.model, prompt, CriteriaBatchResult, criteria_batch_schema())
+        except StructuredOutputError as e:
+            print(f"Error parsing batch criteria: {str(e)}")
+            return {}
+        
+        results = {}
+        for item in batch_json['results']:
+            # 每个JD都必须返回非空的字符串数组
+            try:
+                item = validate_structured(item, CriteriaBatchItem)
+            except StructuredOutputError:
+                continue
+            if item['jd_id'] not in jd_ids:
+                continue
+            jd_file_name = jd_ids[item['jd_id']]
+            criteria_json = {"criteria": item['criteria']}
+            self._save_criteria(jd_file_name, criteria_json)
+            results[jd_file_name] = criteria_json
         
-        # 如果不存在，则提取并返回
-        return self.extract_criteria(jd_file_name)
+        if len(results) < len(jd_ids):
+            missing = [name for name in jd_ids.values() if name not in results]
+            print(f"Batch criteria response had no valid criteria for {missing}")
+        return results
 
     def analyze_jd(self, jd_file_name: str) -> dict:
         """
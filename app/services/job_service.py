@@ -0,0 +1,146 @@
+import copy
+import json
+import uuid
+import threading
+import traceback
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from app import config
+
+
+class JobService:
+    """In-process background job queue for upload processing.
+
+    Jobs run on a bounded worker pool. Each job records per-file progress,
+    partial results as they become available and the final result, and can be
+    polled with get_job().
+
+    When a store is given, every change to a job is also written to it, so a
+    poll that reaches another worker process of `uvicorn --workers N` still
+    finds the job. The job itself runs only in the process that accepted it.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, history_limit: Optional[int] = None,
+                 store=None):
+        self.max_workers = max_workers or config.JOB_MAX_WORKERS
+        self.history_limit = history_limit or config.JOB_HISTORY_LIMIT
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job_type: str, file_names: List[str], func: Callable[[str], dict]) -> str:
+        """
+        创建任务并放入后台队列
+
+        Args:
+            job_type: 任务类型，例如 "jd" 或 "resume"
+            file_names: 任务处理的文件名列表
+            func: 任务函数 func(job_id)，返回最终结果字典
+
+        Returns:
+            任务ID
+        """
+        job_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        job = {
+            "job_id": job_id,
+            "type": job_type,
+            "status": "queued",
+            "created_at": now,
+            "updated_at": now,
+            "files": {name: {"status": "pending"} for name in file_names},
+            "partial_results": {},
+            "result": None,
+            "error": None
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._save(job)
+            self._prune()
+        self._executor.submit(self._run, job_id, func)
+        return job_id
+
+    def _run(self, job_id: str, func: Callable[[str], dict]) -> None:
+        self._update(job_id, status="running")
+        try:
+            result = func(job_id)
+            self._update(job_id, status="completed", result=result)
+        except Exception as e:
+            print(f"Error running job {job_id}: {str(e)}")
+            print(traceback.format_exc())
+            self._update(job_id, status="failed", error=str(e))
+
+    def _update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            job["updated_at"] = datetime.now().isoformat()
+            self._save(job)
+
+    def _save(self, job: dict) -> None:
+        """将任务状态写入存储，调用方持有_lock，保证写入的顺序与修改的顺序一致"""
+        if self.store is not None:
+            self.store.save_job(job["job_id"], json.dumps(job, default=str))
+
+    def _prune(self) -> None:
+        """只保留最近的任务，优先删除已结束的旧任务"""
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job["status"] in ("completed", "failed")]
+        removed = []
+        while len(self._jobs) > self.history_limit and finished:
+            job_id = finished.pop(0)
+            del self._jobs[job_id]
+            removed.append(job_id)
+        if removed and self.store is not None:
+            self.store.delete_jobs(removed)
+
+    def update_file(self, job_id: Optional[str], file_name: str, status: str, **details) -> None:
+        """更新任务中某个文件的处理状态，job_id为None时忽略"""
+        if job_id is None:
+            return
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["files"][file_name] = {"status": status, **details}
+            job["updated_at"] = datetime.now().isoformat()
+            self._save(job)
+
+    def add_partial_result(self, job_id: Optional[str], keys: List[str], value) -> None:
+        """记录部分结果，keys为嵌套字典的路径，job_id为None时忽略"""
+        if job_id is None:
+            return
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            target = job["partial_results"]
+            for key in keys[:-1]:
+                target = target.setdefault(key, {})
+            target[keys[-1]] = value
+            job["updated_at"] = datetime.now().isoformat()
+            self._save(job)
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """返回任务状态的副本，包括每个文件的进度"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job = copy.deepcopy(job)
+        if job is None:
+            # 任务可能由另一个worker进程接收，从存储中读取
+            saved = self.store.get_job(job_id) if self.store is not None else None
+            if saved is None:
+                return None
+            job = json.loads(saved)
+        statuses = [f["status"] for f in job["files"].values()]
+        job["progress"] = {
+            "total": len(statuses),
+            "completed": sum(1 for status in statuses if status in ("completed", "failed"))
+        }
+        return job
@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Optional
+
+from app import config
+from app.services.structured_output import current_response_schema
+
+
+class LLMCache:
+    """Persistent on-disk cache of LLM responses with LRU eviction.
+
+    Entries are stored in a SQLite file together with their size and last
+    access time; once the total size exceeds max_bytes the least recently
+    used entries are evicted.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            last_access REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access);
+    """
+
+    def __init__(self, db_path: str = config.LLM_CACHE_PATH,
+                 max_bytes: int = config.LLM_CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = self._conn()
+        with conn:
+            conn.executescript(self.SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(model_name: str, generation_config: Optional[dict], prompt: str,
+                 response_schema: Optional[dict] = None) -> str:
+        """由模型名称、生成参数、响应schema和prompt计算缓存键"""
+        payload = {
+            'model': model_name,
+            'generation_config': generation_config or {},
+            'prompt_hash': hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        }
+        # 结构化输出请求使用JSON模式和schema，与自由文本请求的响应不能共用缓存
+        if response_schema is not None:
+            payload['response_mime_type'] = "application/json"
+            payload['response_schema'] = response_schema
+        payload = json.dumps(payload, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        conn = self._conn()
+        with conn:
+            row = conn.execute("SELECT response FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return row[0] if row else None
+
+    def set(self, key: str, response: str) -> None:
+        size = len(response.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, size, time.time())
+            )
+            self._evict(conn)
+
+    def delete(self, key: str) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """按最近最少使用的顺序淘汰条目，直到总大小不超过上限"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute(
+                "SELECT key, size FROM llm_cache ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        with self._lock:
+            self.evictions += evicted
+
+    def stats(self) -> dict:
+        """返回缓存命中统计"""
+        row = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+        ).fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': row[0],
+                'size_bytes': row[1],
+                'max_bytes': self.max_bytes
+            }
+
+
+class CachedResponse:
+    """与Gemini响应对象相同的最小接口"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class CachedModel:
+    """Wraps a generative model and memoizes generate_content() in an LLMCache.
+
+    With cache=None every call goes straight to the model.
+    """
+
+    def __init__(self, model, model_name: str, generation_config: Optional[dict] = None,
+                 cache: Optional[LLMCache] = None):
+        self.model = model
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self.cache = cache
+
+    def _key(self, prompt: str) -> str:
+        # 请求的schema由调用方通过response_schema_scope()设置
+        return LLMCache.make_key(self.model_name, self.generation_config, prompt, current_response_schema())
+
+    def generate_content(self, prompt: str):
+        if self.cache is None:
+            return self.model.generate_content(prompt)
+
+        key = self._key(prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return CachedResponse(cached)
+
+        response = self.model.generate_content(prompt)
+        self.cache.set(key, response.text)
+        return response
+
+    def discard(self, prompt: str) -> None:
+        """删除某个prompt的缓存结果（例如响应无法解析时）"""
+        if self.cache is not None:
+            self.cache.delete(self._key(prompt))
+    
+    def remember(self, prompt: str, text: str) -> None:
+        """将某个prompt的结果替换为text（例如修复后的响应）"""
+        if self.cache is not None:
+            self.cache.set(self._key(prompt), text)
+
+
+def create_llm_cache() -> Optional[LLMCache]:
+    """根据配置创建LLM响应缓存，未启用时返回None"""
+    if not config.LLM_CACHE_ENABLED:
+        return None
+    return LLMCache()
@@ -0,0 +1,269 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import List, Optional
+
+from app import config
+from app.services.rate_limiter import RateLimitedProvider, get_shared_rate_limiter
+from app.services.hedging import HedgedProvider
+from app.services.structured_output import current_response_schema
+from app.utils.json_utils import extract_json
+
+
+class LLMResponse:
+    """与Gemini响应对象相同的最小接口"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class LLMProviderError(RuntimeError):
+    """Raised when a provider fails to produce a response."""
+
+
+class LLMProvider(ABC):
+    """Interface of the text generation backends used by JDService and ResumeService.
+
+    A provider exposes generate_content(prompt) returning an object with a
+    .text attribute, plus the model name and generation config that identify
+    its responses in the LLM cache.
+    """
+
+    model_name: str = ""
+    generation_config: Optional[dict] = None
+
+    @abstractmethod
+    def generate_content(self, prompt: str):
+        """生成文本，返回带有.text属性的响应对象"""
+
+
+def default_generation_config() -> dict:
+    """config.py中的Gemini生成参数"""
+    return {
+        "temperature": config.GEMINI_TEMPERATURE,
+        "max_output_tokens": config.GEMINI_MAX_OUTPUT_TOKENS,
+        "top_p": config.GEMINI_TOP_P,
+        "top_k": config.GEMINI_TOP_K
+    }
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini through google.generativeai.
+
+    The SDK is imported and the client created on first use (or by load()),
+    so processes that never call the model do not pay for the import.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, model_name: str = config.GEMINI_MODEL,
+                 generation_config: Optional[dict] = None):
+        self.api_key = api_key or os.environ.get("GOOGLE_API_KEY") or config.GEMINI_API_KEY
+        self.model_name = model_name
+        self.generation_config = generation_config or default_generation_config()
+        self._model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """导入google.generativeai并创建客户端（只执行一次）"""
+        with self._lock:
+            if self._model is None:
+                import google.generativeai as genai
+
+                # 初始化Gemini API
+                genai.configure(api_key=self.api_key)
+                self._model = genai.GenerativeModel(self.model_name, generation_config=self.generation_config)
+        return self._model
+
+    @property
+    def model(self):
+        return self._model if self._model is not None else self.load()
+
+    def generate_content(self, prompt: str):
+        schema = current_response_schema()
+        if schema is None:
+            return self.model.generate_content(prompt)
+        # JSON模式，按调用方指定的schema约束输出
+        generation_config = dict(self.generation_config, response_mime_type="application/json",
+                                 response_schema=schema)
+        return self.model.generate_content(prompt, generation_config=generation_config)
+
+
+class StubProvider(LLMProvider):
+    """Offline provider returning deterministic, schema-valid JSON.
+
+    Criteria extraction prompts (single or batched) get criteria built from
+    the most frequent words of each job description; scoring prompts (single
+    or batched) get a 0-5 score per requested criterion derived from a hash
+    of the resume and the criterion; repair prompts get the JSON object
+    embedded in the original response. The same prompt always yields the same
+    response. Latency, jitter and a failure rate can be configured to
+    simulate a remote model.
+    """
+
+    STOPWORDS = {
+        'about', 'after', 'also', 'and', 'are', 'based', 'been', 'being', 'both', 'can', 'candidate',
+        'experience', 'for', 'from', 'have', 'including', 'into', 'job', 'more', 'must', 'other',
+        'our', 'role', 'should', 'such', 'team', 'that', 'the', 'their', 'this', 'through', 'using',
+        'well', 'will', 'with', 'work', 'working', 'years', 'you', 'your'
+    }
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0,
+                 seed: Optional[int] = None, num_criteria: int = 8):
+        self.model_name = "stub"
+        self.generation_config = {"num_criteria": num_criteria}
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.num_criteria = num_criteria
+        self.calls = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise LLMProviderError("Simulated stub provider failure")
+
+        if "Return only the corrected JSON object" in prompt:
+            return LLMResponse(self._repair_response(prompt))
+        if "Extract key criteria from each of the following job descriptions" in prompt:
+            return LLMResponse(json.dumps(self._batch_criteria_response(prompt)))
+        if "Extract key criteria" in prompt:
+            return LLMResponse(json.dumps(self._criteria_response(prompt)))
+        if "Score each of the following resumes" in prompt:
+            return LLMResponse(json.dumps(self._batch_score_response(prompt)))
+        return LLMResponse(json.dumps(self._score_response(prompt)))
+
+    @staticmethod
+    def _section(prompt: str, start: str, end: str) -> str:
+        """取prompt中两个标记之间的文本"""
+        start_idx = prompt.find(start)
+        if start_idx < 0:
+            return ""
+        start_idx += len(start)
+        end_idx = prompt.find(end, start_idx)
+        return prompt[start_idx:end_idx if end_idx >= 0 else len(prompt)].strip()
+
+    def _repair_response(self, prompt: str) -> str:
+        try:
+            return json.dumps(extract_json(self._section(prompt, "Response:", "Return only the corrected JSON")))
+        except ValueError:
+            return "{}"
+
+    def _criteria_response(self, prompt: str) -> dict:
+        content = self._section(prompt, "Job Description:", "Expected format:")
+        return {"criteria": self._criteria(content)}
+
+    def _batch_criteria_response(self, prompt: str) -> dict:
+        # JD以"### Job Description J1"分隔
+        parts = re.split(r"### Job Description (J\d+)\n",
+                         self._section(prompt, "Job Descriptions:", "Expected format:"))
+        return {"results": [
+            {"jd_id": jd_id, "criteria": self._criteria(content.strip())}
+            for jd_id, content in zip(parts[1::2], parts[2::2])
+        ]}
+
+    def _criteria(self, content: str) -> List[str]:
+        words = [w.rstrip('.') for w in re.findall(r"[a-z][a-z+#.]{2,}", content.lower())]
+        words = [w for w in words if len(w) > 2 and w not in self.STOPWORDS]
+        top_words = [w for w, _ in Counter(words).most_common(self.num_criteria)]
+        return [f"Experience with {word}" for word in top_words]
+
+    def _score_response(self, prompt: str) -> dict:
+        resume = self._section(prompt, "Resume:", "Criteria:")
+        try:
+            criteria = json.loads(self._section(prompt, "Criteria:", "Return the result"))
+        except ValueError:
+            criteria = []
+        scores = {criterion: self._score(resume, criterion) for criterion in criteria}
+        return {
+            "candidate_name": self._candidate_name(resume),
+            "scores": scores,
+            "total_score": sum(scores.values())
+        }
+
+    def _batch_score_response(self, prompt: str) -> dict:
+        try:
+            criteria = json.loads(self._section(prompt, "Criteria:", "Resumes:"))
+        except ValueError:
+            criteria = []
+        # 简历以"### Resume R1"分隔
+        parts = re.split(r"### Resume (R\d+)\n", self._section(prompt, "Resumes:", "Return the result"))
+        results = []
+        for resume_id, resume in zip(parts[1::2], parts[2::2]):
+            resume = resume.strip()
+            results.append({
+                "resume_id": resume_id,
+                "candidate_name": self._candidate_name(resume),
+                "scores": {criterion: self._score(resume, criterion) for criterion in criteria}
+            })
+        return {"results": results}
+
+    @staticmethod
+    def _score(resume: str, criterion: str) -> int:
+        digest = hashlib.sha256(f"{resume}\n{criterion}".encode('utf-8')).digest()
+        return digest[0] % 6
+
+    @staticmethod
+    def _candidate_name(resume: str) -> str:
+        words: List[str] = re.findall(r"[A-Z][a-z]+", resume[:200])
+        return " ".join(words[:2]) if words else "Unknown"
+
+
+def create_provider(provider: Optional[str] = None, api_key: Optional[str] = None,
+                    rate_limited: Optional[bool] = None) -> LLMProvider:
+    """
+    根据配置创建LLM provider
+
+    启用限流时所有调用经过进程内共享的限流器；最外层的HedgedProvider负责超时和对冲请求。
+    """
+    provider = provider or config.LLM_PROVIDER
+    if provider == 'gemini':
+        instance = GeminiProvider(api_key=api_key)
+    elif provider == 'stub':
+        instance = StubProvider(
+            latency=config.STUB_LATENCY,
+            jitter=config.STUB_JITTER,
+            failure_rate=config.STUB_FAILURE_RATE,
+            seed=config.STUB_SEED
+        )
+    else:
+        raise ValueError(f"Unsupported LLM provider: {provider}")
+
+    if rate_limited is None:
+        rate_limited = config.LLM_RATE_LIMIT_ENABLED
+    if rate_limited:
+        instance = RateLimitedProvider(instance, get_shared_rate_limiter())
+    # 超时和对冲在限流之上，对冲请求同样计入配额
+    return HedgedProvider(instance)
+
+
+def load_provider(provider) -> None:
+    """提前创建provider各层中延迟创建的客户端（例如Gemini），用于服务启动预热"""
+    while provider is not None:
+        if hasattr(provider, 'load'):
+            provider.load()
+        provider = getattr(provider, 'provider', None)
+
+
+def provider_stats(provider) -> dict:
+    """收集provider各层（对冲、限流等）的统计信息"""
+    stats = {}
+    while provider is not None:
+        if hasattr(provider, 'stats'):
+            stats[type(provider).__name__] = provider.stats()
+        provider = getattr(provider, 'provider', None)
+    return stats
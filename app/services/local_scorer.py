@@ -0,0 +1,155 @@
+import re
+import math
+import heapq
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app import config
+from app.utils.lazy_import import lazy_import
+
+# numpy只在本地评分时使用
+np = lazy_import("numpy")
+
+# 不参与匹配的常见词（包括JD中常见但不能区分简历的词）
+STOP_WORDS = frozenset("""
+a an and are as at be by for from in into is of on or the to with within etc
+ability able experience experienced familiar familiarity good knowledge proficiency proficient
+skill skills strong understanding working work year years plus
+""".split())
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """小写、切词并去除停用词，保留c++、c#、node.js等技术词"""
+    return [token for token in _TOKEN_PATTERN.findall(str(text).lower()) if token not in STOP_WORDS]
+
+
+def bm25_idf(num_docs: int, doc_freq: int) -> float:
+    """BM25的IDF（非负的Lucene变体）"""
+    return math.log(1 + (num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+
+def bm25_rank(documents: Dict[str, Counter], terms: Iterable[str], top_k: int,
+              k1: float = 1.2, b: float = 0.75) -> List[Tuple[str, float]]:
+    """
+    按BM25对文档排序
+
+    Args:
+        documents: {文档名: 词频Counter}
+        terms: 查询词
+        top_k: 返回的文档数
+
+    Returns:
+        [(文档名, 得分), ...]，按得分从高到低排列，不包含得分为0的文档
+    """
+    terms = list(dict.fromkeys(terms))
+    if not documents or not terms:
+        return []
+    lengths = {name: sum(counts.values()) for name, counts in documents.items()}
+    avgdl = (sum(lengths.values()) / len(lengths)) or 1.0
+    doc_freq = Counter(term for counts in documents.values() for term in terms if term in counts)
+
+    scores = {}
+    for term in terms:
+        if not doc_freq[term]:
+            continue
+        idf = bm25_idf(len(documents), doc_freq[term])
+        for name, counts in documents.items():
+            tf = counts.get(term)
+            if tf:
+                norm = k1 * (1 - b + b * lengths[name] / avgdl)
+                scores[name] = scores.get(name, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+    return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+
+class LocalScorer:
+    """不调用模型，按TF-IDF加权的词匹配对简历评分"""
+
+    def __init__(self, cache_size: Optional[int] = None):
+        # 按内容哈希缓存简历的词集合（LRU），对其他JD重新评分时只切分新简历
+        self._terms = OrderedDict()
+        self._cache_size = cache_size or config.LOCAL_TERMS_CACHE_SIZE
+        self._lock = threading.Lock()
+
+    def terms(self, text: str, key: Optional[str] = None) -> frozenset:
+        """文本中出现的词的集合，key（内容哈希）不为None时缓存结果"""
+        if key is not None:
+            with self._lock:
+                cached = self._terms.get(key)
+                if cached is not None:
+                    self._terms.move_to_end(key)
+                    return cached
+        result = frozenset(_TOKEN_PATTERN.findall(str(text).lower())) - STOP_WORDS
+        if key is not None:
+            with self._lock:
+                self._terms[key] = result
+                self._terms.move_to_end(key)
+                while len(self._terms) > self._cache_size:
+                    self._terms.popitem(last=False)
+        return result
+
+    def overlap(self, text: str, criteria: Sequence[str], key: Optional[str] = None) -> float:
+        """criteria中的词（去重）出现在文本中的比例，criteria中没有可匹配的词时返回1.0"""
+        criteria_terms = set()
+        for criterion in criteria:
+            criteria_terms.update(tokenize(criterion))
+        if not criteria_terms:
+            return 1.0
+        return len(criteria_terms & self.terms(text, key)) / len(criteria_terms)
+
+    def similarity(self, documents: Sequence[str], criteria: Sequence[str],
+                   keys: Optional[Sequence[Optional[str]]] = None) -> 'np.ndarray':
+        """
+        计算文档与criteria的相似度矩阵
+
+        每个criterion是其自身词的TF-IDF向量（IDF取自简历语料），与简历 x 词的0/1矩阵相乘，
+        结果为简历提到的criterion词按IDF加权的比例
+
+        Args:
+            documents: 简历文本列表（同时作为IDF的语料）
+            criteria: criteria列表
+            keys: 与documents对应的内容哈希，用于缓存切词结果
+
+        Returns:
+            形状为(len(documents), len(criteria))的矩阵，取值范围[0, 1]
+        """
+        keys = keys or [None] * len(documents)
+        doc_terms = [self.terms(text, key) for text, key in zip(documents, keys)]
+        criteria_terms = [tokenize(criterion) for criterion in criteria]
+
+        # 词表只包含criteria中的词，其余的词不影响结果
+        vocabulary = {}
+        for terms in criteria_terms:
+            for term in terms:
+                vocabulary.setdefault(term, len(vocabulary))
+        if not documents or not vocabulary:
+            return np.zeros((len(documents), len(criteria)))
+
+        # 简历 x 词 的0/1矩阵
+        presence = np.zeros((len(documents), len(vocabulary)), dtype=np.float32)
+        for row, terms in enumerate(doc_terms):
+            columns = [vocabulary[term] for term in terms.intersection(vocabulary)]
+            presence[row, columns] = 1.0
+
+        # 平滑的IDF：越少见的词权重越大
+        document_frequency = presence.sum(axis=0)
+        idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+
+        # criteria x 词 的TF-IDF矩阵，每行归一化为和为1
+        weights = np.zeros((len(criteria), len(vocabulary)), dtype=np.float32)
+        for row, terms in enumerate(criteria_terms):
+            for term in terms:
+                weights[row, vocabulary[term]] += 1.0
+        weights *= idf
+        totals = weights.sum(axis=1, keepdims=True)
+        weights = np.divide(weights, totals, out=np.zeros_like(weights), where=totals > 0)
+
+        return presence @ weights.T
+
+    def score(self, documents: Sequence[str], criteria: Sequence[str],
+              keys: Optional[Sequence[Optional[str]]] = None) -> 'np.ndarray':
+        """将相似度映射为0-5的整数评分"""
+        return np.rint(self.similarity(documents, criteria, keys) * 5).astype(int)
+
@@ -0,0 +1,253 @@
+import time
+import random
+import threading
+from typing import Optional
+
+from app import config
+from app.services.hedging import DeadlineExceeded, call_started, remaining_time
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute.
+
+    The bucket holds at most `capacity` tokens (one minute worth by default).
+    acquire() blocks until enough tokens are available; consume() takes
+    tokens without waiting and may leave the bucket in debt, which later
+    acquire() calls pay off.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float = 1, timeout: Optional[float] = None) -> float:
+        """
+        等待并取出amount个token，返回等待的秒数
+
+        Raises:
+            DeadlineExceeded: timeout秒内无法取得token，此时不取出token
+        """
+        # 超过容量的请求永远无法满足，最多等到桶满
+        amount = min(amount, self.capacity)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                wait = (amount - self._tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise DeadlineExceeded(f"Rate limit wait of {wait:.1f}s exceeds the deadline")
+            time.sleep(wait)
+            waited += wait
+
+    def consume(self, amount: float) -> None:
+        """不等待地取出token（例如按实际输出长度补扣），余额可以为负"""
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on the number of in-flight calls.
+
+    Every successful call raises the limit by 1/limit (about +1 per round of
+    calls); a throttled call halves it. The limit stays within
+    [min_limit, max_limit].
+    """
+
+    def __init__(self, initial: int, min_limit: int = 1, max_limit: int = 16):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> None:
+        """
+        等待空闲的并发名额
+
+        Raises:
+            DeadlineExceeded: timeout秒内没有空闲的名额
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise DeadlineExceeded("No concurrency slot became free before the deadline")
+                self._cond.wait(remaining)
+            self._in_flight += 1
+
+    def release(self, throttled: bool = False, success: bool = True) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit / 2)
+            elif success:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """429 / 配额耗尽"""
+    return getattr(error, 'code', None) == 429 or \
+        type(error).__name__ in ('ResourceExhausted', 'TooManyRequests')
+
+
+def is_transient_error(error: Exception) -> bool:
+    """可以重试的错误：限流和服务端5xx，其他错误（包括stub模拟的失败）直接抛出"""
+    if is_rate_limit_error(error):
+        return True
+    if getattr(error, 'code', None) in (500, 502, 503, 504):
+        return True
+    return type(error).__name__ in ('ServiceUnavailable', 'InternalServerError')
+
+
+class RateLimiter:
+    """Client-side quota shared by every LLM call in the process.
+
+    Combines a requests/min bucket, a tokens/min bucket and an AIMD
+    concurrency limit, and retries transient errors with jittered
+    exponential backoff.
+    """
+
+    def __init__(self,
+                 requests_per_minute: Optional[float] = config.LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: Optional[float] = config.LLM_TOKENS_PER_MINUTE,
+                 max_retries: int = config.LLM_MAX_RETRIES,
+                 base_delay: float = config.LLM_RETRY_BASE_DELAY,
+                 max_delay: float = config.LLM_RETRY_MAX_DELAY,
+                 initial_concurrency: int = config.LLM_INITIAL_CONCURRENCY,
+                 min_concurrency: int = config.LLM_MIN_CONCURRENCY,
+                 max_concurrency: int = config.LLM_MAX_CONCURRENCY):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, min_concurrency, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """粗略估计文本的token数（约4个字符一个token）"""
+        return len(text) // 4 + 1
+
+    def backoff_delay(self, attempt: int) -> float:
+        """带完全抖动的指数退避：在[0, min(max_delay, base_delay * 2^attempt)]中随机取值"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, func, prompt: str):
+        """
+        在限流、并发控制和重试下调用func(prompt)
+
+        等待配额的时间不超过当前调用的截止时间（见deadline_scope）。
+
+        Raises:
+            DeadlineExceeded: 截止时间之前没有取得配额，此时不调用func
+            最后一次尝试的异常，或不可重试的异常
+        """
+        prompt_tokens = self.estimate_tokens(prompt)
+        for attempt in range(self.max_retries + 1):
+            waited = 0.0
+            if self.request_bucket is not None:
+                waited += self.request_bucket.acquire(1, timeout=remaining_time())
+            if self.token_bucket is not None:
+                waited += self.token_bucket.acquire(prompt_tokens, timeout=remaining_time())
+
+            self.concurrency.acquire(timeout=remaining_time())
+            # 取得配额时已经超过截止时间的调用不再请求模型
+            remaining = remaining_time()
+            if remaining is not None and remaining <= 0:
+                self.concurrency.release(success=False)
+                raise DeadlineExceeded("Deadline passed while waiting for a rate limit slot")
+            call_started()
+            try:
+                response = func(prompt)
+            except Exception as e:
+                throttled = is_rate_limit_error(e)
+                self.concurrency.release(throttled=throttled, success=False)
+                with self._lock:
+                    self.requests += 1
+                    self.wait_seconds += waited
+                    if throttled:
+                        self.throttled += 1
+                if not is_transient_error(e) or attempt == self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                # 等待后已经超过调用的截止时间时不再重试
+                remaining = remaining_time()
+                if remaining is not None and delay >= remaining:
+                    raise
+                print(f"Transient LLM error ({type(e).__name__}), retrying in {delay:.1f}s: {str(e)}")
+                with self._lock:
+                    self.retries += 1
+                time.sleep(delay)
+                continue
+
+            self.concurrency.release()
+            # 按响应长度补扣输出token
+            if self.token_bucket is not None:
+                self.token_bucket.consume(self.estimate_tokens(getattr(response, 'text', '') or ''))
+            with self._lock:
+                self.requests += 1
+                self.wait_seconds += waited
+            return response
+
+    def stats(self) -> dict:
+        """返回限流统计"""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'retries': self.retries,
+                'throttled': self.throttled,
+                'wait_seconds': round(self.wait_seconds, 3),
+                'concurrency_limit': round(self.concurrency.limit, 2)
+            }
+
+
+class RateLimitedProvider:
+    """Wraps an LLM provider so that every generate_content() call goes through a RateLimiter."""
+
+    # 取得限流配额时调用call_started()，HedgedProvider从此时开始计算单次调用的超时
+    reports_call_start = True
+
+    def __init__(self, provider, limiter: RateLimiter):
+        self.provider = provider
+        self.limiter = limiter
+        self.model_name = provider.model_name
+        self.generation_config = provider.generation_config
+
+    def generate_content(self, prompt: str):
+        return self.limiter.call(self.provider.generate_content, prompt)
+
+    def stats(self) -> dict:
+        return self.limiter.stats()
+
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_shared_rate_limiter() -> RateLimiter:
+    """进程内共享的限流器，所有provider共用同一份配额"""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter()
+        return _shared_limiter
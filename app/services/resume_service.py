@@ -1,42 +1,68 @@
 import os
+import re
 import json
-import pandas as pd
+import hashlib
+import threading
 from datetime import datetime
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from app.services.file_service import FileService
+from app.services.llm_cache import CachedModel, create_llm_cache
+from app.services.llm_provider import create_provider
 from app.services.jd_service import JDService
+from app.services.local_scorer import LocalScorer, tokenize
+from app.services.hedging import current_deadline, deadline_scope
 from app.utils.constants import DocType
+from app.utils.lazy_import import lazy_import
+from app.services.structured_output import (
+    ScoreResult, ScoreBatchItem, ScoreBatchResult, StructuredOutputError,
+    score_schema, score_batch_schema, generate_structured, validate_structured
+)
 from app import config
 
+# pandas只在导出评分表时使用
+pd = lazy_import("pandas")
+
+
+def normalize_criterion(criterion):
+    """规范化criterion文本（大小写、空白和首尾标点），用作单项评分的缓存键"""
+    text = re.sub(r'\s+', ' ', str(criterion)).strip().lower()
+    return text.strip(' .,;:')
+
+
 class ResumeService:
-    def __init__(self, api_key=None):
-        self.file_service = FileService()
-        self.jd_service = JDService(api_key)
-        
-        # 初始化Gemini API
-        if api_key:
-            genai.configure(api_key=api_key)
-        elif os.environ.get("GOOGLE_API_KEY"):
-            genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
-        else:
-            genai.configure(api_key=config.GEMINI_API_KEY)
-        
-        # 设置模型和生成参数
-        self.model = genai.GenerativeModel(
-            config.GEMINI_MODEL,
-            generation_config={
-                "temperature": config.GEMINI_TEMPERATURE,
-                "max_output_tokens": config.GEMINI_MAX_OUTPUT_TOKENS,
-                "top_p": config.GEMINI_TOP_P,
-                "top_k": config.GEMINI_TOP_K
-            }
+    # 本地（TF-IDF）评分保存的criteria版本前缀，用模型评分时视为过期
+    LOCAL_VERSION_PREFIX = "local:"
+    # 被词法预过滤跳过的评分保存的criteria版本前缀，开启过滤时视为有效，关闭过滤后重新评分
+    GATED_VERSION_PREFIX = "gated:"
+    
+    def __init__(self, api_key=None, provider=None, file_service=None, jd_service=None, model=None):
+        # 由ServiceContainer创建时，存储、provider、模型缓存和JDService与其他服务共用
+        self.file_service = file_service or FileService()
+        # LLM provider由config.LLM_PROVIDER选择（Gemini或离线stub），JD分析和简历评分共用
+        self.provider = provider or create_provider(api_key=api_key)
+        
+        # 模型响应缓存在磁盘上，重复的prompt不再调用API
+        self.model = model or CachedModel(
+            self.provider,
+            model_name=self.provider.model_name,
+            generation_config=self.provider.generation_config,
+            cache=create_llm_cache()
+        )
+        self.jd_service = jd_service or JDService(
+            api_key, provider=self.provider, file_service=self.file_service, model=self.model
         )
+        
+        # 不调用模型的本地评分，用于大批量简历的初筛
+        self.local_scorer = LocalScorer()
+        
+        # 词法预过滤的阈值，None表示不过滤
+        self.gate_threshold = config.LEXICAL_GATE_THRESHOLD if config.LEXICAL_GATE_ENABLED else None
+        self.gate_checked = 0
+        self.gate_skipped = 0
+        self._gate_lock = threading.Lock()
     
     def score_resume(self, resume_file_name, jd_file_name):
         """根据JD中的criteria对简历进行评分"""
-        # 获取简历内容
-        resume_content, _ = self.file_service.get_raw_content(resume_file_name, DocType.RESUME)
-        
         # 获取JD的criteria
         criteria_json = self.jd_service.get_criteria(jd_file_name)
         criteria_list = criteria_json.get('criteria', [])
@@ -44,7 +70,31 @@ class ResumeService:
         if not criteria_list:
             return {"error": "No criteria found for the job description"}
         
-        # 使用Gemini评分
+        # 相同内容的简历和JD已经按相同的criteria评过分时，直接返回已有结果
+        criteria_version = self.criteria_version(criteria_list)
+        cached_score = self._get_cached_score(resume_file_name, jd_file_name, criteria_version)
+        if cached_score is not None:
+            return cached_score
+        
+        # 与JD明显不相关的简历不调用模型
+        gated_score = self._apply_gate(resume_file_name, jd_file_name, criteria_list, criteria_version)
+        if gated_score is not None:
+            return gated_score
+        
+        return self._score_with_model(resume_file_name, jd_file_name, criteria_list, criteria_version)
+    
+    def _score_with_model(self, resume_file_name, jd_file_name, criteria_list, criteria_version):
+        """用模型对单份简历评分（已经查找过已有评分并通过词法预过滤）"""
+        # 同一份简历在其他JD中已经评过的相同criterion，直接复用单项评分
+        resume_hash, memoized, missing_criteria = self._lookup_memo(resume_file_name, criteria_list)
+        if not missing_criteria:
+            return self._finish_score(resume_file_name, jd_file_name, criteria_list, criteria_version,
+                                      resume_hash, memoized, missing_criteria, {})
+        
+        # 获取简历内容
+        resume_content, _ = self.file_service.get_raw_content(resume_file_name, DocType.RESUME)
+        
+        # 使用Gemini评分，只发送尚未评过分的criteria
         prompt = f"""
         Score the following resume against the job criteria. 
         For each criterion, assign a score from 0 to 5, where:
@@ -61,7 +111,7 @@ class ResumeService:
         {resume_content}
         
         Criteria:
-        {json.dumps(criteria_list, indent=2)}
+        {json.dumps(missing_criteria, indent=2)}
         
         Return the result as a JSON object with the following format:
         {{
@@ -77,116 +127,673 @@ class ResumeService:
         Make sure to include a score for each criterion listed above.
         """
         
-        response = self.model.generate_content(prompt)
-        
-        # 解析响应
+        # 按schema解析响应，无法解析时发送修复请求
         try:
-            # 尝试从响应中提取JSON
-            response_text = response.text
-            # 查找JSON开始和结束的位置
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
+            score_json = generate_structured(self.model, prompt, ScoreResult, score_schema(missing_criteria))
+        except StructuredOutputError as e:
+            print(f"Error parsing score: {str(e)}")
+            # 返回错误而不是0分，该组合计为失败且不保存
+            return {"error": f"Failed to parse score: {str(e)}"}
+        
+        return self._finish_score(resume_file_name, jd_file_name, criteria_list, criteria_version,
+                                  resume_hash, memoized, missing_criteria, score_json)
+    
+    def score_resumes_batch(self, resume_file_names, jd_file_name):
+        """
+        在一个请求中按同一个JD的criteria对多份简历评分
+        
+        criteria只在prompt中出现一次。已有评分或所有criteria都已缓存的简历不会放入请求，
+        批量响应无法解析或缺少某份简历时，该简历单独调用score_resume评分。
+        
+        Args:
+            resume_file_names: 简历文件名列表
+            jd_file_name: JD文件名
+        
+        Returns:
+            字典 {resume_file_name: 评分结果}
+        """
+        criteria_json = self.jd_service.get_criteria(jd_file_name)
+        criteria_list = criteria_json.get('criteria', [])
+        
+        if not criteria_list:
+            return {
+                resume_file_name: {"error": "No criteria found for the job description"}
+                for resume_file_name in resume_file_names
+            }
+        
+        criteria_version = self.criteria_version(criteria_list)
+        results = {}
+        pending = {}
+        for resume_file_name in resume_file_names:
+            cached_score = self._get_cached_score(resume_file_name, jd_file_name, criteria_version)
+            if cached_score is not None:
+                results[resume_file_name] = cached_score
+                continue
             
-            if start_idx >= 0 and end_idx > start_idx:
-                json_str = response_text[start_idx:end_idx]
-                score_json = json.loads(json_str)
-                
-                # 验证所有criteria都有评分
-                scores = score_json.get('scores', {})
-                for criterion in criteria_list:
-                    if criterion not in scores:
-                        scores[criterion] = 0
-                
-                # 重新计算总分
-                total_score = sum(scores.values())
-                score_json['scores'] = scores
-                score_json['total_score'] = total_score
-                
-                # 保存到CSV
-                self._save_score(resume_file_name, jd_file_name, score_json)
-                
-                return score_json
+            gated_score = self._apply_gate(resume_file_name, jd_file_name, criteria_list, criteria_version)
+            if gated_score is not None:
+                results[resume_file_name] = gated_score
+                continue
+            
+            resume_hash, memoized, missing_criteria = self._lookup_memo(resume_file_name, criteria_list)
+            if not missing_criteria:
+                results[resume_file_name] = self._finish_score(
+                    resume_file_name, jd_file_name, criteria_list, criteria_version,
+                    resume_hash, memoized, missing_criteria, {}
+                )
+                continue
+            pending[resume_file_name] = (resume_hash, memoized, missing_criteria)
+        
+        # 只剩一份简历时使用单份评分的prompt
+        if len(pending) == 1:
+            resume_file_name = next(iter(pending))
+            results[resume_file_name] = self._score_with_model(
+                resume_file_name, jd_file_name, criteria_list, criteria_version
+            )
+            return results
+        if not pending:
+            return results
+        
+        # 请求中包含至少一份简历还没有评过分的criteria
+        batch_criteria = [
+            criterion for criterion in criteria_list
+            if any(criterion in missing for _, _, missing in pending.values())
+        ]
+        resume_ids = {f"R{i + 1}": resume_file_name for i, resume_file_name in enumerate(pending)}
+        resumes_text = "\n\n".join(
+            f"### Resume {resume_id}\n"
+            f"{self.file_service.get_raw_content(resume_file_name, DocType.RESUME)[0]}"
+            for resume_id, resume_file_name in resume_ids.items()
+        )
+        
+        prompt = f"""
+        Score each of the following resumes against the job criteria.
+        For each resume and each criterion, assign a score from 0 to 5, where:
+        0 = Not mentioned or not relevant
+        1 = Barely mentioned
+        2 = Somewhat relevant
+        3 = Relevant
+        4 = Very relevant
+        5 = Perfectly matches
+        
+        Also extract each candidate's name from their resume.
+        
+        Criteria:
+        {json.dumps(batch_criteria, indent=2)}
+        
+        Resumes:
+        {resumes_text}
+        
+        Return the result as a JSON object with the following format:
+        {{
+          "results": [
+            {{
+              "resume_id": "R1",
+              "candidate_name": "Full Name",
+              "scores": {{
+                "criteria1": score1,
+                "criteria2": score2,
+                ...
+              }}
+            }},
+            ...
+          ]
+        }}
+        
+        Make sure to include one entry for each resume id listed above, with a score for each criterion.
+        """
+        
+        # 解析响应，按resume_id拆分为每份简历的结果
+        try:
+            batch_json = generate_structured(self.model, prompt, ScoreBatchResult,
+                                             score_batch_schema(batch_criteria))
+        except StructuredOutputError as e:
+            print(f"Error parsing batch score: {str(e)}")
+            batch_json = {"results": []}
+        
+        items = {}
+        for item in batch_json['results']:
+            try:
+                item = validate_structured(item, ScoreBatchItem)
+            except StructuredOutputError:
+                continue
+            items[item['resume_id']] = item
+        
+        for resume_id, resume_file_name in resume_ids.items():
+            item = items.get(resume_id)
+            if item is None:
+                # 批量响应中缺少该简历，单独评分（已经通过词法预过滤，不再重复判断）
+                results[resume_file_name] = self._score_with_model(
+                    resume_file_name, jd_file_name, criteria_list, criteria_version
+                )
+                continue
+            resume_hash, memoized, missing_criteria = pending[resume_file_name]
+            results[resume_file_name] = self._finish_score(
+                resume_file_name, jd_file_name, criteria_list, criteria_version,
+                resume_hash, memoized, missing_criteria,
+                {"candidate_name": item.get('candidate_name'), "scores": item['scores']}
+            )
+        
+        return results
+    
+    def _finish_score(self, resume_file_name, jd_file_name, criteria_list, criteria_version,
+                      resume_hash, memoized, missing_criteria, score_json):
+        """
+        合并模型返回的评分和已缓存的单项评分，保存并返回完整的评分结果
+        
+        Args:
+            score_json: 模型返回的结果，包含candidate_name和missing_criteria的scores
+        """
+        # 模型返回的criterion文本可能与原文有细微差别，按规范化后的文本匹配
+        returned = score_json.get('scores') or {}
+        normalized_returned = {normalize_criterion(k): v for k, v in returned.items()}
+        new_scores = {}
+        for criterion in missing_criteria:
+            if criterion in returned:
+                new_scores[criterion] = returned[criterion]
+            elif normalize_criterion(criterion) in normalized_returned:
+                new_scores[criterion] = normalized_returned[normalize_criterion(criterion)]
+        self._memoize_scores(resume_hash, new_scores)
+        
+        # 验证所有criteria都有评分
+        scores = {}
+        for criterion in criteria_list:
+            if criterion in memoized:
+                scores[criterion] = memoized[criterion]
             else:
-                raise ValueError("Could not find valid JSON in the response")
-        except Exception as e:
-            print(f"Error parsing score: {str(e)}")
-            # 返回一个空的评分
-            return {"candidate_name": "Unknown", "scores": {}, "total_score": 0}
+                scores[criterion] = new_scores.get(criterion, 0)
+        
+        # 没有调用模型时，使用已保存的候选人姓名
+        if not score_json.get('candidate_name'):
+            score_json['candidate_name'] = (
+                self.file_service.store.get_candidate_name(resume_file_name) or "Unknown"
+            )
+        
+        # 重新计算总分
+        score_json['scores'] = scores
+        score_json['total_score'] = sum(scores.values())
+        
+        # 保存到存储
+        self._save_score(resume_file_name, jd_file_name, score_json, criteria_version)
+        return score_json
     
-    def _save_score(self, resume_file_name, jd_file_name, score_json):
-        """将评分保存到CSV"""
-        scores_str = json.dumps(score_json.get('scores', {}))
+    def _apply_gate(self, resume_file_name, jd_file_name, criteria_list, criteria_version):
+        """
+        词法预过滤：简历中出现的criteria关键词比例低于gate_threshold时，不调用模型直接记为0分
+        
+        Returns:
+            被过滤时返回保存的评分结果（带gated、lexical_overlap和gate_threshold字段），否则返回None
+        """
+        if self.gate_threshold is None:
+            return None
+        store = self.file_service.store
+        raw = store.get_raw_content(DocType.RESUME, resume_file_name)
+        if raw is None:
+            return None
+        
+        overlap = self.local_scorer.overlap(
+            raw[0], criteria_list, store.get_raw_hash(DocType.RESUME, resume_file_name)
+        )
+        skipped = overlap < self.gate_threshold
+        with self._gate_lock:
+            self.gate_checked += 1
+            if skipped:
+                self.gate_skipped += 1
+        if not skipped:
+            return None
+        
+        scores = {criterion: 0 for criterion in criteria_list}
+        score_json = {
+            "candidate_name": store.get_candidate_name(resume_file_name) or "Unknown",
+            "scores": scores,
+            "total_score": 0,
+            "gated": True,
+            "lexical_overlap": round(overlap, 3),
+            "gate_threshold": self.gate_threshold
+        }
+        # 以单独的版本前缀保存，阈值变化或关闭过滤后会重新评分
+        self._save_score(resume_file_name, jd_file_name, score_json,
+                         self.GATED_VERSION_PREFIX + criteria_version)
+        return score_json
+    
+    def gate_stats(self):
+        """返回词法预过滤的阈值和跳过比例"""
+        with self._gate_lock:
+            return {
+                'enabled': self.gate_threshold is not None,
+                'threshold': self.gate_threshold,
+                'checked': self.gate_checked,
+                'skipped': self.gate_skipped,
+                'skip_rate': round(self.gate_skipped / self.gate_checked, 3) if self.gate_checked else 0.0
+            }
+    
+    def _lookup_memo(self, resume_file_name, criteria_list):
+        """
+        Returns:
+            (简历内容哈希, 已缓存的单项评分 {criterion: score}, 尚未评分的criteria列表)
+        """
+        resume_hash = self.file_service.store.get_raw_hash(DocType.RESUME, resume_file_name)
+        memoized = self._get_memoized_scores(resume_hash, criteria_list)
+        missing_criteria = [criterion for criterion in criteria_list if criterion not in memoized]
+        return resume_hash, memoized, missing_criteria
+    
+    def _get_memoized_scores(self, resume_hash, criteria_list):
+        """
+        查找简历已有的单项评分
+        
+        Returns:
+            字典 {criterion: score}，只包含已缓存的criteria
+        """
+        if not config.CRITERION_MEMO_ENABLED or not resume_hash:
+            return {}
+        keys = {criterion: normalize_criterion(criterion) for criterion in criteria_list}
+        stored = self.file_service.store.get_criterion_scores(resume_hash, set(keys.values()))
+        return {criterion: stored[key] for criterion, key in keys.items() if key in stored}
+    
+    def _memoize_scores(self, resume_hash, scores):
+        """按(简历内容哈希, 规范化的criterion)保存单项评分"""
+        if not config.CRITERION_MEMO_ENABLED or not resume_hash or not scores:
+            return
+        self.file_service.store.save_criterion_scores(
+            resume_hash,
+            {normalize_criterion(criterion): score for criterion, score in scores.items()}
+        )
+    
+    @staticmethod
+    def criteria_version(criteria_list):
+        """criteria列表的版本号，criteria变化后按旧版本得出的评分视为过期"""
+        payload = json.dumps(criteria_list, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+    
+    def _stored_criteria_version(self, jd_file_name):
+        """已保存的JD criteria的版本号，JD尚未分析时返回None"""
+        criteria = self.file_service.store.get_criteria(jd_file_name)
+        if not isinstance(criteria, str):
+            return None
+        try:
+            return self.criteria_version(json.loads(criteria).get('criteria', []))
+        except (ValueError, AttributeError):
+            return None
+    
+    def _is_score_current(self, row, resume_hash, jd_hash, criteria_version):
+        """
+        判断已保存的评分是否仍然有效
+        
+        评分记录了评分时简历和JD的内容哈希以及criteria版本，任一项与当前值不同则评分过期。
+        旧数据中缺少的字段无法比较，视为有效（内容变化时save_raw_content已删除旧评分）。
+        被词法预过滤跳过的评分（GATED_VERSION_PREFIX + 版本）只在开启过滤时有效。
+        """
+        recorded_version = row.get('criteria_version')
+        if self.gate_threshold is not None and self._is_gated_row(row):
+            recorded_version = recorded_version[len(self.GATED_VERSION_PREFIX):]
+        for recorded, current in ((row.get('resume_hash'), resume_hash),
+                                  (row.get('jd_hash'), jd_hash),
+                                  (recorded_version, criteria_version)):
+            if recorded and current and recorded != current:
+                return False
+        return True
+    
+    def _partition_pairs(self, jd_files, resume_files):
+        """
+        将(JD, 简历)组合分为需要评分的组合和已有有效评分的组合
+        
+        Returns:
+            (需要评分的(jd_file, resume_file)列表, 字典 {(jd_file, resume_file): 已保存的评分结果})
+        """
+        store = self.file_service.store
+        resume_hashes = {
+            resume_file: store.get_raw_hash(DocType.RESUME, resume_file)
+            for resume_file in resume_files
+        }
+        candidate_names = None
+        
+        pending = []
+        current = {}
+        for jd_file in jd_files:
+            jd_hash = store.get_raw_hash(DocType.JD, jd_file)
+            criteria_version = self._stored_criteria_version(jd_file)
+            stored = {row['resume_name']: row for row in store.get_scores(jd_name=jd_file)}
+            
+            for resume_file in resume_files:
+                row = stored.get(resume_file)
+                if row is None or not self._is_score_current(
+                        row, resume_hashes[resume_file], jd_hash, criteria_version):
+                    pending.append((jd_file, resume_file))
+                    continue
+                if candidate_names is None:
+                    candidate_names = store.get_candidate_names()
+                current[(jd_file, resume_file)] = self._score_from_row(row, candidate_names)
+        
+        return pending, current
+    
+    def find_unscored_pairs(self, jd_files, resume_files):
+        """
+        找出缺少有效评分的(JD, 简历)组合
         
-        new_row = pd.DataFrame([{
-            'resume_name': resume_file_name,
-            'jd_name': jd_file_name,
-            'scores': scores_str,
-            'total_score': score_json.get('total_score', 0),
-            'scored_at': datetime.now()
-        }])
-        
-        # 读取现有数据
-        if os.path.exists(self.file_service.scores_path):
-            df = pd.read_csv(self.file_service.scores_path)
-            # 检查是否已存在该简历和JD的评分
-            df = df[(df['resume_name'] != resume_file_name) | (df['jd_name'] != jd_file_name)]
-            df = pd.concat([df, new_row], ignore_index=True)
+        Args:
+            jd_files: JD文件名列表
+            resume_files: 简历文件名列表
+        
+        Returns:
+            [(jd_file, resume_file), ...]，没有评分或评分已过期的组合
+        """
+        pending, _ = self._partition_pairs(jd_files, resume_files)
+        return pending
+    
+    @staticmethod
+    def _estimate_tokens(text):
+        """粗略估计文本的token数（约4个字符一个token）"""
+        return len(text) // 4 + 1
+    
+    def _plan_batches(self, jd_file, resume_files, batch_size):
+        """
+        将同一个JD的简历分组，每组不超过batch_size份简历，且prompt不超过config.SCORING_BATCH_TOKEN_BUDGET
+        
+        单份简历超过预算时单独成组。
+        """
+        store = self.file_service.store
+        base_tokens = 400 + self._estimate_tokens(store.get_criteria(jd_file) or "")
+        budget = config.SCORING_BATCH_TOKEN_BUDGET
+        
+        batches = []
+        current = []
+        used = base_tokens
+        for resume_file in resume_files:
+            raw = store.get_raw_content(DocType.RESUME, resume_file)
+            tokens = self._estimate_tokens(raw[0]) if raw else 0
+            if current and (len(current) >= batch_size or used + tokens > budget):
+                batches.append(current)
+                current = []
+                used = base_tokens
+            current.append(resume_file)
+            used += tokens
+        if current:
+            batches.append(current)
+        return batches
+    
+    def iter_score_pairs(self, pairs, max_workers=None, batch_size=None, deadline=None):
+        """
+        并发地对给定的(JD, 简历)组合评分，每个组合完成时立即产出结果
+        
+        Args:
+            pairs: [(jd_file, resume_file), ...]
+            max_workers: 同时进行的LLM调用数上限，默认为config.SCORING_MAX_WORKERS
+            batch_size: 每个请求最多包含的简历数，大于1时同一个JD的简历通过score_resumes_batch
+                        批量评分，默认为config.SCORING_BATCH_SIZE
+            deadline: LLM调用的截止时间（time.monotonic()），默认沿用调用方deadline_scope中的截止时间
+        
+        Yields:
+            (jd_file, resume_file, 评分结果)，按完成顺序产出，评分失败时结果为异常对象
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return
+        
+        batch_size = batch_size or config.SCORING_BATCH_SIZE
+        if batch_size > 1:
+            resumes_by_jd = {}
+            for jd_file, resume_file in pairs:
+                resumes_by_jd.setdefault(jd_file, []).append(resume_file)
+            tasks = [
+                (jd_file, batch)
+                for jd_file, resume_files in resumes_by_jd.items()
+                for batch in self._plan_batches(jd_file, resume_files, batch_size)
+            ]
         else:
-            df = new_row
+            tasks = [(jd_file, [resume_file]) for jd_file, resume_file in pairs]
+        
+        # 工作线程不继承调用方的上下文，截止时间需要显式传递
+        deadline = deadline or current_deadline()
+        
+        def run_task(jd_file, resume_files):
+            with deadline_scope(deadline=deadline):
+                if len(resume_files) == 1:
+                    return {resume_files[0]: self.score_resume(resume_files[0], jd_file)}
+                return self.score_resumes_batch(resume_files, jd_file)
+        
+        max_workers = max_workers or config.SCORING_MAX_WORKERS
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(tasks)))
+        try:
+            futures = {
+                executor.submit(run_task, jd_file, resume_files): (jd_file, resume_files)
+                for jd_file, resume_files in tasks
+            }
+            for future in as_completed(futures):
+                jd_file, resume_files = futures[future]
+                # 单个请求的失败不影响其他请求
+                try:
+                    results = future.result()
+                except Exception as e:
+                    print(f"  Error scoring resumes {resume_files} against JD {jd_file}: {str(e)}")
+                    results = {resume_file: e for resume_file in resume_files}
+                for resume_file in resume_files:
+                    yield jd_file, resume_file, results[resume_file]
+        finally:
+            # 调用方提前停止迭代时（例如客户端断开连接），取消尚未开始的评分
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def iter_score_matrix(self, jd_files, resume_files, max_workers=None, incremental=True,
+                          batch_size=None, deadline=None):
+        """
+        对所有(JD, 简历)组合评分，每个组合有结果时立即产出
+        
+        Args:
+            jd_files: JD文件名列表
+            resume_files: 简历文件名列表
+            max_workers: 同时进行的LLM调用数上限，默认为config.SCORING_MAX_WORKERS
+            incremental: 为True时已有有效评分的组合直接产出已保存的结果，只对其余组合调用LLM
+            batch_size: 每个请求最多包含的简历数，默认为config.SCORING_BATCH_SIZE
+            deadline: LLM调用的截止时间（time.monotonic()）
+        
+        Yields:
+            (jd_file, resume_file, 评分结果)，已有的评分先产出，其余按完成顺序产出，
+            评分失败时结果为异常对象
+        """
+        if not incremental:
+            pairs = [(jd_file, resume_file) for jd_file in jd_files for resume_file in resume_files]
+            yield from self.iter_score_pairs(pairs, max_workers, batch_size, deadline)
+            return
+        
+        pending, current = self._partition_pairs(jd_files, resume_files)
+        if current or pending:
+            print(f"  {len(current)} pairs already scored, {len(pending)} pairs to score")
+        for (jd_file, resume_file), result in current.items():
+            yield jd_file, resume_file, result
+        yield from self.iter_score_pairs(pending, max_workers, batch_size, deadline)
+    
+    def score_matrix(self, jd_files, resume_files, max_workers=None, on_result=None, incremental=True,
+                     batch_size=None, deadline=None):
+        """
+        并发地对所有(JD, 简历)组合评分
+        
+        Args:
+            jd_files: JD文件名列表
+            resume_files: 简历文件名列表
+            max_workers: 同时进行的LLM调用数上限，默认为config.SCORING_MAX_WORKERS
+            on_result: 可选回调 on_result(jd_file, resume_file, result)，每个组合完成时调用
+            incremental: 为True时只对缺少有效评分的组合调用LLM
+            batch_size: 每个请求最多包含的简历数，默认为config.SCORING_BATCH_SIZE
+            deadline: LLM调用的截止时间（time.monotonic()）
+        
+        Returns:
+            字典 {(jd_file, resume_file): 评分结果}，评分失败的组合对应的值为异常对象
+        """
+        results = {}
+        for jd_file, resume_file, result in self.iter_score_matrix(
+                jd_files, resume_files, max_workers, incremental, batch_size, deadline):
+            results[(jd_file, resume_file)] = result
+            if on_result is not None:
+                on_result(jd_file, resume_file, result)
+        
+        return results
+    
+    def score_matrix_local(self, jd_files, resume_files=None, save=True):
+        """
+        不调用模型，用TF-IDF对简历进行本地评分，用于大批量简历的初筛
+        
+        IDF取自所有已保存的简历，每个JD的所有简历在一次矩阵运算中评分。评分以
+        LOCAL_VERSION_PREFIX开头的criteria版本保存，之后用模型评分时视为过期并重新评分；
+        已有的模型评分不会被覆盖。只使用已保存的criteria，尚未分析过的JD跳过（不调用模型提取），
+        需要先上传JD或用模型评分一次。
+        
+        Args:
+            jd_files: JD文件名列表
+            resume_files: 简历文件名列表，为None时对所有已保存的简历评分
+            save: 是否保存评分（保存后可以用export_scores_to_excel导出）
+        
+        Returns:
+            字典 {(jd_file, resume_file): 评分结果}
+        """
+        store = self.file_service.store
+        corpus = store.get_raw_contents(DocType.RESUME)
+        names = list(corpus)
+        documents = [corpus[name][0] for name in names]
+        keys = [corpus[name][1] for name in names]
+        positions = {name: i for i, name in enumerate(names)}
+        if resume_files is None:
+            resume_files = names
+        selected = [name for name in resume_files if name in positions]
+        rows = [positions[name] for name in selected]
+        candidate_names = store.get_candidate_names()
+        
+        results = {}
+        for jd_file in jd_files:
+            criteria_json = self.jd_service.get_stored_criteria(jd_file)
+            criteria_list = (criteria_json or {}).get('criteria', [])
+            if not criteria_list:
+                print(f"No stored criteria for {jd_file}, skipping local scoring (analyze the JD first)")
+                continue
+            
+            matrix = self.local_scorer.score(documents, criteria_list, keys)[rows]
+            criteria_version = self.criteria_version(criteria_list)
+            jd_hash = store.get_raw_hash(DocType.JD, jd_file)
+            stored = {row['resume_name']: row for row in store.get_scores(jd_name=jd_file)}
             
-        # 保存回CSV
-        df.to_csv(self.file_service.scores_path, index=False)
+            records = []
+            for resume_file, resume_scores in zip(selected, matrix):
+                scores = {criterion: int(score) for criterion, score in zip(criteria_list, resume_scores)}
+                results[(jd_file, resume_file)] = {
+                    "candidate_name": candidate_names.get(resume_file) or "Unknown",
+                    "scores": scores,
+                    "total_score": sum(scores.values())
+                }
+                
+                # 保留已有的有效模型评分
+                existing = stored.get(resume_file)
+                if existing is not None and \
+                        not str(existing.get('criteria_version') or '').startswith(self.LOCAL_VERSION_PREFIX) and \
+                        self._is_score_current(existing, corpus[resume_file][1], jd_hash, criteria_version):
+                    continue
+                records.append({
+                    'resume_name': resume_file,
+                    'jd_name': jd_file,
+                    'scores': json.dumps(scores),
+                    'total_score': sum(scores.values()),
+                    'resume_hash': corpus[resume_file][1],
+                    'jd_hash': jd_hash,
+                    'criteria_version': self.LOCAL_VERSION_PREFIX + criteria_version
+                })
+            
+            if save:
+                store.save_scores(records)
         
-        # 保存候选人信息到resume_analysis
-        self._save_candidate_info(resume_file_name, score_json)
+        return results
+    
+    def shortlist(self, jd_file_name, top_k=None):
+        """
+        按BM25从简历倒排索引中检索与JD的criteria最相关的简历，只需对检索结果调用模型评分
+        
+        Args:
+            jd_file_name: JD文件名（尚未分析时会先提取criteria）
+            top_k: 返回的简历数，默认为config.SHORTLIST_TOP_K
+        
+        Returns:
+            [{"resume_name": 简历文件名, "score": BM25得分}, ...]，按得分从高到低排列
+        """
+        criteria_list = self.jd_service.get_criteria(jd_file_name).get('criteria', [])
+        terms = [term for criterion in criteria_list for term in tokenize(criterion)]
+        matches = self.file_service.store.search_resumes(terms, top_k or config.SHORTLIST_TOP_K)
+        return [{"resume_name": resume_name, "score": round(score, 4)} for resume_name, score in matches]
+    
+    def _get_cached_score(self, resume_file_name, jd_file_name, criteria_version=None):
+        """按简历和JD的内容哈希以及criteria版本查找已有评分"""
+        store = self.file_service.store
+        resume_hash = store.get_raw_hash(DocType.RESUME, resume_file_name)
+        jd_hash = store.get_raw_hash(DocType.JD, jd_file_name)
+        if not resume_hash or not jd_hash:
+            return None
+        
+        # 只查找当前criteria版本的评分，不会取到本地评分或已过期的评分
+        versions = None
+        if criteria_version is not None:
+            versions = [criteria_version]
+            if self.gate_threshold is not None:
+                versions.append(self.GATED_VERSION_PREFIX + criteria_version)
+        cached = store.find_score_by_hash(resume_hash, jd_hash, versions)
+        if cached is None or not self._is_score_current(cached, resume_hash, jd_hash, criteria_version):
+            return None
+        
+        score_json = self._score_from_row(cached)
+        # 内容相同但文件名不同，以当前文件名再保存一份
+        if (cached['resume_name'], cached['jd_name']) != (resume_file_name, jd_file_name):
+            self._save_score(resume_file_name, jd_file_name, score_json,
+                             cached.get('criteria_version') or criteria_version)
+        return score_json
+    
+    @classmethod
+    def _is_gated_row(cls, row):
+        """已保存的评分是否来自词法预过滤"""
+        return str(row.get('criteria_version') or '').startswith(cls.GATED_VERSION_PREFIX)
+    
+    def _score_from_row(self, row, candidate_names=None):
+        """将已保存的评分记录转换为score_resume的返回格式"""
+        if candidate_names is None:
+            candidate_name = self.file_service.store.get_candidate_name(row['resume_name'])
+        else:
+            candidate_name = candidate_names.get(row['resume_name'])
+        score_json = {
+            "candidate_name": candidate_name or "Unknown",
+            "scores": json.loads(row['scores']) if isinstance(row['scores'], str) else {},
+            "total_score": row['total_score']
+        }
+        if self._is_gated_row(row):
+            score_json["gated"] = True
+        return score_json
+    
+    def _save_score(self, resume_file_name, jd_file_name, score_json, criteria_version=None):
+        """将评分保存到存储中"""
+        store = self.file_service.store
+        scores_str = json.dumps(score_json.get('scores', {}))
+        store.save_score(
+            resume_file_name,
+            jd_file_name,
+            scores_str,
+            score_json.get('total_score', 0),
+            resume_hash=store.get_raw_hash(DocType.RESUME, resume_file_name),
+            jd_hash=store.get_raw_hash(DocType.JD, jd_file_name),
+            criteria_version=criteria_version
+        )
+        
+        # 保存候选人信息到resume_analysis；被预过滤跳过的评分没有从简历中提取姓名，不覆盖已有信息
+        if not score_json.get('gated'):
+            self._save_candidate_info(resume_file_name, score_json)
     
     def _save_candidate_info(self, resume_file_name, score_json):
-        """将候选人信息保存到CSV"""
+        """将候选人信息保存到存储中"""
         candidate_name = score_json.get('candidate_name', 'Unknown')
         skills = json.dumps(score_json.get('scores', {}))
-        
-        new_row = pd.DataFrame([{
-            'file_name': resume_file_name,
-            'candidate_name': candidate_name,
-            'skills': skills,
-            'analyzed_at': datetime.now()
-        }])
-        
-        # 读取现有数据
-        if os.path.exists(self.file_service.resume_analysis_path):
-            df = pd.read_csv(self.file_service.resume_analysis_path)
-            # 检查是否已存在该简历的分析
-            df = df[df['file_name'] != resume_file_name]
-            df = pd.concat([df, new_row], ignore_index=True)
-        else:
-            df = new_row
-            
-        # 保存回CSV
-        df.to_csv(self.file_service.resume_analysis_path, index=False)
+        self.file_service.store.save_candidate_info(resume_file_name, candidate_name, skills)
     
     def get_scores(self, resume_file_name=None, jd_file_name=None):
         """获取评分结果"""
-        if not os.path.exists(self.file_service.scores_path):
-            return []
-        
-        df = pd.read_csv(self.file_service.scores_path)
-        
-        if resume_file_name and jd_file_name:
-            # 获取特定简历和JD的评分
-            result = df[(df['resume_name'] == resume_file_name) & (df['jd_name'] == jd_file_name)]
-        elif resume_file_name:
-            # 获取特定简历的所有评分
-            result = df[df['resume_name'] == resume_file_name]
-        elif jd_file_name:
-            # 获取特定JD的所有评分
-            result = df[df['jd_name'] == jd_file_name]
-        else:
-            # 获取所有评分
-            result = df
+        rows = self.file_service.store.get_scores(
+            resume_name=resume_file_name,
+            jd_name=jd_file_name
+        )
         
         # 转换为字典列表
         scores = []
-        for _, row in result.iterrows():
+        for row in rows:
             score_dict = {
                 'resume_name': row['resume_name'],
                 'jd_name': row['jd_name'],
@@ -210,6 +817,9 @@ class ResumeService:
         for score in scores:
             all_criteria.update(score['scores'].keys())
         
+        # 一次性读取所有候选人姓名
+        candidate_names = self.file_service.store.get_candidate_names()
+        
         # 创建DataFrame
         data = []
         for score in scores:
@@ -220,11 +830,7 @@ class ResumeService:
             }
             
             # 获取候选人姓名
-            if os.path.exists(self.file_service.resume_analysis_path):
-                resume_df = pd.read_csv(self.file_service.resume_analysis_path)
-                candidate_info = resume_df[resume_df['file_name'] == score['resume_name']]
-                if not candidate_info.empty:
-                    row['Candidate'] = candidate_info.iloc[0]['candidate_name']
+            row['Candidate'] = candidate_names.get(score['resume_name'], 'Unknown')
             
             # 添加每个criteria的评分
             for criterion in all_criteria:
@@ -281,6 +887,9 @@ class ResumeService:
                 jd_groups[jd_name] = []
             jd_groups[jd_name].append(score)
         
+        # 一次性读取所有候选人姓名
+        candidate_names = self.file_service.store.get_candidate_names()
+        
         # 如果未指定输出路径，则使用默认路径
         if output_path is None:
             # 创建输出目录
@@ -310,11 +919,7 @@ class ResumeService:
                     }
                     
                     # 获取候选人姓名
-                    if os.path.exists(self.file_service.resume_analysis_path):
-                        resume_df = pd.read_csv(self.file_service.resume_analysis_path)
-                        candidate_info = resume_df[resume_df['file_name'] == score['resume_name']]
-                        if not candidate_info.empty:
-                            row['Candidate'] = candidate_info.iloc[0]['candidate_name']
+                    row['Candidate'] = candidate_names.get(score['resume_name'], 'Unknown')
                     
                     # 添加每个criteria的评分
                     for criterion in all_criteria:
@@ -354,12 +959,8 @@ class ResumeService:
                     })
             
             # 获取候选人姓名
-            if os.path.exists(self.file_service.resume_analysis_path):
-                resume_df = pd.read_csv(self.file_service.resume_analysis_path)
-                for i, row in enumerate(summary_data):
-                    candidate_info = resume_df[resume_df['file_name'] == row['Resume']]
-                    if not candidate_info.empty:
-                        summary_data[i]['Candidate'] = candidate_info.iloc[0]['candidate_name']
+            for row in summary_data:
+                row['Candidate'] = candidate_names.get(row['Resume'], 'Unknown')
             
             # 创建汇总DataFrame并按JD和总分排序
             summary_df = pd.DataFrame(summary_data)
@@ -0,0 +1,68 @@
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Hashable, Tuple
+
+from app.services.hedging import DeadlineExceeded, remaining_time
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into a single execution.
+
+    The first caller for a key becomes the leader and runs the work; callers
+    that arrive while it is in flight wait for the leader and receive the same
+    result (or exception). Once the leader finishes the key is released, so
+    results should be cached by the caller before resolve() is called.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def claim(self, key: Hashable) -> Tuple[Future, bool]:
+        """返回(future, leader)，leader为True时调用方负责执行并调用resolve()"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.executed += 1
+            return future, True
+
+    def resolve(self, key: Hashable, future: Future, result=None, error: BaseException = None) -> None:
+        """发布leader的结果并释放key"""
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    @staticmethod
+    def wait(future: Future):
+        """等待leader的结果，遵守deadline_scope()设置的截止时间"""
+        try:
+            return future.result(timeout=remaining_time())
+        except FutureTimeoutError:
+            raise DeadlineExceeded("Deadline exceeded while waiting for an in-flight call") from None
+
+    def do(self, key: Hashable, func: Callable):
+        """执行func，同一key已有调用在执行时等待并共享其结果"""
+        future, leader = self.claim(key)
+        if not leader:
+            return self.wait(future)
+        try:
+            result = func()
+        except BaseException as e:
+            self.resolve(key, future, error=e)
+            raise
+        self.resolve(key, future, result=result)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'executed': self.executed, 'coalesced': self.coalesced, 'in_flight': len(self._calls)}
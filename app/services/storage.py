@@ -0,0 +1,868 @@
+import os
+import csv
+import hashlib
+import sqlite3
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Literal, Optional, Tuple
+
+from app import config
+from app.utils.lazy_import import lazy_import
+from app.services.local_scorer import tokenize, bm25_idf, bm25_rank
+from app.utils.constants import (
+    RAW_DATA_COLUMNS,
+    JD_ANALYSIS_COLUMNS,
+    RESUME_ANALYSIS_COLUMNS,
+    SCORES_COLUMNS,
+    CRITERION_SCORES_COLUMNS,
+    ACTIVE_JDS_COLUMNS,
+    JOBS_COLUMNS,
+)
+
+# pandas只在CSV后端中使用，SQLite后端的读写和CSV迁移不需要导入
+pd = lazy_import("pandas")
+
+
+def _to_datetime(value) -> datetime:
+    """将存储的时间字符串转换为datetime"""
+    if isinstance(value, datetime):
+        return value
+    # SQLite中保存的是str(datetime)，不需要为此导入pandas
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return pd.to_datetime(value).to_pydatetime()
+
+
+def _none_if_nan(value):
+    """pandas读取的空值为NaN，写入SQLite前转换为None"""
+    if isinstance(value, float) and pd.isna(value):
+        return None
+    return value
+
+
+class CSVStore:
+    """Document store backed by the original CSV files.
+
+    Every write rewrites the whole file, so this backend is only suitable for
+    small corpora. It is kept for compatibility with existing data directories.
+    Writes are serialized and replace the file atomically, so reads need no lock.
+    """
+
+    def __init__(self,
+                 raw_jd_path: str = config.RAW_JD_PATH,
+                 raw_resume_path: str = config.RAW_RESUME_PATH,
+                 jd_analysis_path: str = config.JD_ANALYSIS_PATH,
+                 resume_analysis_path: str = config.RESUME_ANALYSIS_PATH,
+                 scores_path: str = config.SCORES_PATH,
+                 criterion_scores_path: str = config.CRITERION_SCORES_PATH,
+                 active_jds_path: Optional[str] = None,
+                 jobs_path: Optional[str] = None):
+        self.raw_jd_path = raw_jd_path
+        self.raw_resume_path = raw_resume_path
+        self.jd_analysis_path = jd_analysis_path
+        self.resume_analysis_path = resume_analysis_path
+        self.scores_path = scores_path
+        self.criterion_scores_path = criterion_scores_path
+        # 已上传JD的列表默认与原始JD文件放在同一目录
+        self.active_jds_path = active_jds_path or os.path.join(os.path.dirname(raw_jd_path), "active_jds.csv")
+        self.jobs_path = jobs_path or os.path.join(os.path.dirname(raw_jd_path), "jobs.csv")
+        self._columns = {
+            self.raw_jd_path: RAW_DATA_COLUMNS,
+            self.raw_resume_path: RAW_DATA_COLUMNS,
+            self.jd_analysis_path: JD_ANALYSIS_COLUMNS,
+            self.resume_analysis_path: RESUME_ANALYSIS_COLUMNS,
+            self.scores_path: SCORES_COLUMNS,
+            self.criterion_scores_path: CRITERION_SCORES_COLUMNS,
+            self.active_jds_path: ACTIVE_JDS_COLUMNS,
+            self.jobs_path: JOBS_COLUMNS
+        }
+        # CSV的读-改-写不是原子操作，需要串行化
+        self._lock = threading.RLock()
+        self._init_csv_files()
+
+    def _init_csv_files(self):
+        """Initialize CSV files if they don't exist"""
+        for file_path, columns in self._columns.items():
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+            if not os.path.exists(file_path):
+                self._write(file_path, pd.DataFrame(columns=columns))
+
+    def _raw_path(self, doc_type: Literal['JD', 'Resume']) -> str:
+        return self.raw_jd_path if doc_type == 'JD' else self.raw_resume_path
+
+    def _read(self, csv_path: str) -> 'pd.DataFrame':
+        # 旧版CSV文件可能缺少新增的列
+        return pd.read_csv(csv_path).reindex(columns=self._columns[csv_path])
+
+    @staticmethod
+    def _write(csv_path: str, df: 'pd.DataFrame') -> None:
+        """先写入同目录下的临时文件再替换原文件，不加锁的读取不会读到写了一半的文件"""
+        fd, tmp_path = tempfile.mkstemp(prefix=".store-", suffix=".csv.tmp",
+                                        dir=os.path.dirname(csv_path) or ".")
+        os.close(fd)
+        try:
+            df.to_csv(tmp_path, index=False)
+            os.replace(tmp_path, csv_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _upsert(self, csv_path: str, new_row: dict, keep_mask) -> None:
+        """删除keep_mask为False的行后追加新行并写回"""
+        with self._lock:
+            df = self._read(csv_path)
+            df = df[keep_mask(df)]
+            df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
+            self._write(csv_path, df)
+
+    def _delete(self, csv_path: str, drop_mask) -> None:
+        """删除drop_mask为True的行并写回"""
+        with self._lock:
+            df = self._read(csv_path)
+            df = df[~drop_mask(df)]
+            self._write(csv_path, df)
+
+    def save_raw_content(self, doc_type: Literal['JD', 'Resume'], file_name: str,
+                         content: str, extracted_at: datetime,
+                         content_hash: Optional[str] = None) -> None:
+        self._upsert(self._raw_path(doc_type), {
+            'file_name': file_name,
+            'content': content,
+            'extracted_at': extracted_at,
+            'content_hash': content_hash
+        }, lambda df: df['file_name'] != file_name)
+
+    def get_raw_content(self, doc_type: Literal['JD', 'Resume'],
+                        file_name: str) -> Optional[Tuple[str, datetime]]:
+        df = self._read(self._raw_path(doc_type))
+        result = df[df['file_name'] == file_name]
+        if result.empty:
+            return None
+        # 旧数据中同名文件可能有多行，以最新的一行为准
+        return result.iloc[-1]['content'], _to_datetime(result.iloc[-1]['extracted_at'])
+
+    def get_raw_hash(self, doc_type: Literal['JD', 'Resume'], file_name: str) -> Optional[str]:
+        df = self._read(self._raw_path(doc_type))
+        result = df[df['file_name'] == file_name]
+        if result.empty:
+            return None
+        return _none_if_nan(result.iloc[-1]['content_hash'])
+
+    def find_raw_content_by_hash(self, doc_type: Literal['JD', 'Resume'],
+                                 content_hash: str) -> Optional[str]:
+        df = self._read(self._raw_path(doc_type))
+        result = df[df['content_hash'] == content_hash]
+        if result.empty:
+            return None
+        return result.iloc[-1]['content']
+
+    def list_raw_files(self, doc_type: Literal['JD', 'Resume']) -> List[str]:
+        df = self._read(self._raw_path(doc_type))
+        return list(dict.fromkeys(df['file_name'].tolist()))
+
+    def get_raw_contents(self, doc_type: Literal['JD', 'Resume']) -> Dict[str, Tuple[str, Optional[str]]]:
+        df = self._read(self._raw_path(doc_type))
+        # 同名文件有多行时，后面的行覆盖前面的行
+        return {row['file_name']: (row['content'], _none_if_nan(row['content_hash']))
+                for row in df.to_dict('records')}
+
+    def search_resumes(self, terms: Iterable[str], top_k: int,
+                       k1: float = config.BM25_K1, b: float = config.BM25_B) -> List[Tuple[str, float]]:
+        # CSV后端没有持久化的索引，每次查询时对所有简历切词
+        documents = {
+            file_name: Counter(tokenize(content))
+            for file_name, (content, _) in self.get_raw_contents('Resume').items()
+            if isinstance(content, str)
+        }
+        return bm25_rank(documents, terms, top_k, k1, b)
+
+    def save_criteria(self, file_name: str, criteria: str,
+                      content_hash: Optional[str] = None) -> None:
+        self._upsert(self.jd_analysis_path, {
+            'file_name': file_name,
+            'criteria': criteria,
+            'analyzed_at': datetime.now(),
+            'content_hash': content_hash
+        }, lambda df: df['file_name'] != file_name)
+
+    def get_criteria(self, file_name: str) -> Optional[str]:
+        df = self._read(self.jd_analysis_path)
+        result = df[df['file_name'] == file_name]
+        if result.empty:
+            return None
+        return result.iloc[0]['criteria']
+
+    def find_criteria_by_hash(self, content_hash: str) -> Optional[str]:
+        df = self._read(self.jd_analysis_path)
+        result = df[df['content_hash'] == content_hash]
+        if result.empty:
+            return None
+        return result.iloc[0]['criteria']
+
+    def save_candidate_info(self, file_name: str, candidate_name: str, skills: str) -> None:
+        self._upsert(self.resume_analysis_path, {
+            'file_name': file_name,
+            'candidate_name': candidate_name,
+            'skills': skills,
+            'analyzed_at': datetime.now()
+        }, lambda df: df['file_name'] != file_name)
+
+    def get_candidate_name(self, file_name: str) -> Optional[str]:
+        return self.get_candidate_names().get(file_name)
+
+    def get_candidate_names(self) -> Dict[str, str]:
+        df = self._read(self.resume_analysis_path)
+        return dict(zip(df['file_name'], df['candidate_name']))
+
+    def save_score(self, resume_name: str, jd_name: str, scores: str, total_score,
+                   resume_hash: Optional[str] = None, jd_hash: Optional[str] = None,
+                   criteria_version: Optional[str] = None) -> None:
+        self._upsert(self.scores_path, {
+            'resume_name': resume_name,
+            'jd_name': jd_name,
+            'scores': scores,
+            'total_score': total_score,
+            'scored_at': datetime.now(),
+            'resume_hash': resume_hash,
+            'jd_hash': jd_hash,
+            'criteria_version': criteria_version
+        }, lambda df: (df['resume_name'] != resume_name) | (df['jd_name'] != jd_name))
+
+    def save_scores(self, records: Iterable[dict]) -> None:
+        records = [dict(record, scored_at=datetime.now()) for record in records]
+        if not records:
+            return
+        keys = [(record['resume_name'], record['jd_name']) for record in records]
+        with self._lock:
+            df = self._read(self.scores_path)
+            existing = pd.MultiIndex.from_arrays([df['resume_name'], df['jd_name']])
+            df = df[~existing.isin(keys)]
+            df = pd.concat([df, pd.DataFrame(records).reindex(columns=SCORES_COLUMNS)], ignore_index=True)
+            self._write(self.scores_path, df)
+
+    def _score_records(self, df: 'pd.DataFrame') -> List[dict]:
+        return [{k: _none_if_nan(v) for k, v in row.items()}
+                for row in df[SCORES_COLUMNS].to_dict('records')]
+
+    def get_scores(self, resume_name: Optional[str] = None,
+                   jd_name: Optional[str] = None) -> List[dict]:
+        df = self._read(self.scores_path)
+        if resume_name:
+            df = df[df['resume_name'] == resume_name]
+        if jd_name:
+            df = df[df['jd_name'] == jd_name]
+        return self._score_records(df)
+
+    def find_score_by_hash(self, resume_hash: str, jd_hash: str,
+                           criteria_versions: Optional[Iterable[str]] = None) -> Optional[dict]:
+        """
+        按简历和JD的内容哈希查找评分，有多条时返回最新的一条
+        
+        criteria_versions不为None时只查找这些criteria版本的评分（以及没有记录版本的旧评分）
+        """
+        df = self._read(self.scores_path)
+        result = df[(df['resume_hash'] == resume_hash) & (df['jd_hash'] == jd_hash)]
+        if criteria_versions is not None:
+            result = result[result['criteria_version'].isin(list(criteria_versions)) |
+                            result['criteria_version'].isna()]
+        if result.empty:
+            return None
+        result = result.sort_values('scored_at', ascending=False,
+                                    key=lambda column: pd.to_datetime(column, errors='coerce'))
+        return self._score_records(result)[0]
+
+    def delete_scores(self, resume_names: Iterable[str]) -> None:
+        resume_names = list(resume_names)
+        self._delete(self.scores_path, lambda df: df['resume_name'].isin(resume_names))
+
+    def save_criterion_scores(self, resume_hash: str, scores: Dict[str, float]) -> None:
+        if not scores:
+            return
+        now = datetime.now()
+        with self._lock:
+            df = self._read(self.criterion_scores_path)
+            df = df[~((df['resume_hash'] == resume_hash) & df['criterion'].isin(list(scores)))]
+            new_rows = pd.DataFrame([
+                {'resume_hash': resume_hash, 'criterion': criterion, 'score': score, 'scored_at': now}
+                for criterion, score in scores.items()
+            ])
+            df = pd.concat([df, new_rows], ignore_index=True)
+            self._write(self.criterion_scores_path, df)
+
+    def get_criterion_scores(self, resume_hash: str, criteria: Iterable[str]) -> Dict[str, float]:
+        criteria = list(criteria)
+        df = self._read(self.criterion_scores_path)
+        result = df[(df['resume_hash'] == resume_hash) & df['criterion'].isin(criteria)]
+        return dict(zip(result['criterion'], result['score']))
+
+    def activate_jds(self, file_names: Iterable[str]) -> None:
+        """将JD加入参与简历评分的JD列表，已在列表中的JD保持原来的顺序"""
+        file_names = list(dict.fromkeys(file_names))
+        if not file_names:
+            return
+        now = datetime.now()
+        with self._lock:
+            df = self._read(self.active_jds_path).astype(object)
+            df.loc[df['file_name'].isin(file_names), 'activated_at'] = now
+            new_names = [name for name in file_names if name not in set(df['file_name'])]
+            if new_names:
+                new_rows = pd.DataFrame({'file_name': new_names, 'activated_at': [now] * len(new_names)})
+                df = pd.concat([df, new_rows], ignore_index=True) if len(df) else new_rows
+            # 即使列表没有变化也重写文件，使版本号变化
+            self._write(self.active_jds_path, df)
+
+    def list_active_jds(self) -> List[str]:
+        return self._read(self.active_jds_path)['file_name'].tolist()
+
+    def get_active_jds_version(self) -> str:
+        # 每次修改都会重写文件（包括激活时间），以文件内容的哈希作为版本号，其他进程的修改同样可见
+        with open(self.active_jds_path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def save_job(self, job_id: str, job: str) -> None:
+        self._upsert(self.jobs_path, {
+            'job_id': job_id,
+            'job': job,
+            'updated_at': datetime.now()
+        }, lambda df: df['job_id'] != job_id)
+
+    def get_job(self, job_id: str) -> Optional[str]:
+        df = self._read(self.jobs_path)
+        result = df[df['job_id'] == job_id]
+        if result.empty:
+            return None
+        return result.iloc[0]['job']
+
+    def delete_jobs(self, job_ids: Iterable[str]) -> None:
+        job_ids = list(job_ids)
+        if job_ids:
+            self._delete(self.jobs_path, lambda df: df['job_id'].isin(job_ids))
+
+    def invalidate_derived(self, doc_type: Literal['JD', 'Resume'], file_name: str) -> None:
+        """文件内容变化后，删除由该文件派生的分析结果和评分"""
+        if doc_type == 'JD':
+            self._delete(self.jd_analysis_path, lambda df: df['file_name'] == file_name)
+            self._delete(self.scores_path, lambda df: df['jd_name'] == file_name)
+        else:
+            self._delete(self.resume_analysis_path, lambda df: df['file_name'] == file_name)
+            self._delete(self.scores_path, lambda df: df['resume_name'] == file_name)
+
+
+class SQLiteStore:
+    """Document store backed by an indexed SQLite database.
+
+    Rows are keyed on file_name (and (resume_name, jd_name) for scores), so
+    single-row upserts and lookups do not depend on the size of the corpus.
+    On first use the existing CSV files are imported once.
+
+    Resumes are also kept in an inverted index (term -> resume, term
+    frequency) that is updated in the same transaction as the raw content
+    and used for BM25 retrieval by search_resumes().
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS raw_jd (
+            file_name TEXT PRIMARY KEY,
+            content TEXT,
+            extracted_at TEXT,
+            content_hash TEXT
+        );
+        CREATE TABLE IF NOT EXISTS raw_resume (
+            file_name TEXT PRIMARY KEY,
+            content TEXT,
+            extracted_at TEXT,
+            content_hash TEXT
+        );
+        CREATE TABLE IF NOT EXISTS jd_analysis (
+            file_name TEXT PRIMARY KEY,
+            criteria TEXT,
+            analyzed_at TEXT,
+            content_hash TEXT
+        );
+        CREATE TABLE IF NOT EXISTS resume_analysis (
+            file_name TEXT PRIMARY KEY,
+            candidate_name TEXT,
+            skills TEXT,
+            analyzed_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS scores (
+            resume_name TEXT NOT NULL,
+            jd_name TEXT NOT NULL,
+            scores TEXT,
+            total_score REAL,
+            scored_at TEXT,
+            resume_hash TEXT,
+            jd_hash TEXT,
+            criteria_version TEXT,
+            PRIMARY KEY (resume_name, jd_name)
+        );
+        CREATE INDEX IF NOT EXISTS idx_scores_jd_name ON scores (jd_name);
+        CREATE TABLE IF NOT EXISTS criterion_scores (
+            resume_hash TEXT NOT NULL,
+            criterion TEXT NOT NULL,
+            score REAL,
+            scored_at TEXT,
+            PRIMARY KEY (resume_hash, criterion)
+        );
+        CREATE TABLE IF NOT EXISTS resume_index_docs (
+            file_name TEXT PRIMARY KEY,
+            content_hash TEXT,
+            length INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS resume_index_postings (
+            term TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            tf INTEGER,
+            length INTEGER,
+            PRIMARY KEY (term, file_name)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_resume_index_postings_file ON resume_index_postings (file_name);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS active_jds (
+            file_name TEXT PRIMARY KEY,
+            activated_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            job TEXT,
+            updated_at TEXT
+        );
+    """
+
+    # 旧版数据库中缺少的列，启动时自动补齐
+    ADDED_COLUMNS = {
+        'raw_jd': ['content_hash'],
+        'raw_resume': ['content_hash'],
+        'jd_analysis': ['content_hash'],
+        'scores': ['resume_hash', 'jd_hash', 'criteria_version']
+    }
+
+    INDEXES = """
+        CREATE INDEX IF NOT EXISTS idx_raw_jd_hash ON raw_jd (content_hash);
+        CREATE INDEX IF NOT EXISTS idx_raw_resume_hash ON raw_resume (content_hash);
+        CREATE INDEX IF NOT EXISTS idx_jd_analysis_hash ON jd_analysis (content_hash);
+        CREATE INDEX IF NOT EXISTS idx_scores_hash ON scores (resume_hash, jd_hash);
+    """
+
+    def __init__(self,
+                 db_path: str = config.SQLITE_DB_PATH,
+                 raw_jd_path: str = config.RAW_JD_PATH,
+                 raw_resume_path: str = config.RAW_RESUME_PATH,
+                 jd_analysis_path: str = config.JD_ANALYSIS_PATH,
+                 resume_analysis_path: str = config.RESUME_ANALYSIS_PATH,
+                 scores_path: str = config.SCORES_PATH):
+        self.db_path = db_path
+        self.csv_paths = {
+            'raw_jd': raw_jd_path,
+            'raw_resume': raw_resume_path,
+            'jd_analysis': jd_analysis_path,
+            'resume_analysis': resume_analysis_path,
+            'scores': scores_path
+        }
+        # 每个线程使用独立的连接
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._init_db()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._conn()
+        with conn:
+            conn.executescript(self.SCHEMA)
+            for table, columns in self.ADDED_COLUMNS.items():
+                existing = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+                for column in columns:
+                    if column not in existing:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+            conn.executescript(self.INDEXES)
+        if not self._get_meta('csv_migrated'):
+            self.migrate_from_csv()
+        self.sync_resume_index()
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def migrate_from_csv(self) -> Dict[str, int]:
+        """Import existing CSV data into the database (one-shot).
+
+        Returns:
+            Number of rows imported per table
+        """
+        table_columns = {
+            'raw_jd': RAW_DATA_COLUMNS,
+            'raw_resume': RAW_DATA_COLUMNS,
+            'jd_analysis': JD_ANALYSIS_COLUMNS,
+            'resume_analysis': RESUME_ANALYSIS_COLUMNS,
+            'scores': SCORES_COLUMNS
+        }
+        imported = {}
+        # 提取的全文可能超过csv模块默认的单字段长度上限（128KB）
+        csv.field_size_limit(max(csv.field_size_limit(), 2 ** 31 - 1))
+        conn = self._conn()
+        with conn:
+            for table, columns in table_columns.items():
+                csv_path = self.csv_paths[table]
+                if not os.path.exists(csv_path):
+                    continue
+                # 用csv模块读取，启动时迁移不需要导入pandas；空值和缺少的列写入None
+                with open(csv_path, newline='', encoding='utf-8') as f:
+                    rows = [tuple(row.get(column) or None for column in columns)
+                            for row in csv.DictReader(f)]
+                if not rows:
+                    imported[table] = 0
+                    continue
+                # 按CSV中的顺序写入，同名记录以最后一条为准
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' * len(columns))})",
+                    rows
+                )
+                imported[table] = len(rows)
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('csv_migrated', ?)",
+                (datetime.now().isoformat(),)
+            )
+        if imported:
+            print(f"Migrated CSV data into {self.db_path}: {imported}")
+        return imported
+
+    def _raw_table(self, doc_type: Literal['JD', 'Resume']) -> str:
+        return 'raw_jd' if doc_type == 'JD' else 'raw_resume'
+
+    def save_raw_content(self, doc_type: Literal['JD', 'Resume'], file_name: str,
+                         content: str, extracted_at: datetime,
+                         content_hash: Optional[str] = None) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self._raw_table(doc_type)} "
+                "(file_name, content, extracted_at, content_hash) VALUES (?, ?, ?, ?)",
+                (file_name, content, str(extracted_at), content_hash)
+            )
+            if doc_type == 'Resume':
+                self._index_resume(conn, file_name, content, content_hash)
+
+    @staticmethod
+    def _index_resume(conn: sqlite3.Connection, file_name: str, content: str,
+                      content_hash: Optional[str]) -> None:
+        """更新一份简历在倒排索引中的词频（调用方负责事务）"""
+        counts = Counter(tokenize(content)) if isinstance(content, str) else Counter()
+        length = sum(counts.values())
+        conn.execute("DELETE FROM resume_index_postings WHERE file_name = ?", (file_name,))
+        # 文档长度冗余保存在每条倒排记录中，检索时不需要再关联resume_index_docs
+        conn.executemany(
+            "INSERT INTO resume_index_postings (term, file_name, tf, length) VALUES (?, ?, ?, ?)",
+            [(term, file_name, tf, length) for term, tf in counts.items()]
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO resume_index_docs (file_name, content_hash, length) VALUES (?, ?, ?)",
+            (file_name, content_hash, length)
+        )
+
+    def sync_resume_index(self) -> int:
+        """
+        为尚未索引或内容已变化的简历补建倒排索引（例如旧版数据库或从CSV导入的数据）
+
+        Returns:
+            重新索引的简历数
+        """
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT r.file_name, r.content, r.content_hash FROM raw_resume r "
+            "LEFT JOIN resume_index_docs d ON d.file_name = r.file_name "
+            "WHERE d.file_name IS NULL OR d.content_hash IS NOT r.content_hash"
+        ).fetchall()
+        with conn:
+            for row in rows:
+                self._index_resume(conn, row['file_name'], row['content'], row['content_hash'])
+        return len(rows)
+
+    def search_resumes(self, terms: Iterable[str], top_k: int,
+                       k1: float = config.BM25_K1, b: float = config.BM25_B) -> List[Tuple[str, float]]:
+        """
+        按BM25从倒排索引中检索简历
+
+        Returns:
+            [(简历文件名, 得分), ...]，按得分从高到低排列，最多top_k条
+        """
+        terms = list(dict.fromkeys(terms))
+        if not terms:
+            return []
+        conn = self._conn()
+        stats = conn.execute("SELECT COUNT(*) AS n, AVG(length) AS avgdl FROM resume_index_docs").fetchone()
+        if not stats['n']:
+            return []
+        placeholders = ', '.join('?' * len(terms))
+        doc_freq = conn.execute(
+            f"SELECT term, COUNT(*) AS df FROM resume_index_postings WHERE term IN ({placeholders}) GROUP BY term",
+            terms
+        ).fetchall()
+        if not doc_freq:
+            return []
+
+        # 查询词及其IDF作为临时表参与聚合，得分在SQLite中一次计算完成
+        query_values = ', '.join('(?, ?)' for _ in doc_freq)
+        params = [value for row in doc_freq for value in (row['term'], bm25_idf(stats['n'], row['df']))]
+        rows = conn.execute(
+            f"WITH query (term, idf) AS (VALUES {query_values}) "
+            "SELECT p.file_name, "
+            "SUM(q.idf * p.tf * (? + 1) / (p.tf + ? * (1 - ? + ? * p.length / ?))) AS score "
+            "FROM query q "
+            "JOIN resume_index_postings p ON p.term = q.term "
+            "GROUP BY p.file_name ORDER BY score DESC LIMIT ?",
+            params + [k1, k1, b, b, stats['avgdl'] or 1.0, top_k]
+        ).fetchall()
+        return [(row['file_name'], row['score']) for row in rows]
+
+    def get_raw_content(self, doc_type: Literal['JD', 'Resume'],
+                        file_name: str) -> Optional[Tuple[str, datetime]]:
+        row = self._conn().execute(
+            f"SELECT content, extracted_at FROM {self._raw_table(doc_type)} WHERE file_name = ?",
+            (file_name,)
+        ).fetchone()
+        if row is None:
+            return None
+        return row['content'], _to_datetime(row['extracted_at'])
+
+    def get_raw_hash(self, doc_type: Literal['JD', 'Resume'], file_name: str) -> Optional[str]:
+        row = self._conn().execute(
+            f"SELECT content_hash FROM {self._raw_table(doc_type)} WHERE file_name = ?",
+            (file_name,)
+        ).fetchone()
+        return row['content_hash'] if row else None
+
+    def find_raw_content_by_hash(self, doc_type: Literal['JD', 'Resume'],
+                                 content_hash: str) -> Optional[str]:
+        row = self._conn().execute(
+            f"SELECT content FROM {self._raw_table(doc_type)} WHERE content_hash = ? LIMIT 1",
+            (content_hash,)
+        ).fetchone()
+        return row['content'] if row else None
+
+    def list_raw_files(self, doc_type: Literal['JD', 'Resume']) -> List[str]:
+        rows = self._conn().execute(
+            f"SELECT file_name FROM {self._raw_table(doc_type)} ORDER BY rowid"
+        ).fetchall()
+        return [row['file_name'] for row in rows]
+
+    def get_raw_contents(self, doc_type: Literal['JD', 'Resume']) -> Dict[str, Tuple[str, Optional[str]]]:
+        rows = self._conn().execute(
+            f"SELECT file_name, content, content_hash FROM {self._raw_table(doc_type)} ORDER BY rowid"
+        ).fetchall()
+        return {row['file_name']: (row['content'], row['content_hash']) for row in rows}
+
+    def save_criteria(self, file_name: str, criteria: str,
+                      content_hash: Optional[str] = None) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jd_analysis (file_name, criteria, analyzed_at, content_hash) "
+                "VALUES (?, ?, ?, ?)",
+                (file_name, criteria, str(datetime.now()), content_hash)
+            )
+
+    def get_criteria(self, file_name: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT criteria FROM jd_analysis WHERE file_name = ?", (file_name,)
+        ).fetchone()
+        return row['criteria'] if row else None
+
+    def find_criteria_by_hash(self, content_hash: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT criteria FROM jd_analysis WHERE content_hash = ? LIMIT 1", (content_hash,)
+        ).fetchone()
+        return row['criteria'] if row else None
+
+    def save_candidate_info(self, file_name: str, candidate_name: str, skills: str) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO resume_analysis (file_name, candidate_name, skills, analyzed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (file_name, candidate_name, skills, str(datetime.now()))
+            )
+
+    def get_candidate_name(self, file_name: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT candidate_name FROM resume_analysis WHERE file_name = ?", (file_name,)
+        ).fetchone()
+        return row['candidate_name'] if row else None
+
+    def get_candidate_names(self) -> Dict[str, str]:
+        rows = self._conn().execute(
+            "SELECT file_name, candidate_name FROM resume_analysis"
+        ).fetchall()
+        return {row['file_name']: row['candidate_name'] for row in rows}
+
+    def save_score(self, resume_name: str, jd_name: str, scores: str, total_score,
+                   resume_hash: Optional[str] = None, jd_hash: Optional[str] = None,
+                   criteria_version: Optional[str] = None) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO scores "
+                "(resume_name, jd_name, scores, total_score, scored_at, "
+                "resume_hash, jd_hash, criteria_version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (resume_name, jd_name, scores, total_score, str(datetime.now()),
+                 resume_hash, jd_hash, criteria_version)
+            )
+
+    def save_scores(self, records: Iterable[dict]) -> None:
+        now = str(datetime.now())
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO scores "
+                "(resume_name, jd_name, scores, total_score, scored_at, "
+                "resume_hash, jd_hash, criteria_version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(record['resume_name'], record['jd_name'], record['scores'], record['total_score'], now,
+                  record.get('resume_hash'), record.get('jd_hash'), record.get('criteria_version'))
+                 for record in records]
+            )
+
+    def get_scores(self, resume_name: Optional[str] = None,
+                   jd_name: Optional[str] = None) -> List[dict]:
+        query = f"SELECT {', '.join(SCORES_COLUMNS)} FROM scores"
+        conditions = []
+        params = []
+        if resume_name:
+            conditions.append("resume_name = ?")
+            params.append(resume_name)
+        if jd_name:
+            conditions.append("jd_name = ?")
+            params.append(jd_name)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        rows = self._conn().execute(query + " ORDER BY rowid", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def find_score_by_hash(self, resume_hash: str, jd_hash: str,
+                           criteria_versions: Optional[Iterable[str]] = None) -> Optional[dict]:
+        """
+        按简历和JD的内容哈希查找评分，有多条时返回最新的一条
+        
+        criteria_versions不为None时只查找这些criteria版本的评分（以及没有记录版本的旧评分）
+        """
+        query = f"SELECT {', '.join(SCORES_COLUMNS)} FROM scores WHERE resume_hash = ? AND jd_hash = ?"
+        params = [resume_hash, jd_hash]
+        if criteria_versions is not None:
+            criteria_versions = list(criteria_versions)
+            placeholders = ', '.join('?' * len(criteria_versions))
+            query += f" AND (criteria_version IN ({placeholders}) OR criteria_version IS NULL)"
+            params += criteria_versions
+        row = self._conn().execute(query + " ORDER BY scored_at DESC, rowid DESC LIMIT 1", params).fetchone()
+        return dict(row) if row else None
+
+    def delete_scores(self, resume_names: Iterable[str]) -> None:
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "DELETE FROM scores WHERE resume_name = ?",
+                [(name,) for name in resume_names]
+            )
+
+    def save_criterion_scores(self, resume_hash: str, scores: Dict[str, float]) -> None:
+        now = str(datetime.now())
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO criterion_scores (resume_hash, criterion, score, scored_at) "
+                "VALUES (?, ?, ?, ?)",
+                [(resume_hash, criterion, score, now) for criterion, score in scores.items()]
+            )
+
+    def get_criterion_scores(self, resume_hash: str, criteria: Iterable[str]) -> Dict[str, float]:
+        criteria = list(criteria)
+        if not criteria:
+            return {}
+        rows = self._conn().execute(
+            "SELECT criterion, score FROM criterion_scores "
+            f"WHERE resume_hash = ? AND criterion IN ({', '.join('?' * len(criteria))})",
+            [resume_hash] + criteria
+        ).fetchall()
+        return {row['criterion']: row['score'] for row in rows}
+
+    def activate_jds(self, file_names: Iterable[str]) -> None:
+        """将JD加入参与简历评分的JD列表，已在列表中的JD保持原来的顺序"""
+        file_names = list(dict.fromkeys(file_names))
+        if not file_names:
+            return
+        now = str(datetime.now())
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT INTO active_jds (file_name, activated_at) VALUES (?, ?) "
+                "ON CONFLICT(file_name) DO UPDATE SET activated_at = excluded.activated_at",
+                [(file_name, now) for file_name in file_names]
+            )
+            # 版本号与列表在同一事务中更新，其他进程据此判断缓存是否过期
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('active_jds_version', '1') "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+            )
+
+    def list_active_jds(self) -> List[str]:
+        rows = self._conn().execute("SELECT file_name FROM active_jds ORDER BY rowid").fetchall()
+        return [row['file_name'] for row in rows]
+
+    def get_active_jds_version(self) -> str:
+        return self._get_meta('active_jds_version') or '0'
+
+    def save_job(self, job_id: str, job: str) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, job, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET job = excluded.job, updated_at = excluded.updated_at",
+                (job_id, job, str(datetime.now()))
+            )
+
+    def get_job(self, job_id: str) -> Optional[str]:
+        row = self._conn().execute("SELECT job FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row['job'] if row else None
+
+    def delete_jobs(self, job_ids: Iterable[str]) -> None:
+        conn = self._conn()
+        with conn:
+            conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(job_id,) for job_id in job_ids])
+
+    def invalidate_derived(self, doc_type: Literal['JD', 'Resume'], file_name: str) -> None:
+        """文件内容变化后，删除由该文件派生的分析结果和评分"""
+        conn = self._conn()
+        with conn:
+            if doc_type == 'JD':
+                conn.execute("DELETE FROM jd_analysis WHERE file_name = ?", (file_name,))
+                conn.execute("DELETE FROM scores WHERE jd_name = ?", (file_name,))
+            else:
+                conn.execute("DELETE FROM resume_analysis WHERE file_name = ?", (file_name,))
+                conn.execute("DELETE FROM scores WHERE resume_name = ?", (file_name,))
+
+
+def create_store(backend: Optional[str] = None):
+    """根据配置创建存储后端"""
+    backend = backend or config.STORAGE_BACKEND
+    if backend == 'sqlite':
+        return SQLiteStore()
+    elif backend == 'csv':
+        return CSVStore()
+    else:
+        raise ValueError(f"Unsupported storage backend: {backend}")
@@ -0,0 +1,258 @@
+import json
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Union
+
+from pydantic import BaseModel, ValidationError
+
+from app import config
+from app.utils.json_utils import extract_json
+
+# 当前调用要求的响应JSON schema，None表示不约束输出格式
+_response_schema = contextvars.ContextVar('llm_response_schema', default=None)
+
+
+class StructuredOutputError(ValueError):
+    """Raised when a model response cannot be parsed into the expected result type."""
+
+
+class CriteriaResult(BaseModel):
+    criteria: List[str]
+
+    def check(self):
+        if not self.criteria or not all(criterion.strip() for criterion in self.criteria):
+            raise ValueError("criteria must be a non-empty list of non-empty strings")
+
+
+class CriteriaBatchItem(CriteriaResult):
+    jd_id: str
+
+
+class CriteriaBatchResult(BaseModel):
+    # 每个条目单独验证，某个JD的结果无效时只对该JD单独提取
+    results: List[dict]
+
+
+class ScoreResult(BaseModel):
+    candidate_name: Optional[str] = None
+    scores: Dict[str, Union[int, float]]
+    total_score: Optional[float] = None
+
+    def check(self):
+        invalid = [criterion for criterion, score in self.scores.items() if not 0 <= score <= 5]
+        if invalid:
+            raise ValueError(f"scores must be between 0 and 5: {invalid}")
+
+
+class ScoreBatchItem(ScoreResult):
+    resume_id: str
+
+
+class ScoreBatchResult(BaseModel):
+    results: List[dict]
+
+
+def criteria_schema() -> dict:
+    return {
+        "type": "OBJECT",
+        "properties": {"criteria": {"type": "ARRAY", "items": {"type": "STRING"}}},
+        "required": ["criteria"]
+    }
+
+
+def criteria_batch_schema() -> dict:
+    item = criteria_schema()
+    item["properties"]["jd_id"] = {"type": "STRING"}
+    item["required"].append("jd_id")
+    return {
+        "type": "OBJECT",
+        "properties": {"results": {"type": "ARRAY", "items": item}},
+        "required": ["results"]
+    }
+
+
+def _scores_schema(criteria: List[str]) -> dict:
+    # criteria作为属性名，模型必须为每个criterion返回整数评分
+    return {
+        "type": "OBJECT",
+        "properties": {criterion: {"type": "INTEGER"} for criterion in criteria},
+        "required": list(criteria)
+    }
+
+
+def score_schema(criteria: List[str]) -> dict:
+    return {
+        "type": "OBJECT",
+        "properties": {
+            "candidate_name": {"type": "STRING"},
+            "scores": _scores_schema(criteria),
+            "total_score": {"type": "NUMBER"}
+        },
+        "required": ["candidate_name", "scores"]
+    }
+
+
+def score_batch_schema(criteria: List[str]) -> dict:
+    return {
+        "type": "OBJECT",
+        "properties": {"results": {"type": "ARRAY", "items": {
+            "type": "OBJECT",
+            "properties": {
+                "resume_id": {"type": "STRING"},
+                "candidate_name": {"type": "STRING"},
+                "scores": _scores_schema(criteria)
+            },
+            "required": ["resume_id", "candidate_name", "scores"]
+        }}},
+        "required": ["results"]
+    }
+
+
+def current_response_schema() -> Optional[dict]:
+    return _response_schema.get()
+
+
+@contextmanager
+def response_schema_scope(schema: Optional[dict]):
+    """在该范围内发起的LLM调用按schema返回JSON（provider支持时）"""
+    token = _response_schema.set(schema)
+    try:
+        yield
+    finally:
+        _response_schema.reset(token)
+
+
+def validate_structured(data, result_type) -> dict:
+    """
+    按result_type验证已解析的JSON数据
+
+    Returns:
+        验证后的字典
+
+    Raises:
+        StructuredOutputError: 数据不符合result_type
+    """
+    validate = getattr(result_type, 'model_validate', None) or result_type.parse_obj
+    try:
+        result = validate(data)
+        if hasattr(result, 'check'):
+            result.check()
+    except (ValidationError, ValueError, TypeError) as e:
+        raise StructuredOutputError(f"Response does not match {result_type.__name__}: {str(e)}") from e
+    dump = getattr(result, 'model_dump', None) or result.dict
+    return dump()
+
+
+def parse_structured(text: str, result_type) -> dict:
+    """解析并验证模型响应"""
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        # 没有使用JSON模式的响应可能带有说明文字或代码块
+        try:
+            data = extract_json(text or "")
+        except ValueError as e:
+            raise StructuredOutputError(f"Response is not valid JSON: {str(e)}") from e
+    return validate_structured(data, result_type)
+
+
+class ParseStats:
+    """Counts malformed model responses and the outcome of their repair requests."""
+
+    def __init__(self):
+        self.failures = 0
+        self.repaired = 0
+        self.repair_failures = 0
+        self._lock = threading.Lock()
+
+    def record(self, event: str) -> None:
+        with self._lock:
+            setattr(self, event, getattr(self, event) + 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'parse_failures': self.failures,
+                'repaired': self.repaired,
+                'repair_failures': self.repair_failures
+            }
+
+
+# 进程内共享的解析失败统计
+parse_stats = ParseStats()
+
+REPAIR_PROMPT = """
+        The following response was supposed to be a JSON object matching the schema below, but it is invalid.
+
+        Error:
+        {error}
+
+        Schema:
+        {schema}
+
+        Response:
+        {response}
+
+        Return only the corrected JSON object, with no other text.
+        """
+
+
+def generate_structured(model, prompt: str, result_type, schema: Optional[dict] = None) -> dict:
+    """
+    调用模型并按result_type解析响应
+
+    启用config.LLM_STRUCTURED_OUTPUT时请求按schema返回JSON。响应无法解析或不符合result_type时，
+    将错误和原响应发回模型修复（最多config.LLM_JSON_REPAIR_ATTEMPTS次），修复后的结果按原prompt缓存。
+
+    Args:
+        model: CachedModel或provider
+        prompt: prompt文本
+        result_type: 验证响应的pydantic模型
+        schema: 响应的JSON schema
+
+    Returns:
+        验证后的字典
+
+    Raises:
+        StructuredOutputError: 修复后仍然无法解析
+    """
+    request_schema = schema if config.LLM_STRUCTURED_OUTPUT else None
+    with response_schema_scope(request_schema):
+        response = model.generate_content(prompt)
+    try:
+        return parse_structured(response.text, result_type)
+    except StructuredOutputError as e:
+        error = e
+
+    parse_stats.record('failures')
+    print(f"Malformed {result_type.__name__} response, requesting a repair: {str(error)}")
+    # 不缓存无法解析的响应（缓存键包含schema，在同一个schema范围内删除）
+    if hasattr(model, 'discard'):
+        with response_schema_scope(request_schema):
+            model.discard(prompt)
+
+    for _ in range(config.LLM_JSON_REPAIR_ATTEMPTS):
+        repair_prompt = REPAIR_PROMPT.format(
+            error=str(error),
+            schema=json.dumps(schema, indent=2) if schema else "(see the expected format in the original request)",
+            response=response.text
+        )
+        with response_schema_scope(request_schema):
+            repaired = model.generate_content(repair_prompt)
+            if hasattr(model, 'discard'):
+                model.discard(repair_prompt)
+        try:
+            result = parse_structured(repaired.text, result_type)
+        except StructuredOutputError as e:
+            error = e
+            continue
+        parse_stats.record('repaired')
+        # 修复后的结果按原prompt缓存，重新运行时不再调用模型
+        if hasattr(model, 'remember'):
+            with response_schema_scope(request_schema):
+                model.remember(prompt, json.dumps(result))
+        return result
+
+    parse_stats.record('repair_failures')
+    raise error
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from app import config
+
+
+class WorkPoolFull(RuntimeError):
+    """Raised when the pool already has the maximum number of running and queued tasks."""
+
+
+class WorkPool:
+    """Bounded thread pool that async request handlers await for blocking work.
+
+    Text extraction, model calls, storage access and Excel export run here
+    instead of on the event loop, so a large upload does not stall other
+    requests. At most max_workers tasks run at once and at most max_queued
+    more wait; further submissions fail fast with WorkPoolFull. The caller's
+    context variables (such as the deadline set by deadline_scope()) are
+    carried into the worker thread.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_queued: Optional[int] = None):
+        self.max_workers = max_workers or config.REQUEST_MAX_WORKERS
+        self.max_queued = config.REQUEST_MAX_QUEUED if max_queued is None else max_queued
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="request")
+        self._pending = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self, bounded: bool = True) -> None:
+        with self._lock:
+            if bounded and self._pending >= self.max_workers + self.max_queued:
+                self._rejected += 1
+                raise WorkPoolFull(
+                    f"Too many requests in progress ({self._pending}), please retry later"
+                )
+            self._pending += 1
+
+    def _release(self, _future=None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def _submit(self, func: Callable, args, kwargs, bounded: bool = True):
+        self._acquire(bounded)
+        context = contextvars.copy_context()
+        try:
+            future = self._executor.submit(context.run, func, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+        # 线程中的任务结束时才释放名额，客户端断开后仍在执行的任务继续占用名额
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """在线程池中执行func并等待结果，不阻塞事件循环；队列已满时抛出WorkPoolFull"""
+        return await self._submit(func, args, kwargs)
+
+    async def iterate(self, iterator):
+        """
+        在线程池中逐项推进同步迭代器，用于流式响应
+        
+        第一次取值时占用一个名额（队列已满时抛出WorkPoolFull），直到迭代结束或被关闭才释放，
+        已经开始的流不会因队列已满而中断。迭代提前停止时（例如客户端断开连接）关闭迭代器，
+        停止其中尚未完成的工作。
+        """
+        self._acquire()
+        done = object()
+        context = contextvars.copy_context()
+        future = None
+        try:
+            while True:
+                future = self._executor.submit(context.run, next, iterator, done)
+                item = await asyncio.wrap_future(future)
+                if item is done:
+                    return
+                yield item
+        finally:
+            def close(_future=None):
+                try:
+                    if hasattr(iterator, 'close'):
+                        iterator.close()
+                finally:
+                    self._release()
+            
+            if future is not None and not future.done():
+                # 迭代器正在线程中执行，等这一步结束后再关闭
+                future.add_done_callback(close)
+            else:
+                close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_queued': self.max_queued,
+                'pending': self._pending,
+                'rejected': self._rejected
+            }
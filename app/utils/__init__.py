@@ -1,4 +1,6 @@
 # 初始化utils包
 from app.utils.constants import DocType
+from app.utils.json_utils import extract_json
+from app.utils.lazy_import import lazy_import
 
-__all__ = ['DocType'] 
\ No newline at end of file
+__all__ = ['DocType', 'extract_json', 'lazy_import'] 
\ No newline at end of file
@@ -5,7 +5,10 @@ class DocType(str, Enum):
     RESUME = "Resume"
 
 # CSV文件的列名常量
-RAW_DATA_COLUMNS = ['file_name', 'content', 'extracted_at']
-JD_ANALYSIS_COLUMNS = ['file_name', 'criteria', 'analyzed_at']
+RAW_DATA_COLUMNS = ['file_name', 'content', 'extracted_at', 'content_hash']
+JD_ANALYSIS_COLUMNS = ['file_name', 'criteria', 'analyzed_at', 'content_hash']
 RESUME_ANALYSIS_COLUMNS = ['file_name', 'candidate_name', 'skills', 'analyzed_at']
-SCORES_COLUMNS = ['resume_name', 'jd_name', 'scores', 'total_score', 'scored_at'] 
\ No newline at end of file
+SCORES_COLUMNS = ['resume_name', 'jd_name', 'scores', 'total_score', 'scored_at', 'resume_hash', 'jd_hash', 'criteria_version']
+CRITERION_SCORES_COLUMNS = ['resume_hash', 'criterion', 'score', 'scored_at']
+ACTIVE_JDS_COLUMNS = ['file_name', 'activated_at']
+JOBS_COLUMNS = ['job_id', 'job', 'updated_at']
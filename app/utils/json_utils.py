@@ -0,0 +1,10 @@
+import json
+
+
+def extract_json(text: str):
+    """从模型响应中提取第一个'{'到最后一个'}'之间的JSON对象"""
+    start_idx = text.find('{')
+    end_idx = text.rfind('}') + 1
+    if start_idx >= 0 and end_idx > start_idx:
+        return json.loads(text[start_idx:end_idx])
+    raise ValueError("Could not find valid JSON in the response")
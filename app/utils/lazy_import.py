@@ -0,0 +1,34 @@
+import importlib
+import threading
+from types import ModuleType
+
+# 所有LazyModule的首次导入串行执行
+_import_lock = threading.Lock()
+
+
+class LazyModule:
+    """第一次访问属性时才导入的模块"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            # 不能防止与其他线程中直接import同一个包并发执行，服务启动时在预热阶段提前导入
+            with _import_lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """返回在第一次使用时才导入的模块"""
+    return LazyModule(name)
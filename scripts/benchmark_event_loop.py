@@ -0,0 +1,108 @@
+import io
+import sys
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+from app import config
+
+
+def _percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _make_resume(index):
+    """生成内容各不相同的DOCX简历，避免评分结果被缓存复用"""
+    from docx import Document
+
+    document = Document()
+    document.add_paragraph(f"Candidate {index}")
+    document.add_paragraph(f"Software engineer with {index % 10 + 1} years of Python, SQL and machine learning "
+                           f"experience. Project {index}: data pipelines, model serving and cloud deployment.")
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Measure the latency of small API requests while a large upload is being scored')
+    parser.add_argument('--resumes', type=int, default=40, help='Number of resumes in the large upload')
+    parser.add_argument('--latency', type=float, default=0.2, help='Simulated LLM latency in seconds (stub provider)')
+    parser.add_argument('--max-latency', type=float, default=0.5,
+                        help='Fail (exit code 1) if a small request takes longer than this many seconds')
+    args = parser.parse_args()
+
+    # 使用离线stub模型，不读写磁盘缓存
+    config.LLM_PROVIDER = 'stub'
+    config.STUB_LATENCY = args.latency
+    config.LLM_CACHE_ENABLED = False
+    config.LLM_RATE_LIMIT_ENABLED = False
+    config.LEXICAL_GATE_ENABLED = False
+
+    # 在临时目录中运行，上传的文件和数据库不影响项目目录
+    work_dir = tempfile.mkdtemp(prefix="event_loop_bench_")
+    try:
+        os.chdir(work_dir)
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        jd_dir = os.path.join(project_root, "testdata", "jd")
+
+        # 同一个客户端上下文中所有请求共用一个事件循环
+        with TestClient(app) as client:
+            jd_files = [('files', (name, open(os.path.join(jd_dir, name), 'rb')))
+                        for name in sorted(os.listdir(jd_dir))]
+            client.post('/api/upload-jds', files=jd_files)
+
+            upload = {}
+
+            def large_upload():
+                files = [('files', (f"resume_{i}.docx", _make_resume(i))) for i in range(args.resumes)]
+                start = time.perf_counter()
+                response = client.post('/api/upload-resumes', files=files)
+                upload['status'] = response.status_code
+                upload['seconds'] = time.perf_counter() - start
+
+            thread = threading.Thread(target=large_upload)
+            thread.start()
+            # 等待上传进入评分阶段
+            time.sleep(0.5)
+
+            # 上传处理期间持续发送小请求，事件循环被阻塞时请求要等到上传结束
+            latencies = []
+            while thread.is_alive():
+                start = time.perf_counter()
+                client.get('/api/jobs/benchmark-probe')
+                latencies.append(time.perf_counter() - start)
+                time.sleep(0.02)
+            thread.join()
+    finally:
+        os.chdir(project_root)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"Large upload: {args.resumes} resumes, status {upload.get('status')}, {upload.get('seconds', 0):.2f}s")
+    if not latencies:
+        print("The upload finished before any probe was sent; increase --resumes or --latency")
+        return 1
+    p50, p95 = _percentile(latencies, 0.5), _percentile(latencies, 0.95)
+    print(f"Small requests during the upload: {len(latencies)}, "
+          f"p50 {p50 * 1000:.1f}ms, p95 {p95 * 1000:.1f}ms, max {max(latencies) * 1000:.1f}ms")
+    if max(latencies) > args.max_latency:
+        print(f"FAIL: a small request took longer than {args.max_latency * 1000:.0f}ms")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import sys
+import os
+import time
+import argparse
+import statistics
+import subprocess
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 测量的入口：API应用、服务包和命令行工具
+TARGETS = {
+    'app.main': ['-c', 'import app.main'],
+    'app.services': ['-c', 'import app.services'],
+    'export_scores --help': [os.path.join('scripts', 'export_scores.py'), '--help'],
+}
+
+# 应该只在使用时才导入的重量级依赖
+HEAVY_MODULES = ['pandas', 'numpy', 'PyPDF2', 'docx', 'openpyxl', 'google.generativeai']
+
+
+def _run(args):
+    """运行一次python -X importtime，返回(总耗时秒数, {模块名: 累计导入微秒数})"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=project_root,
+                            capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{result.stderr[-2000:]}")
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        # 格式: "import time: self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        cumulative[name.strip()] = int(cumulative_us)
+    return elapsed, cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the import time of the API and CLI entry points')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per entry point (the median is reported)')
+    parser.add_argument('--top', type=int, default=8, help='Number of slowest imports to list per entry point')
+    parser.add_argument('--max-ms', type=float,
+                        help='Fail (exit code 1) if the median startup time of an entry point exceeds this')
+    args = parser.parse_args()
+
+    failed = False
+    for target, target_args in TARGETS.items():
+        runs = [_run(target_args) for _ in range(args.runs)]
+        median = statistics.median(elapsed for elapsed, _ in runs)
+        # 导入明细取耗时为中位数的那一次
+        _, cumulative = min(runs, key=lambda run: abs(run[0] - median))
+
+        print(f"\n{target}: {median * 1000:.0f}ms (median of {args.runs} runs)")
+        for name, us in sorted(cumulative.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {us / 1000:8.1f}ms  {name}")
+        loaded = [module for module in HEAVY_MODULES if module in cumulative]
+        print(f"  heavy modules imported: {', '.join(loaded) or 'none'}")
+
+        if args.max_ms is not None and median * 1000 > args.max_ms:
+            print(f"  FAIL: exceeds {args.max_ms:.0f}ms")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
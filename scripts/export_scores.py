@@ -1,13 +1,16 @@
 import sys
 import os
 import argparse
+import time
 
 # 获取项目根目录的路径
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # 将项目根目录添加到Python的模块搜索路径中
 sys.path.insert(0, project_root)
 
-from app.services.resume_service import ResumeService
+from app.services.container import ServiceContainer
+from app.services.llm_provider import create_provider, provider_stats
+from app.services.structured_output import parse_stats
 from app import config
 
 def main():
@@ -16,6 +19,15 @@ def main():
     parser.add_argument('--jd', help='JD file name (optional)')
     parser.add_argument('--output', help='Output Excel file path (optional)')
     parser.add_argument('--all', action='store_true', help='Score all resumes against all JDs')
+    parser.add_argument('--workers', type=int, help='Maximum number of concurrent scoring calls (optional)')
+    parser.add_argument('--batch-size', type=int,
+                        help='Number of resumes scored per LLM request (optional, defaults to config.SCORING_BATCH_SIZE)')
+    parser.add_argument('--provider', choices=['gemini', 'stub'],
+                        help='LLM provider, defaults to config.LLM_PROVIDER (optional)')
+    parser.add_argument('--mode', choices=['llm', 'local'], default='llm',
+                        help='Scoring mode: llm (default) or local TF-IDF scoring without LLM calls')
+    parser.add_argument('--shortlist', type=int, metavar='TOP_K',
+                        help='With --jd: retrieve the TOP_K best matching resumes by BM25 and score only those')
     args = parser.parse_args()
     
     # 确保当前工作目录是项目根目录
@@ -24,7 +36,8 @@ def main():
     # 使用配置文件中的API密钥
     api_key = config.GEMINI_API_KEY
     
-    service = ResumeService(api_key)
+    container = ServiceContainer(api_key, provider=create_provider(args.provider, api_key=api_key))
+    service = container.resume_service
     
     if args.all:
         # 获取所有JD和简历文件
@@ -34,15 +47,28 @@ def main():
         jd_files = [os.path.basename(f) for f in os.listdir(jd_dir)]
         resume_files = [os.path.basename(f) for f in os.listdir(resume_dir)]
         
-        # 对所有组合进行评分
-        for jd_file in jd_files:
-            print(f"Processing JD: {jd_file}")
-            for resume_file in resume_files:
-                print(f"  Scoring resume: {resume_file}")
-                try:
-                    service.score_resume(resume_file, jd_file)
-                except Exception as e:
-                    print(f"  Error scoring resume {resume_file} against JD {jd_file}: {str(e)}")
+        # 并行提取所有文件的文本（内容未变化的文件不会重新解析）
+        file_service = service.file_service
+        for doc_type, doc_dir, file_names in [('JD', jd_dir, jd_files), ('Resume', resume_dir, resume_files)]:
+            results = file_service.save_raw_contents(
+                [os.path.join(doc_dir, f) for f in file_names], doc_type
+            )
+            for file_path, result in results.items():
+                if isinstance(result, Exception):
+                    print(f"Error extracting text from {os.path.basename(file_path)}: {str(result)}")
+        # 文本提取完成后关闭提取进程
+        container.shutdown()
+        
+        print(f"Scoring {len(resume_files)} resumes against {len(jd_files)} JDs")
+        if args.mode == 'local':
+            # 本地TF-IDF评分，不调用模型
+            start = time.perf_counter()
+            service.score_matrix_local(jd_files, resume_files)
+            print(f"Local scoring finished in {time.perf_counter() - start:.3f}s")
+        else:
+            # 并发地对所有组合进行评分
+            service.score_matrix(jd_files, resume_files, max_workers=args.workers,
+                                 batch_size=args.batch_size)
         
         # 导出所有评分结果
         excel_path = service.export_scores_to_excel(output_path=args.output)
@@ -50,11 +76,46 @@ def main():
             print(f"All scores exported to: {excel_path}")
         else:
             print("No scores to export")
+        
+        # 打印LLM响应缓存的命中情况
+        if service.model.cache is not None:
+            print(f"LLM cache stats: {service.model.cache.stats()}")
+        # 打印词法预过滤跳过的比例
+        if args.mode != 'local':
+            print(f"Lexical gate stats: {service.gate_stats()}")
+        # 打印无法解析的响应和修复请求的统计
+        print(f"Structured output stats: {parse_stats.stats()}")
+        # 打印限流、重试和对冲请求统计
+        for layer, stats in provider_stats(service.provider).items():
+            print(f"{layer} stats: {stats}")
+    elif args.jd and args.shortlist:
+        # 从简历倒排索引中检索最相关的简历，只对这些简历评分
+        start = time.perf_counter()
+        candidates = service.shortlist(args.jd, args.shortlist)
+        print(f"Shortlisted {len(candidates)} resumes for JD {args.jd} in {time.perf_counter() - start:.3f}s")
+        for rank, candidate in enumerate(candidates, 1):
+            print(f"  {rank:>3}. {candidate['resume_name']} (BM25 {candidate['score']})")
+        
+        resume_files = [candidate['resume_name'] for candidate in candidates]
+        if resume_files:
+            if args.mode == 'local':
+                service.score_matrix_local([args.jd], resume_files)
+            else:
+                service.score_matrix([args.jd], resume_files, max_workers=args.workers,
+                                     batch_size=args.batch_size)
+            excel_path = service.export_scores_to_excel(
+                jd_files=[args.jd], resume_files=resume_files, output_path=args.output
+            )
+            if excel_path:
+                print(f"Shortlist scores exported to: {excel_path}")
     elif args.jd and args.resume:
         # 评分特定的JD和简历组合
         print(f"Scoring resume {args.resume} against JD {args.jd}")
         try:
-            service.score_resume(args.resume, args.jd)
+            if args.mode == 'local':
+                service.score_matrix_local([args.jd], [args.resume])
+            else:
+                service.score_resume(args.resume, args.jd)
             # 导出评分结果
             excel_path = service.export_scores_to_excel(output_path=args.output)
             if excel_path:
@@ -0,0 +1,88 @@
+import sys
+import os
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+import pytest
+from app.services.container import ServiceContainer
+from app.services.file_service import FileService
+from app.services.jd_service import JDService
+from app.services.llm_cache import CachedModel
+from app.services.llm_provider import StubProvider
+from app.services.resume_service import ResumeService
+from app.services.storage import CSVStore, SQLiteStore
+
+
+def csv_paths(data_dir):
+    return {
+        'raw_jd_path': os.path.join(data_dir, "raw_jd.csv"),
+        'raw_resume_path': os.path.join(data_dir, "raw_resume.csv"),
+        'jd_analysis_path': os.path.join(data_dir, "jd_analysis.csv"),
+        'resume_analysis_path': os.path.join(data_dir, "resume_analysis.csv"),
+        'scores_path': os.path.join(data_dir, "scores.csv")
+    }
+
+
+def uncached_model(provider):
+    """不使用磁盘缓存的模型，测试不读写data/llm_cache.db"""
+    return CachedModel(provider, model_name=provider.model_name,
+                       generation_config=provider.generation_config, cache=None)
+
+
+@pytest.fixture
+def make_store(tmp_path):
+    """在临时目录中创建存储，同一个name重复创建时打开同一份数据（模拟重启或另一个worker进程）"""
+    def factory(backend='sqlite', name='test'):
+        data_dir = str(tmp_path)
+        if backend == 'sqlite':
+            return SQLiteStore(db_path=os.path.join(data_dir, f"{name}.db"), **csv_paths(data_dir))
+        return CSVStore(criterion_scores_path=os.path.join(data_dir, "criterion_scores.csv"),
+                        **csv_paths(data_dir))
+    return factory
+
+
+@pytest.fixture
+def make_services(make_store):
+    """创建使用临时存储、不使用磁盘缓存的ResumeService（JDService为其jd_service）"""
+    def factory(provider=None, model=None, store=None):
+        provider = provider or StubProvider()
+        file_service = FileService(store=store or make_store())
+        model = model or uncached_model(provider)
+        jd_service = JDService(provider=provider, file_service=file_service, model=model)
+        return ResumeService(provider=provider, file_service=file_service, jd_service=jd_service, model=model)
+    return factory
+
+
+@pytest.fixture
+def make_container(make_store):
+    """创建使用临时存储、不使用磁盘缓存的ServiceContainer"""
+    def factory(provider=None, store=None):
+        provider = provider or StubProvider()
+        return ServiceContainer(provider=provider, store=store or make_store(), model=uncached_model(provider))
+    return factory
+
+
+@pytest.fixture
+def api_client(tmp_path, monkeypatch, make_container):
+    """
+    创建API的TestClient，路由使用临时存储、不使用磁盘缓存的服务容器
+    
+    工作目录切换到临时目录，上传的文件和导出的报告不写入仓库。返回(client, container)。
+    """
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services import container as container_module
+    containers = []
+
+    def factory(provider=None, store=None):
+        container = make_container(provider, store=store)
+        containers.append(container)
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(container_module, '_container', container)
+        return TestClient(app), container
+    yield factory
+    for container in containers:
+        container.shutdown()
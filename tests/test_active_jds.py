@@ -0,0 +1,66 @@
+import sys
+import os
+import json
+from datetime import datetime
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+import pytest
+from app.services.llm_provider import StubProvider
+
+
+@pytest.mark.parametrize("backend", ["csv", "sqlite"])
+def test_active_jds_are_shared_through_the_store(backend, make_store):
+    print(f"Starting test_active_jds_are_shared_through_the_store test for {backend} backend...")
+
+    store = make_store(backend)
+    assert store.list_active_jds() == []
+    version = store.get_active_jds_version()
+
+    store.activate_jds(["jd0.pdf", "jd1.pdf"])
+    assert store.get_active_jds_version() != version
+    version = store.get_active_jds_version()
+
+    # 重新激活已有的JD不改变顺序，但版本号变化
+    store.activate_jds(["jd2.pdf", "jd0.pdf"])
+    assert store.list_active_jds() == ["jd0.pdf", "jd1.pdf", "jd2.pdf"]
+    assert store.get_active_jds_version() != version
+
+    # 重新打开（模拟重启或另一个worker进程）后列表仍然存在
+    reopened = make_store(backend)
+    assert reopened.list_active_jds() == ["jd0.pdf", "jd1.pdf", "jd2.pdf"]
+    assert reopened.get_active_jds_version() == store.get_active_jds_version()
+
+
+def test_active_jds_read_through_cache(make_store, make_services):
+    print("Starting test_active_jds_read_through_cache test...")
+
+    # 两个服务各自使用独立的存储连接，模拟两个worker进程
+    worker_a, worker_b = [make_services(StubProvider(), store=make_store('sqlite')).jd_service for _ in range(2)]
+
+    store = worker_a.file_service.store
+    store.save_raw_content("JD", "jd0.pdf", "Python developer", datetime.now(), "hash-jd0")
+    store.save_criteria("jd0.pdf", json.dumps({"criteria": ["Python", "SQL"]}), "hash-jd0")
+    assert worker_b.get_active_jds() == {}
+
+    # 没有criteria的JD不能加入列表
+    store.save_raw_content("JD", "jd1.pdf", "Data engineer", datetime.now(), "hash-jd1")
+    with pytest.raises(ValueError):
+        worker_a.activate_jds(["jd0.pdf", "jd1.pdf"])
+    assert store.list_active_jds() == []
+
+    worker_a.activate_jds(["jd0.pdf"])
+    assert worker_b.get_active_jds() == {"jd0.pdf": {"criteria": ["Python", "SQL"]}}
+
+    # 版本号不变时不重新读取列表
+    worker_b.file_service.store.list_active_jds = None
+    assert list(worker_b.get_active_jds()) == ["jd0.pdf"]
+    assert worker_a.provider.calls == 0 and worker_b.provider.calls == 0
+    print("Active JD cache passed")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-s", __file__]))
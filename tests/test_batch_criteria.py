@@ -0,0 +1,108 @@
+import sys
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+import pytest
+from app.services.llm_provider import StubProvider, LLMResponse
+
+JDS = {
+    "backend.pdf": "Backend engineer. Python, Python services, SQL databases, SQL tuning, Docker.",
+    "frontend.pdf": "Frontend engineer. React, React hooks, TypeScript, TypeScript tooling, CSS.",
+    "data.pdf": "Data scientist. Statistics, statistics, Python, pandas, pandas, SQL."
+}
+
+
+class InvalidSecondJDStubProvider(StubProvider):
+    """批量响应中第二个JD的criteria不是数组的stub"""
+
+    def generate_content(self, prompt):
+        response = super().generate_content(prompt)
+        if "Extract key criteria from each of the following job descriptions" in prompt:
+            result = json.loads(response.text)
+            result["results"][1]["criteria"] = "Python, SQL"
+            return LLMResponse(json.dumps(result))
+        return response
+
+
+def _make_service(make_services, make_store, provider, name):
+    store = make_store(name=name)
+    service = make_services(provider, store=store).jd_service
+    for jd_name, content in JDS.items():
+        store.save_raw_content("JD", jd_name, content, datetime.now(), f"hash-{jd_name}")
+    return service, store
+
+
+def test_batch_criteria_extraction(make_services, make_store):
+    print("Starting test_batch_criteria_extraction test...")
+
+    single, _ = _make_service(make_services, make_store, StubProvider(), "single")
+    expected = {jd_name: single.get_criteria(jd_name) for jd_name in JDS}
+
+    provider = StubProvider()
+    service, store = _make_service(make_services, make_store, provider, "batched")
+    results = service.get_criteria_batch(list(JDS))
+
+    assert provider.calls == 1, f"Expected 1 call, got {provider.calls}"
+    assert results == expected
+    assert json.loads(store.get_criteria("data.pdf")) == expected["data.pdf"]
+
+    # 已分析过的JD不再调用模型
+    service.get_criteria_batch(list(JDS))
+    assert provider.calls == 1
+    print("Batch criteria extraction passed")
+
+
+def test_batch_criteria_falls_back_per_jd(make_services, make_store):
+    print("Starting test_batch_criteria_falls_back_per_jd test...")
+
+    provider = InvalidSecondJDStubProvider()
+    service, store = _make_service(make_services, make_store, provider, "fallback")
+    results = service.get_criteria_batch(list(JDS))
+
+    # 第二个JD的criteria无效，单独提取
+    assert provider.calls == 2, f"Expected 2 calls, got {provider.calls}"
+    assert all(isinstance(result["criteria"], list) and result["criteria"] for result in results.values())
+    assert all(store.get_criteria(jd_name) for jd_name in JDS)
+    print("Per-JD fallback passed")
+
+
+def test_concurrent_get_criteria_is_single_flight(make_services, make_store):
+    print("Starting test_concurrent_get_criteria_is_single_flight test...")
+
+    provider = StubProvider(latency=0.3)
+    service, store = _make_service(make_services, make_store, provider, "single_flight")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: service.get_criteria("backend.pdf"), range(8)))
+
+    assert provider.calls == 1, f"Expected 1 extraction, got {provider.calls}"
+    assert all(result == results[0] for result in results) and results[0]["criteria"]
+    stats = service.criteria_stats()
+    print(f"Criteria stats: {stats}")
+    assert stats['in_flight'] == 0 and stats['cached'] == 1
+
+    # 批量提取与单个提取并发时，同一JD也只提取一次
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        single = executor.submit(service.get_criteria, "frontend.pdf")
+        batched = executor.submit(service.get_criteria_batch, ["frontend.pdf", "data.pdf"])
+        assert batched.result()["frontend.pdf"] == single.result()
+    assert provider.calls <= 3, f"Expected at most 3 calls, got {provider.calls}"
+
+    # 内容变化后按新版本重新提取
+    store.save_raw_content("JD", "backend.pdf", "Backend engineer. Go and Kubernetes.", datetime.now(), "hash-v2")
+    store.invalidate_derived("JD", "backend.pdf")
+    calls = provider.calls
+    assert service.get_criteria("backend.pdf") != results[0]
+    assert provider.calls == calls + 1
+    print("Single-flight criteria passed")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-s", __file__]))
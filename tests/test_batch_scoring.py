@@ -0,0 +1,81 @@
+import sys
+import os
+import json
+from datetime import datetime
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+import pytest
+from app.services.llm_provider import StubProvider, LLMResponse
+
+RESUMES = {
+    "a.pdf": "Alice Brown. Python and SQL developer with Docker experience.",
+    "b.pdf": "Bob Green. Java engineer, Kubernetes and AWS.",
+    "c.pdf": "Carol White. Data scientist, Python, statistics and SQL.",
+    "d.pdf": "Dan Black. Frontend developer, React and TypeScript."
+}
+
+
+class DroppingStubProvider(StubProvider):
+    """批量响应中丢掉最后一份简历的stub"""
+
+    def generate_content(self, prompt):
+        response = super().generate_content(prompt)
+        if "Score each of the following resumes" in prompt:
+            result = json.loads(response.text)
+            result["results"] = result["results"][:-1]
+            return LLMResponse(json.dumps(result))
+        return response
+
+
+def _make_service(make_services, make_store, provider, name):
+    store = make_store(name=name)
+    service = make_services(provider, store=store)
+    for resume_name, content in RESUMES.items():
+        store.save_raw_content("Resume", resume_name, content, datetime.now(), f"hash-{resume_name}")
+    store.save_raw_content("JD", "jd0.pdf", "Python developer", datetime.now(), "hash-jd0")
+    store.save_criteria("jd0.pdf", json.dumps({"criteria": ["Python", "SQL", "Docker", "AWS"]}), "hash-jd0")
+    return service, store
+
+
+def test_batched_scoring_matches_single_scoring(make_services, make_store):
+    print("Starting test_batched_scoring_matches_single_scoring test...")
+
+    single_provider = StubProvider()
+    single, _ = _make_service(make_services, make_store, single_provider, "single")
+    expected = single.score_matrix(["jd0.pdf"], list(RESUMES), batch_size=1)
+    assert single_provider.calls == 4
+
+    batch_provider = StubProvider()
+    batched, store = _make_service(make_services, make_store, batch_provider, "batched")
+    results = batched.score_matrix(["jd0.pdf"], list(RESUMES), batch_size=3)
+
+    # 4份简历分为3份和1份两个请求
+    assert batch_provider.calls == 2, f"Expected 2 scoring calls, got {batch_provider.calls}"
+    for pair, result in results.items():
+        assert result["scores"] == expected[pair]["scores"], pair
+        assert result["candidate_name"] == expected[pair]["candidate_name"]
+    assert len(store.get_scores(jd_name="jd0.pdf")) == 4
+    print("Batched scoring passed")
+
+
+def test_batch_falls_back_to_single_scoring(make_services, make_store):
+    print("Starting test_batch_falls_back_to_single_scoring test...")
+
+    provider = DroppingStubProvider()
+    service, store = _make_service(make_services, make_store, provider, "fallback")
+    results = service.score_resumes_batch(["a.pdf", "b.pdf", "c.pdf"], "jd0.pdf")
+
+    # 批量响应缺少c.pdf，单独评分
+    assert provider.calls == 2, f"Expected 2 scoring calls, got {provider.calls}"
+    assert set(results) == {"a.pdf", "b.pdf", "c.pdf"}
+    assert all(len(result["scores"]) == 4 for result in results.values())
+    assert len(store.get_scores(jd_name="jd0.pdf")) == 3
+    print("Batch fallback passed")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-s", __file__]))
@@ -0,0 +1,86 @@
+import sys
+import os
+import json
+import threading
+from datetime import datetime
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+import pytest
+from app.services.llm_provider import StubProvider, LLMProviderError
+
+RESUMES = {
+    "a.pdf": "Alice Brown. Python and SQL developer with Docker experience.",
+    "b.pdf": "Bob Green. Java engineer, Kubernetes and AWS.",
+    "c.pdf": "Carol White. Data scientist, Python, statistics and SQL.",
+    "broken.pdf": "Broken resume. Python and SQL.",
+    "d.pdf": "Dan Black. Frontend developer, React and TypeScript.",
+    "e.pdf": "Eve Stone. Backend developer, Go, SQL and Docker."
+}
+
+
+class ConcurrencyTrackingProvider(StubProvider):
+    """记录同时进行的调用数，并对Broken resume的评分请求抛出异常的stub"""
+
+    def __init__(self):
+        super().__init__(latency=0.05)
+        self.active = 0
+        self.max_active = 0
+        self._active_lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self._active_lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            response = super().generate_content(prompt)
+            if "Broken resume" in prompt:
+                raise LLMProviderError("Simulated failure for one pair")
+            return response
+        finally:
+            with self._active_lock:
+                self.active -= 1
+
+
+def test_failed_pair_does_not_stop_other_pairs(make_services):
+    print("Starting test_failed_pair_does_not_stop_other_pairs test...")
+
+    provider = ConcurrencyTrackingProvider()
+    service = make_services(provider)
+    service.gate_threshold = None
+    store = service.file_service.store
+    for resume_name, content in RESUMES.items():
+        store.save_raw_content("Resume", resume_name, content, datetime.now(), f"hash-{resume_name}")
+    for jd_name in ["jd0.pdf", "jd1.pdf"]:
+        store.save_raw_content("JD", jd_name, "Python developer", datetime.now(), f"hash-{jd_name}")
+        store.save_criteria(jd_name, json.dumps({"criteria": ["Python", "SQL", "Docker"]}), f"hash-{jd_name}")
+
+    completed = []
+    results = service.score_matrix(["jd0.pdf", "jd1.pdf"], list(RESUMES), max_workers=3, batch_size=1,
+                                   on_result=lambda jd_file, resume_file, result: completed.append(resume_file))
+
+    assert len(results) == len(completed) == 12
+    # 失败的组合以异常对象返回，其余组合正常评分并保存
+    for (jd_file, resume_file), result in results.items():
+        if resume_file == "broken.pdf":
+            assert isinstance(result, LLMProviderError)
+        else:
+            assert result["total_score"] == sum(result["scores"].values())
+    saved = {(row['jd_name'], row['resume_name']) for row in store.get_scores()}
+    assert saved == {pair for pair in results if pair[1] != "broken.pdf"}
+
+    # 同时进行的模型调用不超过max_workers
+    print(f"Max concurrent calls: {provider.max_active}")
+    assert 1 < provider.max_active <= 3
+
+    # 失败的组合没有保存评分，下次增量评分时重试
+    assert service.find_unscored_pairs(["jd0.pdf", "jd1.pdf"], list(RESUMES)) == [
+        ("jd0.pdf", "broken.pdf"), ("jd1.pdf", "broken.pdf")
+    ]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-s", __file__]))
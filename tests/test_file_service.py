@@ -7,8 +7,14 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # 将项目根目录添加到Python的模块搜索路径中
 sys.path.insert(0, project_root)
 
+import io
+import asyncio
+import hashlib
 import pytest
-from app.services.file_service import FileService
+import shutil
+import tempfile
+from app.services.file_service import FileService, UploadTooLarge, stream_to_file
+from app.services.work_pool import WorkPool
 
 def test_extract_and_save_to_csv():
     print("Starting test_extract_and_save_to_csv test...")
@@ -76,5 +82,92 @@ def test_extract_and_save_to_csv():
         print("No content was extracted")
         assert False, "No content was extracted from any file"
 
+def test_save_raw_content_dedupes_by_hash(make_store, tmp_path):
+    print("Starting test_save_raw_content_dedupes_by_hash test...")
+    
+    store = make_store()
+    service = FileService(store=store)
+    data_dir = str(tmp_path)
+    
+    # 记录实际解析文件的次数
+    extracted = []
+    extract_text = service.extract_text_from_file
+    def counting_extract(file_path):
+        extracted.append(file_path)
+        return extract_text(file_path)
+    service.extract_text_from_file = counting_extract
+    
+    jd_path = os.path.join(data_dir, "jd0.pdf")
+    shutil.copy(os.path.join(project_root, "testdata", "jd", "jd0.pdf"), jd_path)
+    
+    assert service.save_raw_content(jd_path, "JD") is True
+    store.save_criteria("jd0.pdf", '{"criteria": ["Python"]}', service.compute_file_hash(jd_path))
+    store.save_score("a.pdf", "jd0.pdf", '{"Python": 5}', 5)
+    store.save_score("a.pdf", "jd1.pdf", '{"Python": 5}', 5)
+    
+    # 相同内容再次上传：不解析，派生数据保留
+    assert service.save_raw_content(jd_path, "JD") is False
+    assert len(extracted) == 1, f"Expected 1 extraction, got {len(extracted)}"
+    assert store.get_criteria("jd0.pdf") is not None
+    
+    # 同名文件内容变化：重新解析，只清除该JD的派生数据
+    shutil.copy(os.path.join(project_root, "testdata", "jd", "jd1.pdf"), jd_path)
+    assert service.save_raw_content(jd_path, "JD") is True
+    assert len(extracted) == 2
+    assert store.get_criteria("jd0.pdf") is None
+    assert [s['jd_name'] for s in store.get_scores()] == ["jd1.pdf"]
+    
+    # 内容相同的其他文件：复用已提取的文本
+    copy_path = os.path.join(data_dir, "jd0_copy.pdf")
+    shutil.copy(jd_path, copy_path)
+    assert service.save_raw_content(copy_path, "JD") is True
+    assert len(extracted) == 2
+    assert service.get_raw_content("jd0_copy.pdf", "JD")[0] == service.get_raw_content("jd0.pdf", "JD")[0]
+    print("Hash based dedupe passed")
+
+class ChunkedSource:
+    """模拟UploadFile的异步读取，记录每次读取的大小"""
+    
+    def __init__(self, content):
+        self.buffer = io.BytesIO(content)
+        self.reads = []
+    
+    async def read(self, size=-1):
+        self.reads.append(size)
+        return self.buffer.read(size)
+
+
+def test_stream_to_file_writes_in_chunks():
+    print("Starting test_stream_to_file_writes_in_chunks test...")
+    
+    content = os.urandom(10 * 1024 + 7)
+    pool = WorkPool(max_workers=1, max_queued=4)
+    with tempfile.TemporaryDirectory() as target_dir:
+        file_path = os.path.join(target_dir, "resume.pdf")
+        source = ChunkedSource(content)
+        content_hash, size = asyncio.run(
+            stream_to_file(source, file_path, max_bytes=len(content), run=pool.run, chunk_size=1024)
+        )
+        
+        assert content_hash == hashlib.sha256(content).hexdigest()
+        assert size == len(content)
+        assert set(source.reads) == {1024}
+        with open(file_path, "rb") as f:
+            assert f.read() == content
+        assert os.listdir(target_dir) == ["resume.pdf"]
+        
+        # 超过大小上限时中途停止读取，已有的同名文件保持不变
+        source = ChunkedSource(os.urandom(8 * 1024))
+        with pytest.raises(UploadTooLarge):
+            asyncio.run(stream_to_file(source, file_path, max_bytes=2048, chunk_size=1024))
+        assert len(source.reads) == 3
+        with open(file_path, "rb") as f:
+            assert f.read() == content
+        assert os.listdir(target_dir) == ["resume.pdf"]
+    print("Chunked upload passed")
+
+
 if __name__ == "__main__":
-    test_extract_and_save_to_csv() 
\ No newline at end of file
+    test_extract_and_save_to_csv()
+    test_save_raw_content_dedupes_by_hash()
+    test_stream_to_file_writes_in_chunks()
@@ -0,0 +1,144 @@
+import sys
+import os
+import time
+import threading
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+import pytest
+from app.services.llm_provider import StubProvider
+from app.services.hedging import HedgedProvider, DeadlineExceeded, deadline_scope, current_deadline
+from app.services.rate_limiter import RateLimiter, RateLimitedProvider, TokenBucket
+
+
+class SlowFirstCallProvider(StubProvider):
+    """第一次调用很慢、之后的调用很快的stub"""
+
+    def __init__(self, slow_seconds):
+        super().__init__()
+        self.slow_seconds = slow_seconds
+        self._first = True
+        self._first_lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self._first_lock:
+            slow, self._first = self._first, False
+        if slow:
+            time.sleep(self.slow_seconds)
+        return super().generate_content(prompt)
+
+
+def test_deadline_exceeded():
+    print("Starting test_deadline_exceeded test...")
+
+    provider = HedgedProvider(StubProvider(latency=0.5), call_timeout=None, hedging=False)
+    start = time.monotonic()
+    with deadline_scope(timeout=0.1):
+        with pytest.raises(DeadlineExceeded):
+            provider.generate_content("Extract key criteria")
+    assert time.monotonic() - start < 0.4
+    assert provider.stats()['deadlines_exceeded'] == 1
+
+    # 没有截止时间时正常返回
+    response = HedgedProvider(StubProvider(), call_timeout=None).generate_content("Extract key criteria")
+    assert '"criteria"' in response.text
+
+
+def test_hedge_wins_on_slow_call():
+    print("Starting test_hedge_wins_on_slow_call test...")
+
+    provider = HedgedProvider(SlowFirstCallProvider(slow_seconds=1.0), call_timeout=5,
+                              hedging=True, hedge_quantile=0.95, hedge_min_samples=5)
+    # 预置延迟样本，p95约为0.05秒
+    for _ in range(10):
+        provider.latency.record(0.05)
+
+    start = time.monotonic()
+    response = provider.generate_content("Extract key criteria")
+    elapsed = time.monotonic() - start
+    assert '"criteria"' in response.text
+    assert elapsed < 0.5, f"Hedge should have returned early, took {elapsed:.2f}s"
+
+    stats = provider.stats()
+    print(f"Hedging stats: {stats}")
+    assert stats['hedges_fired'] == 1
+    assert stats['hedges_won'] == 1
+
+
+def test_call_timeout_starts_when_the_call_runs():
+    print("Starting test_call_timeout_starts_when_the_call_runs test...")
+
+    # 只有一个线程，第一个调用超时后仍然占用它0.8秒
+    provider = HedgedProvider(SlowFirstCallProvider(slow_seconds=0.8), call_timeout=0.3,
+                              hedging=False, max_threads=1)
+    with pytest.raises(DeadlineExceeded):
+        provider.generate_content("Extract key criteria")
+
+    # 第二个调用排队等待线程，排队时间不计入单次调用的超时
+    start = time.monotonic()
+    response = provider.generate_content("Extract key criteria")
+    assert '"criteria"' in response.text
+    assert time.monotonic() - start > 0.3
+    assert provider.stats()['deadlines_exceeded'] == 1
+
+
+def test_expired_queued_call_is_not_run():
+    print("Starting test_expired_queued_call_is_not_run test...")
+
+    inner = SlowFirstCallProvider(slow_seconds=0.8)
+    provider = HedgedProvider(inner, call_timeout=0.2, hedging=False, max_threads=1)
+    with pytest.raises(DeadlineExceeded):
+        provider.generate_content("Extract key criteria")
+
+    # 请求截止时间在排队期间已过，该调用被取消，不再调用模型
+    with deadline_scope(timeout=0.2):
+        with pytest.raises(DeadlineExceeded):
+            provider.generate_content("Extract key criteria")
+    time.sleep(1.0)
+    assert inner.calls == 1, f"Expected only the first call to reach the provider, got {inner.calls}"
+    assert provider.stats()['deadlines_exceeded'] == 2
+
+
+def test_rate_limit_wait_is_not_call_latency():
+    print("Starting test_rate_limit_wait_is_not_call_latency test...")
+
+    # 每0.5秒1个请求，第二个调用等待配额约0.5秒，超过单次调用的超时
+    limiter = RateLimiter(requests_per_minute=None, tokens_per_minute=None)
+    limiter.request_bucket = TokenBucket(rate_per_minute=120, capacity=1)
+    provider = HedgedProvider(RateLimitedProvider(StubProvider(), limiter), call_timeout=0.3, hedging=False)
+
+    for _ in range(2):
+        response = provider.generate_content("Extract key criteria")
+        assert '"criteria"' in response.text
+    assert limiter.stats()['wait_seconds'] > 0.3
+    # 延迟统计不包括等待配额的时间
+    assert provider.latency.quantile(1.0) < 0.1
+    assert provider.stats()['deadlines_exceeded'] == 0
+
+
+def test_nested_deadline_scope():
+    print("Starting test_nested_deadline_scope test...")
+
+    assert current_deadline() is None
+    with deadline_scope(timeout=10):
+        outer = current_deadline()
+        # 内层取更早的截止时间
+        with deadline_scope(timeout=1):
+            assert current_deadline() < outer
+        # 内层更晚的截止时间不会延长外层
+        with deadline_scope(timeout=100):
+            assert current_deadline() == outer
+        assert current_deadline() == outer
+    assert current_deadline() is None
+
+
+if __name__ == "__main__":
+    test_deadline_exceeded()
+    test_hedge_wins_on_slow_call()
+    test_call_timeout_starts_when_the_call_runs()
+    test_expired_queued_call_is_not_run()
+    test_rate_limit_wait_is_not_call_latency()
+    test_nested_deadline_scope()
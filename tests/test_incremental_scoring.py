@@ -0,0 +1,105 @@
+import sys
+import os
+import json
+from datetime import datetime
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+import pytest
+from app.services.llm_cache import CachedModel, CachedResponse
+
+
+class FakeModel:
+    """不调用API的假模型，记录评分调用次数"""
+    
+    def __init__(self, criteria):
+        self.criteria = criteria
+        self.score_calls = 0
+        self.scored_criteria = []
+    
+    def generate_content(self, prompt):
+        if "Extract key criteria" in prompt:
+            return CachedResponse(json.dumps({"criteria": self.criteria}))
+        self.score_calls += 1
+        # 只对prompt中出现的criteria评分
+        criteria = [c for c in json.loads(prompt[prompt.index("["):prompt.index("]") + 1])]
+        self.scored_criteria.append(criteria)
+        return CachedResponse(json.dumps({
+            "candidate_name": "Test Candidate",
+            "scores": {criterion: 3 for criterion in criteria}
+        }))
+
+
+def _make_service(make_services):
+    fake_model = FakeModel(["Python", "SQL"])
+    service = make_services(model=CachedModel(fake_model, "fake"))
+    return service, service.file_service.store, fake_model
+
+
+def test_only_missing_pairs_are_scored(make_services):
+    print("Starting test_only_missing_pairs_are_scored test...")
+    
+    service, store, fake_model = _make_service(make_services)
+    for name in ["a.pdf", "b.pdf", "c.pdf"]:
+        store.save_raw_content("Resume", name, f"resume {name}", datetime.now(), f"hash-{name}")
+    for name in ["jd0.pdf", "jd1.pdf"]:
+        store.save_raw_content("JD", name, f"jd {name}", datetime.now(), f"hash-{name}")
+    
+    results = service.score_matrix(["jd0.pdf"], ["a.pdf", "b.pdf"])
+    assert fake_model.score_calls == 2, f"Expected 2 scoring calls, got {fake_model.score_calls}"
+    assert results[("jd0.pdf", "a.pdf")]["total_score"] == 6
+    
+    # 再次评分相同的组合：直接使用已保存的评分
+    results = service.score_matrix(["jd0.pdf"], ["a.pdf", "b.pdf"])
+    assert fake_model.score_calls == 2
+    assert results[("jd0.pdf", "b.pdf")]["total_score"] == 6
+    assert results[("jd0.pdf", "b.pdf")]["candidate_name"] == "Test Candidate"
+    
+    # 新简历只对缺少评分的JD评分
+    service.score_matrix(["jd0.pdf"], ["a.pdf", "b.pdf", "c.pdf"])
+    assert fake_model.score_calls == 3
+    
+    # 新JD只对已有简历评分
+    pending = service.find_unscored_pairs(["jd0.pdf", "jd1.pdf"], ["a.pdf", "b.pdf", "c.pdf"])
+    assert pending == [("jd1.pdf", "a.pdf"), ("jd1.pdf", "b.pdf"), ("jd1.pdf", "c.pdf")], pending
+    
+    # criteria变化后，该JD的评分全部过期
+    store.save_criteria("jd0.pdf", json.dumps({"criteria": ["Python", "SQL", "Docker"]}), "hash-jd0.pdf")
+    pending = service.find_unscored_pairs(["jd0.pdf"], ["a.pdf", "b.pdf", "c.pdf"])
+    assert len(pending) == 3, pending
+    print("Incremental scoring passed")
+
+
+
+def test_criterion_scores_are_reused_across_jds(make_services):
+    print("Starting test_criterion_scores_are_reused_across_jds test...")
+    
+    service, store, fake_model = _make_service(make_services)
+    store.save_raw_content("Resume", "a.pdf", "resume a", datetime.now(), "hash-a")
+    for name in ["jd0.pdf", "jd1.pdf", "jd2.pdf"]:
+        store.save_raw_content("JD", name, f"jd {name}", datetime.now(), f"hash-{name}")
+    store.save_criteria("jd0.pdf", json.dumps({"criteria": ["Python", "SQL"]}), "hash-jd0.pdf")
+    store.save_criteria("jd1.pdf", json.dumps({"criteria": ["python.", "Docker"]}), "hash-jd1.pdf")
+    store.save_criteria("jd2.pdf", json.dumps({"criteria": ["SQL", "Docker "]}), "hash-jd2.pdf")
+    
+    service.score_resume("a.pdf", "jd0.pdf")
+    
+    # 第二个JD只发送未评过分的criterion
+    result = service.score_resume("a.pdf", "jd1.pdf")
+    assert fake_model.scored_criteria == [["Python", "SQL"], ["Docker"]], fake_model.scored_criteria
+    assert result["scores"] == {"python.": 3, "Docker": 3}
+    assert result["total_score"] == 6
+    
+    # 所有criteria都已评过分时不调用模型
+    result = service.score_resume("a.pdf", "jd2.pdf")
+    assert fake_model.score_calls == 2, f"Expected 2 scoring calls, got {fake_model.score_calls}"
+    assert result["scores"] == {"SQL": 3, "Docker ": 3}
+    assert store.get_scores(jd_name="jd2.pdf")[0]["total_score"] == 6
+    print("Criterion score memoization passed")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-s", __file__]))
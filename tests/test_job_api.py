@@ -0,0 +1,221 @@
+import sys
+import os
+import json
+import time
+import threading
+from datetime import datetime
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+import pytest
+from app.services.job_service import JobService
+from app.services.llm_provider import StubProvider
+
+XIMING = os.path.join(project_root, "testdata", "resume", "XimingTao_resume_ml.pdf")
+JOHN = os.path.join(project_root, "testdata", "resume", "Johncruck_resume_ml.docx")
+ATTICUS = os.path.join(project_root, "testdata", "resume", "ATTICUS HAWTHORN_resume_ml.pdf")
+JD0 = os.path.join(project_root, "testdata", "jd", "jd0.pdf")
+
+
+class BlockingProvider(StubProvider):
+    """prompt中包含block_text时阻塞，直到调用release()"""
+
+    def __init__(self, block_text=None):
+        super().__init__()
+        self.block_text = block_text
+        self._released = threading.Event()
+
+    def release(self):
+        self._released.set()
+
+    def generate_content(self, prompt):
+        if self.block_text and self.block_text in prompt:
+            self._released.wait(timeout=30)
+        return super().generate_content(prompt)
+
+
+def _upload(*paths):
+    files = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            files.append(('files', (os.path.basename(path), f.read())))
+    return files
+
+
+def _activate_jd(store):
+    store.save_raw_content("JD", "jd0.pdf", "Machine learning engineer with Python", datetime.now(), "hash-jd0")
+    store.save_criteria("jd0.pdf", json.dumps({"criteria": ["Python", "Machine Learning"]}), "hash-jd0")
+    store.activate_jds(["jd0.pdf"])
+
+
+def _wait_for(client, job_id, predicate, timeout=30):
+    """轮询任务状态，直到predicate(job)为真"""
+    deadline = time.monotonic() + timeout
+    while True:
+        response = client.get(f"/api/jobs/{job_id}")
+        assert response.status_code == 200
+        job = response.json()['data']
+        if predicate(job):
+            return job
+        assert time.monotonic() < deadline, f"Timed out waiting for job {job_id}: {job}"
+        time.sleep(0.05)
+
+
+def test_resume_job_progress_and_partial_results(make_store, api_client):
+    print("Starting test_resume_job_progress_and_partial_results test...")
+
+    store = make_store()
+    _activate_jd(store)
+    provider = BlockingProvider(block_text="John Cruck")
+    client, container = api_client(provider, store=store)
+    # 只有一个后台worker，第一个任务结束之前第二个任务保持排队
+    container.job_service = JobService(max_workers=1, store=store)
+    transitions = []
+    update = container.job_service._update
+
+    def record(job_id, **fields):
+        if 'status' in fields:
+            transitions.append((job_id, fields['status']))
+        update(job_id, **fields)
+    container.job_service._update = record
+
+    try:
+        response = client.post("/api/upload-resumes?async_mode=true", files=_upload(XIMING, JOHN))
+        assert response.status_code == 200
+        assert response.json()['status'] == "accepted"
+        first = response.json()['data']['job_id']
+
+        # John Cruck的评分阻塞时，另一份简历的评分已经可以读取
+        job = _wait_for(client, first, lambda job: "XimingTao_resume_ml.pdf" in
+                        job['partial_results'].get("jd0.pdf", {}))
+        print(f"Job mid-run: {job}")
+        assert job['status'] == "running"
+        assert job['files']["XimingTao_resume_ml.pdf"]['status'] == "completed"
+        assert job['files']["Johncruck_resume_ml.docx"]['status'] == "scoring"
+        assert job['progress'] == {"total": 2, "completed": 1}
+        assert job['result'] is None
+
+        response = client.post("/api/upload-resumes?async_mode=true", files=_upload(ATTICUS))
+        second = response.json()['data']['job_id']
+        assert client.get(f"/api/jobs/{second}").json()['data']['status'] == "queued"
+    finally:
+        provider.release()
+
+    job = _wait_for(client, first, lambda job: job['status'] == "completed")
+    assert job['progress'] == {"total": 2, "completed": 2}
+    scores = job['result']['data']['scoring_results']["jd0.pdf"]['scores']
+    assert set(scores) == {"XimingTao_resume_ml.pdf", "Johncruck_resume_ml.docx"}
+    assert job['partial_results']["jd0.pdf"].keys() == scores.keys()
+    assert job['result']['data']['export']['success']
+
+    _wait_for(client, second, lambda job: job['status'] == "completed")
+    assert [status for job_id, status in transitions if job_id == first] == ["running", "completed"]
+    assert [status for job_id, status in transitions if job_id == second] == ["running", "completed"]
+    print("Resume job progress passed")
+
+
+def test_jd_job_returns_criteria(api_client):
+    print("Starting test_jd_job_returns_criteria test...")
+
+    client, container = api_client()
+    response = client.post("/api/upload-jds?async_mode=true", files=_upload(JD0))
+    assert response.json()['status'] == "accepted"
+    job_id = response.json()['data']['job_id']
+
+    job = _wait_for(client, job_id, lambda job: job['status'] in ("completed", "failed"))
+    print(f"JD job: {job}")
+    assert job['status'] == "completed" and job['error'] is None
+    assert job['files']["jd0.pdf"]['status'] == "completed"
+    assert job['partial_results']["jd0.pdf"] == job['result']['criteria']["jd0.pdf"]
+    assert "jd0.pdf" in container.jd_service.get_active_jds()
+
+
+def test_jd_upload_scores_existing_resumes_in_background(api_client):
+    print("Starting test_jd_upload_scores_existing_resumes_in_background test...")
+
+    client, container = api_client()
+    store = container.file_service.store
+    store.save_raw_content("Resume", "dev.pdf", "Alice Brown. Machine learning engineer, Python.",
+                           datetime.now(), "hash-dev")
+
+    # 同步上传只分析JD，对已有简历的评分交给后台任务
+    response = client.post("/api/upload-jds", files=_upload(JD0))
+    scoring = response.json()['data']['scoring']
+    print(f"Scoring: {scoring}")
+    assert scoring['resumes'] == 1 and scoring['pending_pairs'] == 1
+
+    job = _wait_for(client, scoring['job_id'], lambda job: job['status'] in ("completed", "failed"))
+    assert job['type'] == "scoring" and job['status'] == "completed"
+    assert job['result'] == {"resumes": 1, "scored_pairs": 1, "failed_pairs": 0, "skipped_pairs": 0}
+    assert "total_score" in job['partial_results']['scores']["jd0.pdf"]["dev.pdf"]
+    assert job['files']["jd0.pdf"]['status'] == "completed"
+
+    # 已经评过分的组合不再提交任务
+    response = client.post("/api/upload-jds", files=_upload(JD0))
+    assert "job_id" not in response.json()['data']['scoring']
+
+
+@pytest.mark.parametrize("backend", ["csv", "sqlite"])
+def test_job_visible_from_other_worker(backend, make_store):
+    print(f"Starting test_job_visible_from_other_worker test for {backend} backend...")
+
+    # 两个JobService共用一份存储，模拟uvicorn --workers N中的两个worker进程
+    accepting = JobService(store=make_store(backend))
+    polled = JobService(store=make_store(backend))
+    release = threading.Event()
+
+    def run_job(job_id):
+        accepting.update_file(job_id, "a.pdf", "scoring")
+        accepting.add_partial_result(job_id, ["jd0.pdf", "a.pdf"], {"total_score": 7})
+        release.wait(timeout=30)
+        return {"scored": 1}
+
+    job_id = accepting.submit("resume", ["a.pdf"], run_job)
+    deadline = time.monotonic() + 30
+    while (polled.get_job(job_id) or {}).get('partial_results') != {"jd0.pdf": {"a.pdf": {"total_score": 7}}}:
+        assert time.monotonic() < deadline, polled.get_job(job_id)
+        time.sleep(0.05)
+    job = polled.get_job(job_id)
+    assert job['status'] == "running" and job['files']["a.pdf"]['status'] == "scoring"
+
+    release.set()
+    while polled.get_job(job_id)['status'] != "completed":
+        assert time.monotonic() < deadline, polled.get_job(job_id)
+        time.sleep(0.05)
+    assert polled.get_job(job_id)['result'] == {"scored": 1}
+    assert polled.get_job("does-not-exist") is None
+
+
+def test_failed_job_reports_error(api_client):
+    print("Starting test_failed_job_reports_error test...")
+
+    client, container = api_client()
+    def fail():
+        raise RuntimeError("store unavailable")
+    container.jd_service.get_active_jds = fail
+
+    response = client.post("/api/upload-resumes?async_mode=true", files=_upload(XIMING))
+    job_id = response.json()['data']['job_id']
+
+    job = _wait_for(client, job_id, lambda job: job['status'] in ("completed", "failed"))
+    print(f"Failed job: {job}")
+    assert job['status'] == "failed"
+    assert job['error'] == "store unavailable"
+    assert job['result'] is None
+    assert client.get(f"/api/jobs/{job_id}").json()['message'] == "Job is failed"
+
+
+def test_unknown_job_returns_404(api_client):
+    print("Starting test_unknown_job_returns_404 test...")
+
+    client, _ = api_client()
+    response = client.get("/api/jobs/does-not-exist")
+    assert response.status_code == 404
+    assert response.json()['detail'] == "Job not found: does-not-exist"
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-s", __file__]))
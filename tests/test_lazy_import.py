@@ -0,0 +1,50 @@
+import sys
+import os
+import subprocess
+import pytest
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+from app.utils.lazy_import import lazy_import
+
+
+def test_lazy_import_loads_on_first_use():
+    print("Starting test_lazy_import_loads_on_first_use test...")
+
+    json = lazy_import("json")
+    assert "not loaded" in repr(json)
+    assert json.dumps([1]) == "[1]"
+    assert "(loaded)" in repr(json)
+
+
+def test_services_import_without_heavy_dependencies(tmp_path):
+    print("Starting test_services_import_without_heavy_dependencies test...")
+
+    # 临时数据目录中有一份待迁移的CSV，创建服务容器时会迁移到SQLite
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "raw_resume.csv").write_text(
+        "file_name,content,extracted_at,content_hash\na.pdf,Python developer,2024-01-01 00:00:00,\n",
+        encoding="utf-8"
+    )
+
+    # 在新进程中导入，避免受到其他测试已经导入的模块影响；工作目录为临时目录，不读写仓库中的data/
+    heavy = ['pandas', 'numpy', 'PyPDF2', 'docx', 'openpyxl', 'google.generativeai']
+    code = ("import sys, app.services, app.main; "
+            "store = app.services.get_container().store; "
+            "assert store.list_raw_files('Resume') == ['a.pdf']; "
+            f"print('heavy:' + ','.join(name for name in {heavy!r} if name in sys.modules))")
+    env = dict(os.environ, LLM_PROVIDER='stub', PYTHONPATH=project_root)
+    result = subprocess.run([sys.executable, '-c', code], cwd=str(tmp_path),
+                            capture_output=True, text=True, env=env)
+    assert result.returncode == 0, result.stderr
+    loaded = [line for line in result.stdout.splitlines() if line.startswith('heavy:')][-1][len('heavy:'):]
+    print(f"Heavy modules imported at startup: {loaded or 'none'}")
+    assert loaded == ''
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-s", __file__]))
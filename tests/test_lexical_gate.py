@@ -0,0 +1,110 @@
+import sys
+import os
+import json
+from datetime import datetime
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+import pytest
+from app.services.llm_provider import LLMResponse, StubProvider
+
+RESUMES = {
+    "dev.pdf": "Alice Brown. Backend developer, Python, SQL and Docker.",
+    "data.pdf": "Carol White. Data scientist, Python, statistics and SQL.",
+    "chef.pdf": "Dan Black. Pastry chef, French cuisine and bakery management.",
+    "nurse.pdf": "Eve Stone. Registered nurse, intensive care and patient triage."
+}
+
+
+def _make_service(make_services, provider):
+    service = make_services(provider)
+    store = service.file_service.store
+    service.gate_threshold = 0.2
+
+    for resume_name, content in RESUMES.items():
+        store.save_raw_content("Resume", resume_name, content, datetime.now(), f"hash-{resume_name}")
+    store.save_raw_content("JD", "jd0.pdf", "Python developer", datetime.now(), "hash-jd0")
+    store.save_criteria("jd0.pdf", json.dumps({"criteria": ["Python", "SQL", "Docker", "AWS"]}), "hash-jd0")
+    return service, store
+
+
+def test_gate_skips_irrelevant_resumes(make_services):
+    print("Starting test_gate_skips_irrelevant_resumes test...")
+
+    provider = StubProvider()
+    service, store = _make_service(make_services, provider)
+
+    chef = service.score_resume("chef.pdf", "jd0.pdf")
+    assert provider.calls == 0, "Irrelevant resume should not call the model"
+    assert chef["gated"] and chef["total_score"] == 0
+    assert chef["lexical_overlap"] == 0.0 and chef["gate_threshold"] == 0.2
+    assert store.get_scores(resume_name="chef.pdf")[0]['total_score'] == 0
+
+    dev = service.score_resume("dev.pdf", "jd0.pdf")
+    assert provider.calls == 1
+    assert "gated" not in dev
+
+    stats = service.gate_stats()
+    print(f"Gate stats: {stats}")
+    assert stats['skipped'] == 1 and stats['skip_rate'] == 0.5
+
+    # 开启过滤时被跳过的评分仍然有效，不会重复判断
+    assert service.find_unscored_pairs(["jd0.pdf"], ["chef.pdf", "dev.pdf"]) == []
+    assert service.score_resume("chef.pdf", "jd0.pdf")["gated"]
+    assert service.gate_stats()['checked'] == 2
+
+    # 关闭过滤后，被跳过的组合需要用模型重新评分
+    service.gate_threshold = None
+    assert service.find_unscored_pairs(["jd0.pdf"], ["chef.pdf", "dev.pdf"]) == [("jd0.pdf", "chef.pdf")]
+    print("Lexical gate passed")
+
+
+def test_gate_in_batched_scoring(make_services):
+    print("Starting test_gate_in_batched_scoring test...")
+
+    provider = StubProvider()
+    service, _ = _make_service(make_services, provider)
+    results = service.score_matrix(["jd0.pdf"], list(RESUMES), batch_size=4)
+
+    # 只有两份相关的简历放入一个批量请求
+    assert provider.calls == 1, f"Expected 1 scoring call, got {provider.calls}"
+    gated = {resume for (_, resume), result in results.items() if result.get("gated")}
+    assert gated == {"chef.pdf", "nurse.pdf"}
+    print("Gate in batched scoring passed")
+
+
+class DroppingStubProvider(StubProvider):
+    """批量响应中丢掉最后一份简历的stub"""
+
+    def generate_content(self, prompt):
+        response = super().generate_content(prompt)
+        if "Score each of the following resumes" in prompt:
+            result = json.loads(response.text)
+            result["results"] = result["results"][:-1]
+            return LLMResponse(json.dumps(result))
+        return response
+
+
+def test_gate_checks_each_pair_once(make_services):
+    print("Starting test_gate_checks_each_pair_once test...")
+
+    provider = DroppingStubProvider()
+    service, store = _make_service(make_services, provider)
+    store.save_candidate_info("chef.pdf", "Dan Black", "Pastry")
+    service.score_matrix(["jd0.pdf"], list(RESUMES), batch_size=4)
+
+    # 批量响应缺少的简历单独评分时不再重复预过滤判断
+    assert provider.calls == 2, f"Expected batch call plus one fallback, got {provider.calls}"
+    stats = service.gate_stats()
+    assert stats['checked'] == len(RESUMES) and stats['skipped'] == 2, stats
+
+    # 被跳过的评分不覆盖已有的候选人信息
+    assert store.get_candidate_name("chef.pdf") == "Dan Black"
+    print("Gate counted once per pair")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-s", __file__]))
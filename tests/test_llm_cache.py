@@ -0,0 +1,82 @@
+import sys
+import os
+import tempfile
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+from app.services.llm_cache import LLMCache, CachedModel
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """记录调用次数的假模型"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        return FakeResponse(f"response to {prompt}")
+
+
+def test_cached_model_hits_and_misses():
+    print("Starting test_cached_model_hits_and_misses test...")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = LLMCache(db_path=os.path.join(cache_dir, "cache.db"), max_bytes=1024 * 1024)
+        fake_model = FakeModel()
+        model = CachedModel(fake_model, "test-model", {"temperature": 0.2}, cache)
+
+        assert model.generate_content("a").text == "response to a"
+        assert model.generate_content("a").text == "response to a"
+        assert fake_model.calls == 1, f"Expected 1 model call, got {fake_model.calls}"
+
+        # 生成参数不同时不能共用缓存
+        other = CachedModel(fake_model, "test-model", {"temperature": 0.9}, cache)
+        other.generate_content("a")
+        assert fake_model.calls == 2
+
+        # 缓存保存在磁盘上，新实例也能命中
+        reopened = CachedModel(fake_model, "test-model", {"temperature": 0.2},
+                               LLMCache(db_path=cache.db_path))
+        reopened.generate_content("a")
+        assert fake_model.calls == 2
+
+        stats = cache.stats()
+        print(f"Cache stats: {stats}")
+        assert stats['hits'] == 1
+        assert stats['misses'] == 2
+
+        # 丢弃后重新调用模型
+        model.discard("a")
+        model.generate_content("a")
+        assert fake_model.calls == 3
+
+
+def test_lru_eviction():
+    print("Starting test_lru_eviction test...")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = LLMCache(db_path=os.path.join(cache_dir, "cache.db"), max_bytes=25)
+        cache.set("k1", "x" * 10)
+        cache.set("k2", "y" * 10)
+        # 访问k1使k2成为最近最少使用的条目
+        assert cache.get("k1") == "x" * 10
+        cache.set("k3", "z" * 10)
+
+        assert cache.get("k2") is None, "Least recently used entry should have been evicted"
+        assert cache.get("k1") == "x" * 10
+        assert cache.get("k3") == "z" * 10
+        assert cache.stats()['evictions'] == 1
+
+
+if __name__ == "__main__":
+    test_cached_model_hits_and_misses()
+    test_lru_eviction()
@@ -0,0 +1,103 @@
+import sys
+import os
+import json
+import shutil
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+import pytest
+from app.services.llm_provider import LLMProvider, StubProvider, LLMProviderError
+from app.services.rate_limiter import RateLimiter, RateLimitedProvider
+
+
+def test_stub_provider_is_deterministic():
+    print("Starting test_stub_provider_is_deterministic test...")
+    
+    provider = StubProvider(num_criteria=3)
+    prompt = """
+    Extract key criteria from the following job description.
+    Job Description:
+    Python developer. Python, SQL and Docker. Docker images, SQL databases, Python services.
+    Expected format:
+    """
+    criteria = json.loads(provider.generate_content(prompt).text)["criteria"]
+    assert criteria == ["Experience with python", "Experience with sql", "Experience with docker"], criteria
+    
+    score_prompt = f"""
+    Score the following resume against the job criteria.
+    Resume:
+    Jane Smith, Python engineer
+    Criteria:
+    {json.dumps(criteria)}
+    Return the result as a JSON object
+    """
+    first = json.loads(provider.generate_content(score_prompt).text)
+    second = json.loads(StubProvider().generate_content(score_prompt).text)
+    assert first == second
+    assert first["candidate_name"] == "Jane Smith"
+    assert set(first["scores"]) == set(criteria)
+    assert all(0 <= score <= 5 for score in first["scores"].values())
+    assert first["total_score"] == sum(first["scores"].values())
+    print("Stub provider responses are deterministic")
+
+
+def test_stub_provider_failure_rate():
+    print("Starting test_stub_provider_failure_rate test...")
+    
+    provider = StubProvider(failure_rate=1.0)
+    with pytest.raises(LLMProviderError):
+        provider.generate_content("Extract key criteria")
+    assert provider.calls == 1 and provider.failures == 1
+
+    # 模拟的失败不是限流或服务端错误，经过限流器时不重试
+    limiter = RateLimiter(requests_per_minute=None, tokens_per_minute=None, max_retries=3, base_delay=0.01)
+    provider = StubProvider(failure_rate=1.0)
+    with pytest.raises(LLMProviderError):
+        RateLimitedProvider(provider, limiter).generate_content("Extract key criteria")
+    assert provider.calls == 1
+    assert limiter.stats()['retries'] == 0
+
+
+def test_provider_interface_is_abstract():
+    print("Starting test_provider_interface_is_abstract test...")
+
+    with pytest.raises(TypeError):
+        LLMProvider()
+
+    class IncompleteProvider(LLMProvider):
+        model_name = "incomplete"
+    with pytest.raises(TypeError):
+        IncompleteProvider()
+
+
+def test_services_run_offline_with_stub_provider(make_services, tmp_path):
+    print("Starting test_services_run_offline_with_stub_provider test...")
+    
+    data_dir = str(tmp_path)
+    provider = StubProvider()
+    service = make_services(provider)
+    store = service.file_service.store
+    assert service.jd_service.provider is provider
+    
+    jd_path = os.path.join(data_dir, "jd0.pdf")
+    resume_path = os.path.join(data_dir, "resume.pdf")
+    shutil.copy(os.path.join(project_root, "testdata", "jd", "jd0.pdf"), jd_path)
+    shutil.copy(os.path.join(project_root, "testdata", "resume", "XimingTao_resume_ml.pdf"), resume_path)
+    service.file_service.save_raw_content(jd_path, "JD")
+    service.file_service.save_raw_content(resume_path, "Resume")
+    
+    criteria = service.jd_service.get_criteria("jd0.pdf")["criteria"]
+    assert len(criteria) > 0
+    
+    result = service.score_resume("resume.pdf", "jd0.pdf")
+    assert set(result["scores"]) == set(criteria)
+    assert store.get_scores(jd_name="jd0.pdf")[0]["total_score"] == result["total_score"]
+    assert provider.calls == 2, f"Expected 2 provider calls, got {provider.calls}"
+    print("Services ran offline with the stub provider")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-s", __file__]))
@@ -0,0 +1,99 @@
+import sys
+import os
+import json
+import time
+from datetime import datetime
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+import pandas as pd
+import pytest
+from app.services.llm_provider import StubProvider
+from app.services.local_scorer import LocalScorer, tokenize
+from app.services.resume_service import ResumeService
+
+CRITERIA = ["Python", "SQL databases", "Docker and Kubernetes", "C++"]
+
+RESUMES = {
+    "a.pdf": "Alice Brown. Python and SQL developer, PostgreSQL databases, Docker and Kubernetes.",
+    "b.pdf": "Bob Green. Java engineer with Docker experience.",
+    "c.pdf": "Carol White. Embedded C++ developer."
+}
+
+
+def _make_service(make_services, provider):
+    service = make_services(provider)
+    store = service.file_service.store
+    for resume_name, content in RESUMES.items():
+        store.save_raw_content("Resume", resume_name, content, datetime.now(), f"hash-{resume_name}")
+    store.save_raw_content("JD", "jd0.pdf", "Backend developer", datetime.now(), "hash-jd0")
+    store.save_criteria("jd0.pdf", json.dumps({"criteria": CRITERIA}), "hash-jd0")
+    return service, store
+
+
+def test_local_scorer_scale():
+    print("Starting test_local_scorer_scale test...")
+
+    assert tokenize("Experience with C++, C# and Node.js.") == ["c++", "c#", "node.js"]
+
+    scores = LocalScorer().score(list(RESUMES.values()), CRITERIA)
+    assert scores.shape == (3, 4)
+    assert scores.min() >= 0 and scores.max() <= 5
+    # a.pdf提到了前三项的所有词，没有提到C++
+    assert list(scores[0]) == [5, 5, 5, 0]
+    # b.pdf只提到了Docker
+    assert 0 < scores[1][2] < 5
+    assert scores[2][3] == 5
+
+    # 词集合缓存有上限，淘汰最近最少使用的简历
+    scorer = LocalScorer(cache_size=2)
+    for key, text in RESUMES.items():
+        scorer.terms(text, key)
+    scorer.terms(RESUMES["b.pdf"], "b.pdf")
+    scorer.terms("Eve Stone. Go developer.", "e.pdf")
+    assert list(scorer._terms) == ["b.pdf", "e.pdf"]
+
+
+def test_score_matrix_local(make_services, tmp_path):
+    print("Starting test_score_matrix_local test...")
+
+    provider = StubProvider()
+    service, store = _make_service(make_services, provider)
+
+    # 已有的模型评分不会被本地评分覆盖
+    llm_score = service.score_resume("c.pdf", "jd0.pdf")
+    calls = provider.calls
+
+    start = time.perf_counter()
+    results = service.score_matrix_local(["jd0.pdf"])
+    print(f"Local scoring took {time.perf_counter() - start:.4f}s")
+
+    assert provider.calls == calls, "Local scoring should not call the model"
+    assert set(results) == {("jd0.pdf", name) for name in RESUMES}
+
+    # 没有保存criteria的JD跳过，不调用模型提取
+    store.save_raw_content("JD", "jd1.pdf", "Frontend developer", datetime.now(), "hash-jd1")
+    assert service.score_matrix_local(["jd1.pdf"]) == {}
+    assert provider.calls == calls and store.get_criteria("jd1.pdf") is None
+    assert results[("jd0.pdf", "a.pdf")]["total_score"] == 15
+
+    stored = {row['resume_name']: row for row in store.get_scores(jd_name="jd0.pdf")}
+    assert stored["a.pdf"]['criteria_version'].startswith(ResumeService.LOCAL_VERSION_PREFIX)
+    assert json.loads(stored["c.pdf"]['scores']) == llm_score["scores"]
+
+    # 本地评分在模型评分模式下视为过期
+    assert sorted(service.find_unscored_pairs(["jd0.pdf"], list(RESUMES))) == [
+        ("jd0.pdf", "a.pdf"), ("jd0.pdf", "b.pdf")
+    ]
+
+    output_path = os.path.join(str(tmp_path), "scores.xlsx")
+    assert service.export_scores_to_excel(output_path=output_path) == output_path
+    assert len(pd.read_excel(output_path, sheet_name="jd0")) == 3
+    print("Local scoring passed")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-s", __file__]))
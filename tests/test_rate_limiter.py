@@ -0,0 +1,133 @@
+import sys
+import os
+import time
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+import pytest
+from app.services.llm_provider import StubProvider
+from app.services.hedging import DeadlineExceeded, deadline_scope
+from app.services.rate_limiter import TokenBucket, AdaptiveConcurrency, RateLimiter, RateLimitedProvider
+
+
+class ResourceExhausted(Exception):
+    """模拟google.api_core的429异常"""
+    code = 429
+
+
+class FlakyProvider:
+    """前几次调用返回429的provider"""
+
+    model_name = "flaky"
+    generation_config = None
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ResourceExhausted("Quota exceeded")
+        return StubProvider().generate_content(prompt)
+
+
+def test_token_bucket_limits_rate():
+    print("Starting test_token_bucket_limits_rate test...")
+
+    # 每秒10个token，桶容量为1
+    bucket = TokenBucket(rate_per_minute=600, capacity=1)
+    start = time.monotonic()
+    for _ in range(4):
+        bucket.acquire(1)
+    elapsed = time.monotonic() - start
+    assert 0.25 <= elapsed < 1.0, f"Expected about 0.3s, got {elapsed:.2f}s"
+
+
+def test_adaptive_concurrency_aimd():
+    print("Starting test_adaptive_concurrency_aimd test...")
+
+    concurrency = AdaptiveConcurrency(initial=4, min_limit=1, max_limit=8)
+    for _ in range(8):
+        concurrency.acquire()
+        concurrency.release()
+    assert concurrency.limit > 5
+
+    concurrency.acquire()
+    concurrency.release(throttled=True)
+    assert concurrency.limit < 3
+
+
+def test_retries_transient_errors():
+    print("Starting test_retries_transient_errors test...")
+
+    limiter = RateLimiter(requests_per_minute=None, tokens_per_minute=None, max_retries=3,
+                          base_delay=0.01, max_delay=0.05, initial_concurrency=4)
+    provider = FlakyProvider(failures=2)
+    response = RateLimitedProvider(provider, limiter).generate_content("Extract key criteria")
+    assert '"criteria"' in response.text
+    assert provider.calls == 3
+
+    stats = limiter.stats()
+    print(f"Rate limiter stats: {stats}")
+    assert stats['retries'] == 2
+    assert stats['throttled'] == 2
+    assert stats['concurrency_limit'] < 4
+
+    # 重试次数用尽后抛出最后一次的异常
+    with pytest.raises(ResourceExhausted):
+        RateLimitedProvider(FlakyProvider(failures=10), limiter).generate_content("x")
+
+    # 不可重试的错误直接抛出
+    class BrokenProvider(FlakyProvider):
+        def generate_content(self, prompt):
+            self.calls += 1
+            raise ValueError("bad request")
+    broken = BrokenProvider(failures=0)
+    with pytest.raises(ValueError):
+        RateLimitedProvider(broken, limiter).generate_content("x")
+    assert broken.calls == 1
+
+
+def test_waits_stop_at_deadline():
+    print("Starting test_waits_stop_at_deadline test...")
+
+    limiter = RateLimiter(requests_per_minute=None, tokens_per_minute=None, initial_concurrency=1)
+    # 每秒1个请求，桶已经用完
+    limiter.request_bucket = TokenBucket(rate_per_minute=60, capacity=1)
+    limiter.request_bucket.acquire(1)
+    provider = FlakyProvider(failures=0)
+
+    start = time.monotonic()
+    with deadline_scope(timeout=0.2):
+        with pytest.raises(DeadlineExceeded):
+            RateLimitedProvider(provider, limiter).generate_content("x")
+    assert time.monotonic() - start < 0.1, "Should fail without waiting past the deadline"
+    assert provider.calls == 0
+
+    # 并发名额被占用时，等待到截止时间为止，不调用模型
+    limiter.request_bucket = None
+    limiter.concurrency.acquire()
+    start = time.monotonic()
+    with deadline_scope(timeout=0.2):
+        with pytest.raises(DeadlineExceeded):
+            RateLimitedProvider(provider, limiter).generate_content("x")
+    assert 0.15 <= time.monotonic() - start < 0.5
+    assert provider.calls == 0
+    limiter.concurrency.release()
+
+    # 截止时间已经过去的调用直接失败
+    with deadline_scope(timeout=0):
+        with pytest.raises(DeadlineExceeded):
+            RateLimitedProvider(provider, limiter).generate_content("x")
+    assert provider.calls == 0
+
+
+if __name__ == "__main__":
+    test_token_bucket_limits_rate()
+    test_adaptive_concurrency_aimd()
+    test_retries_transient_errors()
+    test_waits_stop_at_deadline()
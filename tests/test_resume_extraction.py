@@ -8,7 +8,7 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
 import pytest
-from app.services.file_service import FileService
+from app.services.file_service import ExtractionPool, FileService
 
 def test_extract_resumes_and_save_to_csv():
     print("Starting test_extract_resumes_and_save_to_csv test...")
@@ -76,5 +76,34 @@ def test_extract_resumes_and_save_to_csv():
         print("No content was extracted")
         assert False, "No content was extracted from any file"
 
+def test_extract_many_in_parallel(make_store):
+    print("Starting test_extract_many_in_parallel test...")
+    
+    pool = ExtractionPool(max_workers=2)
+    service = FileService(store=make_store(), extraction_pool=pool)
+    
+    resume_dir = os.path.join(project_root, "testdata", "resume")
+    file_paths = [os.path.join(resume_dir, f) for f in os.listdir(resume_dir)]
+    file_paths.append(os.path.join(resume_dir, "missing_resume.pdf"))
+    
+    try:
+        # 使用进程池并行提取
+        results = service.extract_many(file_paths)
+        
+        assert set(results) == set(file_paths)
+        assert isinstance(results[file_paths[-1]], Exception), "Missing file should be reported as an error"
+        for file_path in file_paths[:-1]:
+            assert results[file_path] == service.extract_text_from_file(file_path), f"Parallel extraction differs for {file_path}"
+            print(f"Extracted {os.path.basename(file_path)} in parallel. Content length: {len(results[file_path])}")
+        
+        # 工作进程用spawn启动，并在多次调用之间复用
+        executor = pool._executor
+        assert executor._mp_context.get_start_method() == "spawn"
+        service.extract_many(file_paths[:2])
+        assert pool._executor is executor
+    finally:
+        pool.shutdown()
+    assert pool._executor is None
+
 if __name__ == "__main__":
     test_extract_resumes_and_save_to_csv() 
\ No newline at end of file
@@ -0,0 +1,81 @@
+import sys
+import os
+import json
+from datetime import datetime
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+import pytest
+from app.services.llm_provider import StubProvider
+
+RESUMES = {
+    "a.pdf": "Alice Brown. Python developer. Python services, SQL and Docker.",
+    "b.pdf": "Bob Green. Java engineer, Kubernetes and AWS.",
+    "c.pdf": "Carol White. Data scientist, Python, statistics and SQL.",
+    "d.pdf": "Dan Black. Frontend developer, React and TypeScript."
+}
+
+
+@pytest.mark.parametrize("backend", ["csv", "sqlite"])
+def test_search_resumes(backend, make_store):
+    print(f"Starting test_search_resumes test for {backend} backend...")
+
+    store = make_store(backend)
+    for resume_name, content in RESUMES.items():
+        store.save_raw_content("Resume", resume_name, content, datetime.now(), f"hash-{resume_name}")
+
+    results = store.search_resumes(["python", "sql"], top_k=3)
+    print(f"{backend} results: {results}")
+    assert [name for name, _ in results] == ["a.pdf", "c.pdf"]
+    assert results[0][1] > results[1][1] > 0
+    assert store.search_resumes(["kubernetes"], top_k=1)[0][0] == "b.pdf"
+    assert store.search_resumes(["cobol"], top_k=3) == []
+
+    # 内容更新后索引随之更新
+    store.save_raw_content("Resume", "d.pdf", "Dan Black. Python and SQL tutor.", datetime.now(), "hash-d2")
+    assert "d.pdf" in [name for name, _ in store.search_resumes(["python", "sql"], top_k=3)]
+    assert store.search_resumes(["react"], top_k=3) == []
+
+
+def test_index_rebuilt_for_existing_database(make_store):
+    print("Starting test_index_rebuilt_for_existing_database test...")
+
+    store = make_store('sqlite')
+    for resume_name, content in RESUMES.items():
+        store.save_raw_content("Resume", resume_name, content, datetime.now(), f"hash-{resume_name}")
+    expected = store.search_resumes(["python", "sql"], top_k=3)
+
+    # 模拟没有索引的旧版数据库
+    conn = store._conn()
+    with conn:
+        conn.execute("DELETE FROM resume_index_postings")
+        conn.execute("DELETE FROM resume_index_docs")
+    assert store.search_resumes(["python", "sql"], top_k=3) == []
+
+    reopened = make_store('sqlite')
+    assert reopened.search_resumes(["python", "sql"], top_k=3) == expected
+
+
+def test_shortlist_uses_jd_criteria(make_services):
+    print("Starting test_shortlist_uses_jd_criteria test...")
+
+    provider = StubProvider()
+    service = make_services(provider)
+    store = service.file_service.store
+
+    for resume_name, content in RESUMES.items():
+        store.save_raw_content("Resume", resume_name, content, datetime.now(), f"hash-{resume_name}")
+    store.save_raw_content("JD", "jd0.pdf", "Frontend developer", datetime.now(), "hash-jd0")
+    store.save_criteria("jd0.pdf", json.dumps({"criteria": ["React", "TypeScript", "CSS"]}), "hash-jd0")
+
+    shortlist = service.shortlist("jd0.pdf", top_k=2)
+    assert [candidate["resume_name"] for candidate in shortlist] == ["d.pdf"]
+    assert provider.calls == 0
+    print("Shortlist passed")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-s", __file__]))
@@ -0,0 +1,78 @@
+import sys
+import os
+import json
+from datetime import datetime
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+import pytest
+from app.services.llm_provider import StubProvider
+
+
+def test_services_share_clients_and_caches(make_store, make_container):
+    print("Starting test_services_share_clients_and_caches test...")
+
+    store = make_store()
+    provider = StubProvider()
+    container = make_container(provider, store=store)
+
+    resume_service = container.resume_service
+    assert resume_service.jd_service is container.jd_service
+    assert resume_service.file_service is container.file_service is container.jd_service.file_service
+    assert container.file_service.store is store
+    assert resume_service.model is container.jd_service.model is container.model
+    assert resume_service.provider is container.jd_service.provider is provider
+
+    # 简历评分使用的criteria来自JD服务的内存缓存，不重复提取
+    store.save_raw_content("JD", "jd0.pdf", "Python developer. Python, SQL and Docker.", datetime.now(), "hash-jd0")
+    store.save_raw_content("Resume", "a.pdf", "Alice Brown. Python and SQL.", datetime.now(), "hash-a")
+    container.jd_service.get_criteria("jd0.pdf")
+    resume_service.score_resume("a.pdf", "jd0.pdf")
+    assert provider.calls == 2, f"Expected 1 extraction and 1 scoring call, got {provider.calls}"
+    assert container.jd_service.criteria_stats()['cached'] == 1
+    print("Service container passed")
+
+
+def test_warm_up_loads_active_jds(make_store, make_container):
+    print("Starting test_warm_up_loads_active_jds test...")
+
+    store = make_store()
+    store.save_raw_content("JD", "jd0.pdf", "Python developer", datetime.now(), "hash-jd0")
+    store.save_criteria("jd0.pdf", json.dumps({"criteria": ["Python", "SQL"]}), "hash-jd0")
+    store.activate_jds(["jd0.pdf"])
+    store.save_score("a.pdf", "jd0.pdf", json.dumps({"Python": 4, "SQL": 3}), 7, "hash-a", "hash-jd0")
+
+    container = make_container(store=store)
+    assert not container.ready
+
+    stats = container.warm_up()
+    print(f"Warm-up stats: {stats}")
+    assert container.ready and container.warm_stats == stats
+    assert stats['active_jds'] == 1 and 'error' not in stats
+
+    # 预热后criteria直接从内存缓存读取
+    store.get_criteria = None
+    assert container.jd_service.get_criteria("jd0.pdf") == {"criteria": ["Python", "SQL"]}
+    assert container.provider.calls == 0
+
+
+def test_failed_warm_up_is_not_ready(make_store, make_container):
+    print("Starting test_failed_warm_up_is_not_ready test...")
+
+    store = make_store()
+    def fail():
+        raise RuntimeError("database is locked")
+    store.get_active_jds_version = fail
+
+    container = make_container(store=store)
+    stats = container.warm_up()
+    print(f"Warm-up stats: {stats}")
+    assert stats['error'] == "database is locked"
+    assert not container.ready and container.warm_stats == stats
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-s", __file__]))
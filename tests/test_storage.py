@@ -0,0 +1,148 @@
+import sys
+import os
+import json
+import time
+import threading
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+import pytest
+from datetime import datetime
+
+
+@pytest.mark.parametrize("backend", ["csv", "sqlite"])
+def test_store_roundtrip(backend, make_store):
+    print(f"Starting test_store_roundtrip test for {backend} backend...")
+
+    store = make_store(backend)
+
+    # 原始内容
+    store.save_raw_content('JD', "jd0.pdf", "Python developer", datetime.now())
+    content, extracted_at = store.get_raw_content('JD', "jd0.pdf")
+    assert content == "Python developer"
+    assert isinstance(extracted_at, datetime)
+    assert store.get_raw_content('Resume', "jd0.pdf") is None
+
+    # criteria
+    store.save_criteria("jd0.pdf", json.dumps({"criteria": ["Python"]}))
+    store.save_criteria("jd0.pdf", json.dumps({"criteria": ["Python", "SQL"]}))
+    assert json.loads(store.get_criteria("jd0.pdf"))['criteria'] == ["Python", "SQL"]
+
+    # 评分和候选人信息
+    store.save_score("a.pdf", "jd0.pdf", json.dumps({"Python": 5}), 5)
+    store.save_score("a.pdf", "jd0.pdf", json.dumps({"Python": 3}), 3)
+    store.save_score("b.pdf", "jd0.pdf", json.dumps({"Python": 4}), 4)
+    store.save_candidate_info("a.pdf", "Alice", "{}")
+
+    scores = store.get_scores(jd_name="jd0.pdf")
+    assert len(scores) == 2, f"Expected 2 scores, got {len(scores)}"
+    assert store.get_scores(resume_name="a.pdf")[0]['total_score'] == 3
+    assert store.get_candidate_names() == {"a.pdf": "Alice"}
+
+    store.delete_scores(["a.pdf"])
+    assert [s['resume_name'] for s in store.get_scores()] == ["b.pdf"]
+
+    # 批量保存评分
+    store.save_scores([
+        {'resume_name': "b.pdf", 'jd_name': "jd0.pdf", 'scores': json.dumps({"Python": 2}), 'total_score': 2},
+        {'resume_name': "c.pdf", 'jd_name': "jd0.pdf", 'scores': json.dumps({"Python": 1}), 'total_score': 1,
+         'criteria_version': "local:v1"}
+    ])
+    scores = {s['resume_name']: s for s in store.get_scores(jd_name="jd0.pdf")}
+    assert {name: row['total_score'] for name, row in scores.items()} == {"b.pdf": 2, "c.pdf": 1}
+    assert scores["c.pdf"]['criteria_version'] == "local:v1"
+    assert store.get_raw_contents('JD') == {"jd0.pdf": ("Python developer", None)}
+
+    # 单项评分
+    store.save_criterion_scores("hash-a", {"python": 5, "sql": 2})
+    store.save_criterion_scores("hash-a", {"sql": 3})
+    assert store.get_criterion_scores("hash-a", ["python", "sql", "docker"]) == {"python": 5, "sql": 3}
+    assert store.get_criterion_scores("hash-b", ["python"]) == {}
+
+    # 后台任务状态
+    store.save_job("job-1", json.dumps({"status": "queued"}))
+    store.save_job("job-1", json.dumps({"status": "running"}))
+    assert json.loads(store.get_job("job-1")) == {"status": "running"}
+    store.delete_jobs(["job-1"])
+    assert store.get_job("job-1") is None
+    print(f"{backend} backend roundtrip passed")
+
+
+@pytest.mark.parametrize("backend", ["csv", "sqlite"])
+def test_find_score_by_hash_returns_newest_current_version(backend, make_store):
+    print(f"Starting test_find_score_by_hash_returns_newest_current_version test for {backend} backend...")
+
+    store = make_store(backend)
+    # 内容相同的三份简历：两份模型评分，最新的一份是本地评分
+    for resume_name, total, version in (("a.pdf", 3, "v1"), ("b.pdf", 4, "v1"), ("c.pdf", 1, "local:v1")):
+        store.save_score(resume_name, "jd0.pdf", json.dumps({"Python": total}), total,
+                         resume_hash="hash-r", jd_hash="hash-jd", criteria_version=version)
+        time.sleep(0.01)
+
+    assert store.find_score_by_hash("hash-r", "hash-jd")['resume_name'] == "c.pdf"
+    assert store.find_score_by_hash("hash-r", "hash-jd", ["v1"])['resume_name'] == "b.pdf"
+    assert store.find_score_by_hash("hash-r", "hash-jd", ["v2"]) is None
+    assert store.find_score_by_hash("hash-r", "other", ["v1"]) is None
+
+
+def test_sqlite_migrates_existing_csv(make_store):
+    print("Starting test_sqlite_migrates_existing_csv test...")
+
+    # 先用CSV后端写入数据
+    csv_store = make_store('csv')
+    csv_store.save_raw_content('Resume', "a.pdf", "old text", datetime.now())
+    csv_store.save_raw_content('Resume', "a.pdf", "new text", datetime.now())
+    # 超过csv模块默认字段长度上限的全文
+    csv_store.save_raw_content('Resume', "b.pdf", "long text " * 20000, datetime.now())
+    csv_store.save_criteria("jd0.pdf", json.dumps({"criteria": ["Python"]}))
+    csv_store.save_score("a.pdf", "jd0.pdf", json.dumps({"Python": 5}), 5)
+
+    store = make_store('sqlite')
+    assert store.get_raw_content('Resume', "a.pdf")[0] == "new text"
+    assert store.get_raw_content('Resume', "b.pdf")[0] == "long text " * 20000
+    assert store.list_raw_files('Resume') == ["a.pdf", "b.pdf"]
+    # CSV中的空值迁移为NULL
+    assert store.get_raw_hash('Resume', "a.pdf") is None
+    assert json.loads(store.get_criteria("jd0.pdf"))['criteria'] == ["Python"]
+    assert store.get_scores()[0]['total_score'] == 5
+
+    # 迁移只执行一次
+    store.delete_scores(["a.pdf"])
+    store = make_store('sqlite')
+    assert store.get_scores() == []
+    print("CSV migration passed")
+
+
+def test_csv_reads_during_writes(make_store):
+    print("Starting test_csv_reads_during_writes test...")
+
+    store = make_store('csv')
+    errors = []
+
+    def write():
+        for i in range(50):
+            store.save_score(f"r{i}.pdf", "jd0.pdf", json.dumps({"Python": 3}), 3)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    # 读取不加锁，写入替换整个文件，读取方只能看到写入前或写入后的完整文件
+    seen = 0
+    while writer.is_alive():
+        try:
+            count = len(store.get_scores(jd_name="jd0.pdf"))
+        except Exception as e:
+            errors.append(e)
+            break
+        assert count >= seen
+        seen = count
+    writer.join()
+    assert errors == []
+    assert len(store.get_scores()) == 50
+    assert [name for name in os.listdir(os.path.dirname(store.scores_path)) if name.endswith(".tmp")] == []
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-s", __file__]))
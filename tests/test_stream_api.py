@@ -0,0 +1,136 @@
+import sys
+import os
+import json
+import threading
+from datetime import datetime
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+import pytest
+from app.services.llm_provider import StubProvider
+
+XIMING = os.path.join(project_root, "testdata", "resume", "XimingTao_resume_ml.pdf")
+JOHN = os.path.join(project_root, "testdata", "resume", "Johncruck_resume_ml.docx")
+
+
+class BlockingProvider(StubProvider):
+    """prompt中包含block_text时阻塞，直到调用release()"""
+
+    def __init__(self, block_text=None):
+        super().__init__()
+        self.block_text = block_text
+        self._released = threading.Event()
+
+    def release(self):
+        self._released.set()
+
+    def generate_content(self, prompt):
+        if self.block_text and self.block_text in prompt:
+            self._released.wait(timeout=30)
+        return super().generate_content(prompt)
+
+
+def _upload(*paths):
+    files = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            files.append(('files', (os.path.basename(path), f.read())))
+    # 无法提取文本的简历
+    files.append(('files', ("broken.pdf", b"not a pdf")))
+    return files
+
+
+def _activate_jd(store):
+    store.save_raw_content("JD", "jd0.pdf", "Machine learning engineer with Python", datetime.now(), "hash-jd0")
+    store.save_criteria("jd0.pdf", json.dumps({"criteria": ["Python", "Machine Learning"]}), "hash-jd0")
+    store.activate_jds(["jd0.pdf"])
+
+
+def _parse_ndjson(body):
+    return [json.loads(line) for line in body.splitlines() if line]
+
+
+def _parse_sse(body):
+    messages = []
+    for event in body.split("\n\n"):
+        if not event:
+            continue
+        fields = dict(line.split(": ", 1) for line in event.splitlines())
+        message = json.loads(fields["data"])
+        assert fields["event"] == message["type"]
+        messages.append(message)
+    return messages
+
+
+def test_ndjson_stream_in_completion_order(make_store, api_client):
+    print("Starting test_ndjson_stream_in_completion_order test...")
+
+    store = make_store()
+    _activate_jd(store)
+    # 第一份上传的简历在另外两份简历的评分产出之前一直阻塞，因此最后一个产出
+    provider = BlockingProvider(block_text="John Cruck")
+    client, container = api_client(provider, store=store)
+    iter_score_matrix = container.resume_service.iter_score_matrix
+
+    def release_after_others(*args, **kwargs):
+        for count, item in enumerate(iter_score_matrix(*args, **kwargs), 1):
+            if count == 2:
+                provider.release()
+            yield item
+    container.resume_service.iter_score_matrix = release_after_others
+
+    try:
+        response = client.post("/api/upload-resumes/stream", files=_upload(JOHN, XIMING))
+    finally:
+        provider.release()
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    messages = _parse_ndjson(response.text)
+    for message in messages:
+        print(f"Message: {message}")
+
+    assert [message["type"] for message in messages] == ["start", "score", "score", "score", "done"]
+    start, scores, done = messages[0], messages[1:-1], messages[-1]
+    assert start["uploaded_files"] == ["Johncruck_resume_ml.docx", "XimingTao_resume_ml.pdf", "broken.pdf"]
+    assert start["jd_files"] == ["jd0.pdf"]
+
+    # 每份简历一条消息，按评分完成的顺序
+    assert sorted(message["resume"] for message in scores) == sorted(start["uploaded_files"])
+    assert scores[-1]["resume"] == "Johncruck_resume_ml.docx"
+    by_resume = {message["resume"]: message for message in scores}
+    for resume in ("Johncruck_resume_ml.docx", "XimingTao_resume_ml.pdf"):
+        assert by_resume[resume]["jd"] == "jd0.pdf"
+        assert by_resume[resume]["total_score"] is not None
+    # 提取失败的简历产出错误消息，流继续到结束
+    assert by_resume["broken.pdf"]["error"]
+
+    assert done["export"]["success"]
+    assert done["gate"]["enabled"] is False
+
+
+def test_sse_stream(make_store, api_client):
+    print("Starting test_sse_stream test...")
+
+    store = make_store()
+    _activate_jd(store)
+    client, _ = api_client(store=store)
+
+    response = client.post("/api/upload-resumes/stream?stream_format=sse", files=_upload(XIMING))
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    messages = _parse_sse(response.text)
+    for message in messages:
+        print(f"Message: {message}")
+
+    assert [message["type"] for message in messages] == ["start", "score", "score", "done"]
+    by_resume = {message["resume"]: message for message in messages[1:-1]}
+    assert by_resume["XimingTao_resume_ml.pdf"]["total_score"] is not None
+    assert by_resume["broken.pdf"]["error"]
+    assert messages[-1]["export"]["success"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-s", __file__]))
@@ -0,0 +1,152 @@
+import sys
+import os
+import json
+from datetime import datetime
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+import pytest
+from app import config
+from app.services.llm_provider import StubProvider, LLMResponse
+from app.services.llm_cache import CachedModel, LLMCache
+from app.services.hedging import HedgedProvider
+from app.services.structured_output import (
+    CriteriaResult, ScoreResult, StructuredOutputError, parse_structured, parse_stats,
+    criteria_schema, response_schema_scope, current_response_schema
+)
+
+
+class MalformedProvider(StubProvider):
+    """criteria响应是无效JSON的stub，repair_ok为True时修复请求返回有效的JSON"""
+
+    def __init__(self, repair_ok):
+        super().__init__()
+        self.repair_ok = repair_ok
+
+    def generate_content(self, prompt):
+        # 通过父类记录调用次数
+        super().generate_content(prompt)
+        if "Return only the corrected JSON object" in prompt:
+            return LLMResponse('{"criteria": ["Python", "SQL"]}' if self.repair_ok else "I cannot do that")
+        return LLMResponse("Here you go: {'criteria': ['Python', 'SQL',]}")
+
+
+def _make_service(make_services, provider, cache=None):
+    model = CachedModel(provider, provider.model_name, provider.generation_config, cache=cache)
+    service = make_services(provider, model=model).jd_service
+    store = service.file_service.store
+    store.save_raw_content("JD", "jd0.pdf", "Python developer with SQL", datetime.now(), "hash-jd0")
+    return service, store
+
+
+def test_parse_structured():
+    print("Starting test_parse_structured test...")
+
+    assert parse_structured('{"criteria": ["Python"]}', CriteriaResult) == {"criteria": ["Python"]}
+    # JSON之外的说明文字和代码块
+    assert parse_structured('```json\n{"criteria": ["SQL"]}\n```', CriteriaResult) == {"criteria": ["SQL"]}
+
+    score = parse_structured('{"candidate_name": "Alice", "scores": {"Python": 4, "SQL": 2.5}}', ScoreResult)
+    assert score["scores"] == {"Python": 4, "SQL": 2.5}
+
+    for text, result_type in [('{"criteria": []}', CriteriaResult),
+                              ('{"criteria": "Python, SQL"}', CriteriaResult),
+                              ('{"scores": {"Python": 7}}', ScoreResult),
+                              ('no json here', CriteriaResult)]:
+        with pytest.raises(StructuredOutputError):
+            parse_structured(text, result_type)
+
+
+def test_malformed_response_is_repaired_and_cached(make_services, tmp_path):
+    print("Starting test_malformed_response_is_repaired_and_cached test...")
+
+    before = parse_stats.stats()
+    provider = MalformedProvider(repair_ok=True)
+    cache = LLMCache(db_path=os.path.join(str(tmp_path), "llm_cache.db"))
+    service, store = _make_service(make_services, provider, cache)
+
+    assert service.extract_criteria("jd0.pdf") == {"criteria": ["Python", "SQL"]}
+    assert provider.calls == 2, f"Expected the original call and one repair, got {provider.calls}"
+    stats = parse_stats.stats()
+    assert stats['parse_failures'] == before['parse_failures'] + 1
+    assert stats['repaired'] == before['repaired'] + 1
+
+    # 修复后的结果已经按原prompt缓存
+    assert service.extract_criteria("jd0.pdf") == {"criteria": ["Python", "SQL"]}
+    assert provider.calls == 2
+    print("Repair passed")
+
+
+def test_cache_key_depends_on_structured_mode(make_services, tmp_path, monkeypatch):
+    print("Starting test_cache_key_depends_on_structured_mode test...")
+
+    provider = StubProvider()
+    cache = LLMCache(db_path=os.path.join(str(tmp_path), "llm_cache.db"))
+    service, store = _make_service(make_services, provider, cache)
+
+    monkeypatch.setattr(config, "LLM_STRUCTURED_OUTPUT", False)
+    expected = service.extract_criteria("jd0.pdf")
+    assert provider.calls == 1
+
+    # 开启结构化输出后，自由文本请求的缓存结果不会用于JSON模式的请求
+    monkeypatch.setattr(config, "LLM_STRUCTURED_OUTPUT", True)
+    assert service.extract_criteria("jd0.pdf") == expected
+    assert provider.calls == 2
+    assert service.extract_criteria("jd0.pdf") == expected
+    assert provider.calls == 2
+    assert cache.stats()['entries'] == 2
+
+
+def test_failed_repair_raises(make_services):
+    print("Starting test_failed_repair_raises test...")
+
+    before = parse_stats.stats()
+    provider = MalformedProvider(repair_ok=False)
+    service, store = _make_service(make_services, provider)
+
+    with pytest.raises(StructuredOutputError):
+        service.extract_criteria("jd0.pdf")
+    assert provider.calls == 2
+    assert store.get_criteria("jd0.pdf") is None
+    assert parse_stats.stats()['repair_failures'] == before['repair_failures'] + 1
+
+
+def test_failed_score_repair_is_not_saved(make_services):
+    print("Starting test_failed_score_repair_is_not_saved test...")
+
+    provider = MalformedProvider(repair_ok=False)
+    service = make_services(provider)
+    store = service.file_service.store
+    store.save_raw_content("JD", "jd0.pdf", "Python developer with SQL", datetime.now(), "hash-jd0")
+    store.save_criteria("jd0.pdf", json.dumps({"criteria": ["Python", "SQL"]}), "hash-jd0")
+    store.save_raw_content("Resume", "a.pdf", "Alice, Python developer", datetime.now(), "hash-a")
+
+    # 无法解析的评分返回错误，不作为0分保存
+    score = service.score_resume("a.pdf", "jd0.pdf")
+    print(f"Score: {score}")
+    assert "error" in score
+    assert store.get_scores() == []
+    assert store.get_criterion_scores("hash-a", ["Python", "SQL"]) == {}
+
+
+def test_response_schema_reaches_provider_thread():
+    print("Starting test_response_schema_reaches_provider_thread test...")
+
+    class SchemaRecordingProvider(StubProvider):
+        def generate_content(self, prompt):
+            self.schema = current_response_schema()
+            return super().generate_content(prompt)
+
+    inner = SchemaRecordingProvider()
+    provider = HedgedProvider(inner, call_timeout=5)
+    with response_schema_scope(criteria_schema()):
+        provider.generate_content("Extract key criteria")
+    assert inner.schema == criteria_schema()
+    assert current_response_schema() is None
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-s", __file__]))
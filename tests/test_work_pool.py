@@ -0,0 +1,98 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+
+# 获取项目根目录的路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 将项目根目录添加到Python的模块搜索路径中
+sys.path.insert(0, project_root)
+
+import pytest
+from app.services.hedging import current_deadline, deadline_scope
+from app.services.work_pool import WorkPool, WorkPoolFull
+
+
+def test_blocking_work_does_not_block_event_loop():
+    print("Starting test_blocking_work_does_not_block_event_loop test...")
+
+    pool = WorkPool(max_workers=2, max_queued=0)
+
+    async def main():
+        with deadline_scope(timeout=30):
+            expected = current_deadline()
+            task = asyncio.ensure_future(pool.run(lambda: (time.sleep(0.3), current_deadline())[1]))
+
+        # 阻塞工作执行期间事件循环仍然响应
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        assert time.perf_counter() - start < 0.1
+
+        # 截止时间随上下文传入线程池
+        assert await task == expected
+        assert [item async for item in pool.iterate(iter([1, 2, 3]))] == [1, 2, 3]
+
+    asyncio.run(main())
+    assert pool.stats()['pending'] == 0
+
+
+def test_full_pool_rejects_new_work():
+    print("Starting test_full_pool_rejects_new_work test...")
+
+    pool = WorkPool(max_workers=1, max_queued=1)
+    release = threading.Event()
+
+    async def main():
+        running = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(WorkPoolFull):
+            await pool.run(time.sleep, 0)
+        release.set()
+        await asyncio.gather(*running)
+        # 名额释放后可以继续提交
+        assert await pool.run(lambda: "ok") == "ok"
+
+    asyncio.run(main())
+    stats = pool.stats()
+    print(f"Work pool stats: {stats}")
+    assert stats['rejected'] == 1 and stats['pending'] == 0
+
+
+def test_stream_holds_slot_until_closed():
+    print("Starting test_stream_holds_slot_until_closed test...")
+
+    pool = WorkPool(max_workers=1, max_queued=0)
+    produced = []
+    closed = threading.Event()
+
+    def messages():
+        try:
+            for i in range(100):
+                produced.append(i)
+                yield i
+        finally:
+            closed.set()
+
+    async def main():
+        stream = pool.iterate(messages())
+        assert await stream.__anext__() == 0
+        # 流在整个迭代期间占用名额
+        with pytest.raises(WorkPoolFull):
+            await pool.run(time.sleep, 0)
+        assert await stream.__anext__() == 1
+
+        # 提前停止迭代时关闭生成器并释放名额
+        await stream.aclose()
+        assert closed.wait(1)
+        assert await pool.run(lambda: "ok") == "ok"
+
+    asyncio.run(main())
+    assert produced == [0, 1]
+    assert pool.stats()['pending'] == 0
+
+
+if __name__ == "__main__":
+    test_blocking_work_does_not_block_event_loop()
+    test_full_pool_rejects_new_work()
+    test_stream_holds_slot_until_closed()